@@ -1,15 +1,17 @@
 from __future__ import print_function
 
+import json
 import os
 import sys
 import logging
 import networkx as nx # pip install networkx or /opt/epd/bin/easy_install networkx
+import numpy as np
 import six
 import copy
 
-from collections import deque
-
-from flightdatautilities.dict_helpers import dict_filter
+from collections import Counter, OrderedDict, deque, namedtuple
+from itertools import chain
+from networkx.readwrite import json_graph
 
 from analysis_engine.node import (
     ApproachNode,
@@ -183,7 +185,8 @@ def print_tree(graph, node='root', **kwargs):
     print('\n'.join(indent_tree(graph, node, **kwargs)))
 
 
-def dependencies3(di_graph, root, node_mgr, raise_cir_dep=False):
+def dependencies3(di_graph, root, node_mgr, raise_cir_dep=False,
+                  tree_path=False):
     '''
     Performs a Depth First Search down each dependency node in the tree
     (di_graph) until each branch's dependencies are best satisfied.
@@ -199,8 +202,13 @@ def dependencies3(di_graph, root, node_mgr, raise_cir_dep=False):
     Heading -> Heading True + Magnetic Variation
     Heading True -> Heading - Magnetic Variation
 
+    The search uses an explicit stack rather than recursion. Operational
+    nodes are not traversed again and neither are inoperable nodes whose
+    result did not depend on a circular dependency to a node further up the
+    path.
+
     :param di_graph: Directed graph of all nodes and their dependencies.
-    :type di_graph: nx.DiGraph
+    :type di_graph: nx.DiGraph or CompactGraph
     :param root: Root node to start traversing from, usually named 'root'
     :type root: String
     :param node_mgr: Node manager which can assess whether nodes are
@@ -209,61 +217,113 @@ def dependencies3(di_graph, root, node_mgr, raise_cir_dep=False):
     :type node_mgr: analysis_engine.node.NodeManager
     :raise_cir_dep: Stop and raise a CircularDependency error if a circular
                     dependency on the node is encountered.
+    :param tree_path: Build the paths of the nodes visited for viewing the
+                      tree with ordered_tree_to_file. Every visit is
+                      recorded, so inoperable nodes are not memoized.
+    :type tree_path: bool
+    :returns: Processing order of operational nodes and the tree path (empty unless requested).
+    :rtype: ([str], [[str]])
     '''
     log_stuff = logger.getEffectiveLevel() >= logging.INFO
-    def traverse_tree(node):
-        "Begin the recursion at this node's position in the dependency tree"
-        if node in path:
-            # add node for it to be removed (pop'd) in a moment
-            path.append(node)
+    # CompactGraph stores successors in traversal order.
+    compact = isinstance(di_graph, CompactGraph)
+    ordering = []
+    path = []  # current branch path
+    depths = {}  # depth of each node within the current path
+    active_nodes = set()  # operational nodes visited for fast lookup
+    inoperable_nodes = set()  # inoperable regardless of the path taken
+    successors = {}  # successors of nodes ordered by their derive method
+    tree = [] if tree_path else None  # For viewing the tree in which nodes are add to path
+    # Each stack frame is [node, ordered successors, index of next successor,
+    # layer of available dependencies, shallowest circular dependency depth].
+    stack = []
+
+    def enter(node):
+        """
+        Visit node. Returns whether it is operational if already known,
+        otherwise pushes a frame to traverse its dependencies and returns
+        None.
+        """
+        if node in depths:
             # we've met this node before; start of circular dependency?
-            tree_path.append(list(path) + ['CIRCULAR',])
+            if tree is not None:
+                tree.append(path + [node, 'CIRCULAR'])
             if log_stuff:
                 logger.info("Circular dependency avoided at node '%s'. "
-                            "Branch path: %s", node, path)
+                            "Branch path: %s", node, path + [node])
             if raise_cir_dep:
                 raise CircularDependency("Circular Dependency In Path "
                                          "(node: '%s', path: '%s')"
-                                         % (node,"' > '".join(path)))
+                                         % (node, "' > '".join(path + [node])))
+            frame = stack[-1]
+            frame[4] = min(frame[4], depths[node])
             return False  # establishing if available; cannot yet be available
-        # we're recursing down
-        path.append(node)
         if node in active_nodes:
             # node already discovered operational
             return True
-
-        layer = set()  # layer of current node's available dependencies
-        # order the successors based on the order in the derive method; this allows the
-        # class to define the best path through the dependency tree.
-        ordered_successors = [name for (name, d) in sorted(di_graph[node].items(), key=lambda a: a[1].get('order'))]
-        for dependency in ordered_successors:
-            # traverse again, 'like we did last summer'
-            if traverse_tree(dependency):
+        if node in inoperable_nodes:
+            return False
+        try:
+            ordered_successors = successors[node]
+        except KeyError:
+            if compact:
+                ordered_successors = successors[node] = \
+                    di_graph.successors(node)
+            else:
+                # order the successors based on the order in the derive
+                # method; this allows the class to define the best path
+                # through the dependency tree. Edges without an order are
+                # sorted first.
+                ordered_successors = successors[node] = [
+                    name for (name, d) in
+                    sorted(di_graph[node].items(),
+                           key=lambda a: (a[1].get('order') is not None,
+                                          a[1].get('order')))]
+        depths[node] = len(path)
+        path.append(node)
+        stack.append([node, ordered_successors, 0, set(), len(path)])
+        return None
+
+    if enter(root) is not None:
+        return ordering, []
+
+    while stack:
+        frame = stack[-1]
+        node, ordered_successors, index, layer, cir_depth = frame
+        if index < len(ordered_successors):
+            frame[2] = index + 1
+            dependency = ordered_successors[index]
+            if enter(dependency):
                 layer.add(dependency)
-            # each time traverse_tree returns, remove node from visited path
-            path.pop()
+            continue
 
+        # all dependencies traversed; establish whether node is operational
+        stack.pop()
+        path.pop()
+        depth = depths.pop(node)
         if node_mgr.operational(node, layer):
             # node will work at this level with the available dependencies
             active_nodes.add(node)
             ordering.append(node)
-
-            if node not in node_mgr.hdf_keys:
-                tree_path.append(list(path))
-            return True  # layer below works
+            if tree is not None and node not in node_mgr.hdf_keys:
+                tree.append(path + [node])
+            operational = True
         else:
             # node will not work with available dependencies
-            tree_path.append(list(path) + ['NOT OPERATIONAL',])
-            return False
+            if tree is not None:
+                tree.append(path + [node, 'NOT OPERATIONAL'])
+            elif cir_depth >= depth:
+                # result did not depend on the nodes further up the path
+                inoperable_nodes.add(node)
+            operational = False
 
-    ordering = []
-    path = deque()  # current branch path
-    active_nodes = set()  # operational nodes visited for fast lookup
-    path_start_param = []#set()
-    path_start_kpv = []#set()
-    tree_path = [] # For viewing the tree in which nodes are add to path
-    traverse_tree(root)  # start recursion
-    return ordering, tree_path
+        if stack:
+            parent = stack[-1]
+            parent[4] = min(parent[4], cir_depth)
+            if operational:
+                parent[3].add(node)
+
+    return ordering, tree or []
 
 
 def draw_graph(graph, name, horizontal=False):
@@ -355,86 +415,402 @@ def graph_adjacencies(graph):
     return data
 
 
-def graph_nodes(node_mgr):
+# Static parts of the dependency graph for a set of derived nodes. Each is
+# built once and the graph of each flight is assembled from it.
+StaticGraph = namedtuple('StaticGraph',
+                         'names nodes edges successors dependencies')
+
+# Group into node types to apply colour. TODO: Make colours less garish.
+NODE_COLORS = {
+    ApproachNode: '#663399', # purple
+    MultistateDerivedParameterNode: '#2aa52a', # dark green
+    DerivedParameterNode: '#72cdf4',  # fds-blue
+    FlightAttributeNode: '#b88a00',  # brown
+    FlightPhaseNode: '#d93737',  # red
+    KeyPointValueNode: '#bed630',  # fds-green
+    KeyTimeInstanceNode: '#fdbb30',  # fds-orange
+}
+
+_static_graphs = {}
+STATIC_GRAPH_CACHE_SIZE = 8
+
+
+def static_graph(derived_nodes):
     """
-    :param node_mgr:
-    :type node_mgr: NodeManager
+    Node attributes, dependency edges and dependency names of derived nodes.
+    These only depend on the node modules in use so are built once per set
+    of derived nodes rather than for each flight.
+
+    :param derived_nodes: Derived node names to Node classes.
+    :type derived_nodes: dict
+    :rtype: StaticGraph
     """
-    # gr_all will contain all nodes
-    gr_all = nx.DiGraph()
-    # create nodes without attributes now as you can only add attributes once
-    # (limitation of add_node_attribute())
-    gr_all.add_nodes_from(node_mgr.hdf_keys, color='#72f4eb', # turquoise
-                          node_type='HDFNode')
-    derived_minus_lfl = dict_filter(node_mgr.derived_nodes,
-                                    remove=node_mgr.hdf_keys)
-    # Group into node types to apply colour. TODO: Make colours less garish.
-    colors = {
-        ApproachNode: '#663399', # purple
-        MultistateDerivedParameterNode: '#2aa52a', # dark green
-        DerivedParameterNode: '#72cdf4',  # fds-blue
-        FlightAttributeNode: '#b88a00',  # brown
-        FlightPhaseNode: '#d93737',  # red
-        KeyPointValueNode: '#bed630',  # fds-green
-        KeyTimeInstanceNode: '#fdbb30',  # fds-orange
-    }
-    derived_nodes = []
-    for name, node in derived_minus_lfl.items():
+    key = frozenset(six.iteritems(derived_nodes))
+    try:
+        return _static_graphs[key]
+    except KeyError:
+        pass
+
+    names = []
+    nodes = {}
+    edges = {}
+    successors = {}
+    dependencies = Counter()  # number of nodes depending on each name
+    for name, node in six.iteritems(derived_nodes):
         # the default is gray, if you see it, something is wrong
         color = '#888888'
         for base in node.__bases__:
-            if base in colors:
-                color = colors[base]
+            if base in NODE_COLORS:
+                color = NODE_COLORS[base]
                 break
+        names.append(name)
+        nodes[name] = {'color': color, 'node_type': node.__base__.__name__}
+        # Create edges between node and its dependencies
+        dependency_names = node.get_dependency_names()
+        dependencies.update(set(dependency_names))
+        edges[name] = [(name, dep, {'order': n})
+                       for (n, dep) in enumerate(dependency_names)]
+        # (dependency, order) as ordered by graph traversal. A repeated
+        # dependency keeps the order of its last argument, as in NetworkX.
+        orders = OrderedDict()
+        for (n, dep) in enumerate(dependency_names):
+            orders[dep] = n
+        successors[name] = sorted(orders.items(), key=lambda d: d[1])
+
+    if len(_static_graphs) >= STATIC_GRAPH_CACHE_SIZE:
+        _static_graphs.clear()
+    graph = _static_graphs[key] = StaticGraph(names, nodes, edges, successors,
+                                              dependencies)
+    return graph
 
-        node_info = (name, {'color': color,
-                            'node_type': node.__base__.__name__})
-        derived_nodes.append(node_info)
-    gr_all.add_nodes_from(derived_nodes)
 
-    # build list of dependencies
-    derived_deps = set()  # list of derived dependencies
-    for node_name, node_obj in six.iteritems(derived_minus_lfl):
-        derived_deps.update(node_obj.get_dependency_names())
-        # Create edges between node and its dependencies
+def graph_nodes(node_mgr):
+    """
+    NetworkX graph of all nodes, e.g. for drawing (see compact_graph).
+
+    :param node_mgr:
+    :type node_mgr: NodeManager
+    :rtype: nx.DiGraph
+    """
+    return compact_graph(node_mgr).to_networkx()
+
+
+class CompactGraph(object):
+    '''
+    Directed dependency graph with node names interned to integer IDs.
+
+    The successors of each node are stored in compressed sparse row (CSR)
+    arrays in traversal order, i.e. ordered by the arguments of the node's
+    derive method. Use to_networkx() to draw the graph or export it to JSON.
+    '''
+    def __init__(self, names, indptr, indices, orders, attributes):
+        '''
+        :param names: Node names indexed by ID.
+        :type names: [str]
+        :param indptr: Successors of node ID i are indices[indptr[i]:indptr[i + 1]].
+        :type indptr: np.ndarray
+        :param indices: Successor node IDs.
+        :type indices: np.ndarray
+        :param orders: Order of each edge within the derive method, -1 if not ordered.
+        :type orders: np.ndarray
+        :param attributes: Attributes of each node, e.g. color and node_type.
+        :type attributes: [dict]
+        '''
+        self.names = names
+        self.ids = {name: i for i, name in enumerate(names)}
+        self.indptr = indptr
+        self.indices = indices
+        self.orders = orders
+        self.attributes = attributes
+
+    @classmethod
+    def from_successors(cls, names, successors, attributes):
+        '''
+        :param names: Node names indexed by ID.
+        :type names: [str]
+        :param successors: (successor ID, order or None) of each node ID in traversal order.
+        :type successors: [[(int, int or None)]]
+        :param attributes: Attributes of each node.
+        :type attributes: [dict]
+        :rtype: CompactGraph
+        '''
+        indptr = np.zeros(len(names) + 1, dtype=np.int32)
+        np.cumsum([len(s) for s in successors], out=indptr[1:])
+        edges = list(chain.from_iterable(successors))
+        indices = np.array([e[0] for e in edges], dtype=np.int32)
+        orders = np.array([-1 if e[1] is None else e[1] for e in edges],
+                          dtype=np.int32)
+        return cls(names, indptr, indices, orders, attributes)
+
+    def __len__(self):
+        return len(self.names)
+
+    def __iter__(self):
+        return iter(self.names)
+
+    def __contains__(self, name):
+        return name in self.ids
+
+    def nodes(self):
+        return list(self.names)
+
+    def successors(self, name):
+        '''
+        :returns: Successors of the node in traversal order.
+        :rtype: [str]
+        '''
+        node_id = self.ids[name]
+        names = self.names
+        return [names[i] for i in
+                self.indices[self.indptr[node_id]:self.indptr[node_id + 1]]]
+
+    def predecessor_counts(self):
+        '''
+        :returns: Number of predecessors (nodes depending upon) each node.
+        :rtype: {str: int}
+        '''
+        counts = np.bincount(self.indices, minlength=len(self.names))
+        return dict(zip(self.names, counts.tolist()))
+
+    def subgraph(self, nodes):
+        '''
+        Graph of nodes and the edges between them, e.g. the spanning tree of
+        active nodes. Node attributes are copied.
+
+        :param nodes: Names of nodes to keep.
+        :type nodes: iterable of str
+        :rtype: CompactGraph
+        '''
+        keep = np.zeros(len(self.names), dtype=bool)
+        keep[[self.ids[n] for n in nodes]] = True
+        new_ids = np.cumsum(keep) - 1
+        sources = np.repeat(np.arange(len(self.names)), np.diff(self.indptr))
+        edges = keep[sources] & keep[self.indices]
+        indptr = np.zeros(int(keep.sum()) + 1, dtype=np.int32)
+        np.cumsum(np.bincount(new_ids[sources[edges]],
+                              minlength=len(indptr) - 1), out=indptr[1:])
+        kept = np.flatnonzero(keep)
+        return CompactGraph([self.names[i] for i in kept], indptr,
+                            new_ids[self.indices[edges]].astype(np.int32),
+                            self.orders[edges],
+                            [self.attributes[i].copy() for i in kept])
+
+    def to_networkx(self):
+        '''
+        Convert to a NetworkX DiGraph, e.g. for draw_graph or JSON export.
+        Edges to inactive nodes are coloured as by process_order.
+
+        :rtype: nx.DiGraph
+        '''
+        graph = nx.DiGraph()
+        graph.add_nodes_from(zip(self.names, self.attributes))
+        names = self.names
         edges = []
-        for (n, dep) in enumerate(node_obj.get_dependency_names()):
-            edges.append((node_name, dep, {'order':n}))
-        gr_all.add_edges_from(edges)
-
-    # add root - the top level application dependency structure based on required nodes
-    # filter only nodes which are at the top of the tree (no predecessors)
-    # TODO: Ask Chris about this causing problems with the trimmer.
-    gr_all.add_node('root', color='#ffffff')
-    root_edges = []
+        for node_id, name in enumerate(names):
+            for edge in range(self.indptr[node_id], self.indptr[node_id + 1]):
+                successor = self.indices[edge]
+                data = {}
+                if self.orders[edge] >= 0:
+                    data['order'] = int(self.orders[edge])
+                if self.attributes[successor].get('active') is False:
+                    data['color'] = '#c0c0c0'  # silver
+                edges.append((name, names[successor], data))
+        graph.add_edges_from(edges)
+        return graph
+
+
+DEPENDENCY_TREE_FORMAT = 'CompactGraph'
+DEPENDENCY_TREE_VERSION = 1
+
+
+def dumps_dependency_tree(graph):
+    '''
+    Compact JSON encoding of a dependency tree for storing within the HDF
+    file. Rather than a node-link dictionary per node and edge, the node
+    names are stored once, the edges as CSR integer arrays and the values of
+    each node attribute as a table of distinct values indexed per node.
+    Labels in the form "<position>: <name>" as set by process_order are
+    stored as the position only.
+
+    Use loads_dependency_tree to read the tree back into a NetworkX graph.
+
+    :param graph: Dependency tree, e.g. the spanning tree from process_order.
+    :type graph: CompactGraph
+    :returns: JSON encoded dependency tree.
+    :rtype: str
+    '''
+    names = graph.names
+    attributes = {}
+    for key in sorted(set(chain.from_iterable(graph.attributes))):
+        if key == 'label':
+            positions = []
+            for name, attrs in zip(names, graph.attributes):
+                label = attrs.get(key)
+                if label is None:
+                    positions.append(-1)
+                    continue
+                position = str(label).partition(': ')[0]
+                if not position.isdigit() or \
+                   label != '%d: %s' % (int(position), name):
+                    break
+                positions.append(int(position))
+            else:
+                attributes[key] = {'positions': positions}
+                continue
+        values = []
+        value_ids = {}
+        index = []
+        for attrs in graph.attributes:
+            if key not in attrs:
+                index.append(-1)
+                continue
+            value = attrs[key]
+            # bool and int values are distinguished by their JSON encoding.
+            value_key = json.dumps(value)
+            if value_key not in value_ids:
+                value_ids[value_key] = len(values)
+                values.append(value)
+            index.append(value_ids[value_key])
+        attributes[key] = {'values': values, 'index': index}
+
+    return json.dumps({
+        'format': DEPENDENCY_TREE_FORMAT,
+        'version': DEPENDENCY_TREE_VERSION,
+        'names': names,
+        'indptr': graph.indptr.tolist(),
+        'indices': graph.indices.tolist(),
+        'orders': graph.orders.tolist(),
+        'attributes': attributes,
+    }, separators=(',', ':'))
+
+
+def loads_dependency_tree(data):
+    '''
+    Read a dependency tree stored within the HDF file (hdf.dependency_tree)
+    into a NetworkX graph. Both the compact encoding of dumps_dependency_tree
+    and NetworkX node-link JSON, as stored by previous versions, are
+    supported.
+
+    :param data: Stored dependency tree, either JSON or the decoded object.
+    :type data: str, bytes or dict
+    :returns: Dependency tree.
+    :rtype: nx.DiGraph
+    '''
+    if isinstance(data, bytes):
+        data = data.decode('utf-8')
+    if isinstance(data, six.string_types):
+        data = json.loads(data)
+    if data.get('format') != DEPENDENCY_TREE_FORMAT:
+        return json_graph.node_link_graph(data)
+    if data['version'] > DEPENDENCY_TREE_VERSION:
+        raise ValueError("Unsupported dependency tree version: %s"
+                         % data['version'])
+
+    names = data['names']
+    attributes = [{} for _ in names]
+    for key, table in six.iteritems(data['attributes']):
+        if 'positions' in table:
+            for attrs, name, position in zip(attributes, names,
+                                             table['positions']):
+                if position >= 0:
+                    attrs[key] = '%d: %s' % (position, name)
+            continue
+        values = table['values']
+        for attrs, value_id in zip(attributes, table['index']):
+            if value_id >= 0:
+                attrs[key] = values[value_id]
+
+    graph = CompactGraph(names,
+                         np.array(data['indptr'], dtype=np.int32),
+                         np.array(data['indices'], dtype=np.int32),
+                         np.array(data['orders'], dtype=np.int32),
+                         attributes)
+    return graph.to_networkx()
+
+
+def compact_graph(node_mgr):
+    """
+    Build the graph of all LFL and derived nodes linked to their
+    dependencies, with a root node linked to the requested nodes.
+
+    :param node_mgr:
+    :type node_mgr: NodeManager
+    :rtype: CompactGraph
+    """
+    # OPT: Derived node attributes and edges are taken from the static graph
+    # of the node modules, only the LFL parameters and requested nodes vary
+    # between flights.
+    static = static_graph(node_mgr.derived_nodes)
+    hdf_keys = set(node_mgr.hdf_keys)
+    names = []
+    ids = {}
+    attributes = []
+
+    def add_node(name, attrs=None):
+        try:
+            node_id = ids[name]
+        except KeyError:
+            node_id = ids[name] = len(names)
+            names.append(name)
+            attributes.append({})
+        if attrs:
+            attributes[node_id].update(attrs)
+        return node_id
+
+    for name in node_mgr.hdf_keys:
+        add_node(name, {'color': '#72f4eb',  # turquoise
+                        'node_type': 'HDFNode'})
+    # derived nodes recorded within the LFL are not derived
+    derived_minus_lfl = [name for name in static.names
+                         if name not in hdf_keys]
+    for name in derived_minus_lfl:
+        add_node(name, static.nodes[name])
+
+    successors = {}
+    first_predecessor = {}
+    for name in derived_minus_lfl:
+        node_id = ids[name]
+        node_successors = successors[node_id] = []
+        for dep, order in static.successors[name]:
+            dep_id = add_node(dep)
+            node_successors.append((dep_id, order))
+            first_predecessor.setdefault(dep_id, node_id)
+
+    # build list of dependencies
+    dependencies = static.dependencies
+    if hdf_keys.intersection(static.nodes):
+        dependencies = dependencies.copy()
+        for name in hdf_keys.intersection(static.nodes):
+            dependencies.subtract(set(dep for _, dep, _ in static.edges[name]))
+    derived_deps = set(name for name, count in six.iteritems(dependencies)
+                       if count > 0)  # list of derived dependencies
+
+    # add root linked to requested nodes which do not have a requested node
+    # as predecessor, see any_predecessors_in_requested.
+    root_id = add_node('root', {'color': '#ffffff'})
+    requested = set(node_mgr.requested)
+    root_successors = successors[root_id] = []
     for node_req in node_mgr.requested:
-        if any_predecessors_in_requested(node_req, node_mgr.requested, gr_all):
-            # no need to link root to this requested node as one of it's
-            # predecessors will have the link therefore the tree will be
-            # built inclusive of this node.
+        if node_req not in ids:
+            # Missing requested nodes are raised below.
             continue
+        node_id = ids[node_req]
+        visited = set()
+        while node_id in first_predecessor and node_id not in visited:
+            visited.add(node_id)
+            node_id = first_predecessor[node_id]
+            if names[node_id] in requested:
+                break
         else:
-            # This node is required to build the tree
-            root_edges.append(('root', node_req))
-    gr_all.add_edges_from(root_edges) ##, color='red')
-
-    #TODO: Split this up into the following lists of nodes
-    # * LFL used
-    # * LFL unused
-    # * Derived used
-    # * Derived not operational
-    # * Derived not used -- coz not referenced by a dependency kpv etc therefore not part of the spanning tree
-
-    # Note: It's hard to tell whether a missing dependency is a mistyped
-    # reference to another derived parameter or a parameter not available on
-    # this LFL
-    # Set of all derived and LFL Nodes.
-    ##available_nodes = set(node_mgr.derived_nodes.keys()).union(set(node_mgr.hdf_keys))
+            root_edge = (ids[node_req], None)
+            if root_edge not in root_successors:
+                root_successors.append(root_edge)
+
     available_nodes = set(node_mgr.keys())
     # Missing dependencies.
     missing_derived_dep = list(derived_deps - available_nodes)
     # Missing dependencies which are requested.
-    missing_requested = list(set(node_mgr.requested) - available_nodes)
+    missing_requested = list(requested - available_nodes)
 
     if missing_derived_dep:
         logger.warning("Found %s dependencies which don't exist in LFL "
@@ -443,43 +819,56 @@ def graph_nodes(node_mgr):
     if missing_requested:
         raise ValueError("Missing requested parameters: %s" % missing_requested)
 
-    # Add missing nodes to graph so it shows everything. These should all be
-    # RAW parameters missing from the LFL unless something has gone wrong with
-    # the derived_nodes dict!
-    gr_all.add_nodes_from(missing_derived_dep, color='#6a6e70')  # fds-grey
+    for name in missing_derived_dep:
+        add_node(name, {'color': '#6a6e70'})  # fds-grey
 
-    return gr_all
+    return CompactGraph.from_successors(
+        names, [successors.get(i, []) for i in range(len(names))], attributes)
 
 
 def process_order(gr_all, node_mgr, raise_inoperable_requested=False,
                   raise_cir_dep=False, path_tree_file=None):
     """
     :param gr_all:
-    :type gr_all: nx.DiGraph
+    :type gr_all: nx.DiGraph or CompactGraph
     :param node_mgr:
     :type node_mgr: NodeManager
-    :returns:
-    :rtype:
+    :returns: All nodes, spanning tree of active nodes (both of the same type as gr_all) and processing order.
+    :rtype: (graph, graph, [str])
     """
-    process_order, tree_path = dependencies3(gr_all, 'root', node_mgr, raise_cir_dep=raise_cir_dep)
+    process_order, tree_path = dependencies3(
+        gr_all, 'root', node_mgr, raise_cir_dep=raise_cir_dep,
+        tree_path=bool(path_tree_file))
     logger.debug("Processing order of %d nodes is: %s", len(process_order), process_order)
     if path_tree_file:
         ordered_tree_to_file(tree_path, name=path_tree_file)
+    compact = isinstance(gr_all, CompactGraph)
+    node_attributes = gr_all.attributes if compact else None
     for n, node in enumerate(process_order):
-        gr_all.node[node]['label'] = '%d: %s' % (n, node)
-        gr_all.node[node]['active'] = True
+        attrs = node_attributes[gr_all.ids[node]] if compact else \
+            gr_all.node[node]
+        attrs['label'] = '%d: %s' % (n, node)
+        attrs['active'] = True
 
     inactive_nodes = set(gr_all.nodes()) - set(process_order)
     logger.debug("Inactive nodes: %s", list(sorted(inactive_nodes)))
-    gr_st = gr_all.copy()
-    gr_st.remove_nodes_from(inactive_nodes)
+    if compact:
+        gr_st = gr_all.subgraph(process_order)
+        for node in inactive_nodes:
+            # edges to inactive nodes are coloured by to_networkx()
+            attrs = node_attributes[gr_all.ids[node]]
+            attrs['color'] = '#c0c0c0'  # silver
+            attrs['active'] = False
+    else:
+        gr_st = gr_all.copy()
+        gr_st.remove_nodes_from(inactive_nodes)
 
-    for node in inactive_nodes:
-        # add attributes to the node to reflect it's inactivity
-        gr_all.node[node]['color'] = '#c0c0c0'  # silver
-        gr_all.node[node]['active'] = False
-        inactive_edges = gr_all.in_edges(node)
-        gr_all.add_edges_from(inactive_edges, color='#c0c0c0')  # silver
+        for node in inactive_nodes:
+            # add attributes to the node to reflect it's inactivity
+            gr_all.node[node]['color'] = '#c0c0c0'  # silver
+            gr_all.node[node]['active'] = False
+            inactive_edges = gr_all.in_edges(node)
+            gr_all.add_edges_from(inactive_edges, color='#c0c0c0')  # silver
 
     inoperable_requested = list(set(node_mgr.requested) - set(process_order))
     if inoperable_requested:
@@ -488,8 +877,9 @@ def process_order(gr_all, node_mgr, raise_inoperable_requested=False,
         if logging.NOTSET < logger.getEffectiveLevel() <= logging.DEBUG:
             # only build this massive tree if in debug!
             items = []
+            graph = gr_all.to_networkx() if compact else gr_all
             for n in sorted(inoperable_requested):
-                tree = indent_tree(gr_all, n, recurse_active=False)
+                tree = indent_tree(graph, n, recurse_active=False)
                 if tree:
                     items.append('------- INOPERABLE -------')
                     items.extend(tree)
@@ -529,21 +919,144 @@ def dependency_order(node_mgr, draw=not_windows,
     :param draw: Will draw the graph. Green nodes are available LFL params, Blue are operational derived, Black are not requested derived, Red are active top level requested params, Grey are inactive params. Edges are labelled with processing order.
     :type draw: boolean
     :returns: List of Nodes determining the order for processing and the spanning tree graph.
-    :rtype: (list of strings, dict)
+    :rtype: (list of strings, CompactGraph)
     """
-    _graph = graph_nodes(node_mgr)
+    _graph = compact_graph(node_mgr)
     gr_all, gr_st, order = process_order(_graph, node_mgr,
                                          raise_inoperable_requested=raise_inoperable_requested,
                                          raise_cir_dep=raise_cir_dep, path_tree_file=path_tree_file)
 
     if draw:
         from json import dumps
-        logger.info("JSON Graph Representation:\n%s", dumps(graph_adjacencies(gr_st), indent=2))
-        draw_graph(gr_st, 'Active Nodes in Spanning Tree')
+        nx_st = gr_st.to_networkx()
+        logger.info("JSON Graph Representation:\n%s", dumps(graph_adjacencies(nx_st), indent=2))
+        draw_graph(nx_st, 'Active Nodes in Spanning Tree')
         # reduce number of nodes by removing floating ones
-        gr_all = remove_floating_nodes(gr_all)
+        gr_all = remove_floating_nodes(gr_all.to_networkx())
         draw_graph(gr_all, 'Dependency Tree')
 
     return order, gr_st
 
 
+# Critical path of the spanning tree with the cost (duration in seconds) of
+# each node. speedup is the theoretical speedup from processing nodes in
+# parallel, the total work divided by the cost of the critical path.
+CriticalPath = namedtuple('CriticalPath', 'path cost work speedup')
+
+
+def node_costs(timings):
+    '''
+    Cost of each node as the median duration of deriving it across runs,
+    e.g. collected with derive_parameters(timings=...).
+
+    :param timings: Durations of nodes in seconds for each run.
+    :type timings: iterable of {str: float}
+    :returns: Median duration of each node in seconds.
+    :rtype: {str: float}
+    '''
+    durations = {}
+    for run in timings:
+        for name, duration in six.iteritems(run):
+            durations.setdefault(name, []).append(duration)
+    return {name: float(np.median(values))
+            for name, values in six.iteritems(durations)}
+
+
+def _node_attributes(graph, name):
+    if isinstance(graph, CompactGraph):
+        return graph.attributes[graph.ids[name]]
+    return graph.node[name]
+
+
+def critical_path(graph, order, costs, default_cost=0.0):
+    '''
+    Find the most expensive chain of dependencies within the spanning tree,
+    which bounds the duration of processing the flight however many nodes
+    are derived in parallel.
+
+    Only dependencies processed earlier in the order are considered, so
+    edges of circular dependencies between active nodes are ignored. Nodes
+    of the graph are annotated with their 'cost' and the 'finish' time of
+    the node given unlimited parallelism.
+
+    :param graph: Spanning tree of active nodes from dependency_order.
+    :type graph: nx.DiGraph or CompactGraph
+    :param order: Processing order from dependency_order.
+    :type order: [str]
+    :param costs: Cost of each node in seconds, see node_costs.
+    :type costs: {str: float}
+    :param default_cost: Cost of nodes without a cost, e.g. LFL parameters.
+    :type default_cost: float
+    :rtype: CriticalPath
+    '''
+    finish = {}
+    previous = {}  # most expensive dependency of each node
+    work = 0.0
+    for name in order:
+        cost = costs.get(name, default_cost)
+        work += cost
+        start = 0.0
+        for dependency in graph.successors(name):
+            if finish.get(dependency, -1.0) > start:
+                start = finish[dependency]
+                previous[name] = dependency
+        finish[name] = start + cost
+        attrs = _node_attributes(graph, name)
+        attrs['cost'] = cost
+        attrs['finish'] = finish[name]
+
+    if not finish:
+        return CriticalPath([], 0.0, 0.0, 1.0)
+    name = max(order, key=finish.get)
+    path = [name]
+    while path[-1] in previous:
+        path.append(previous[path[-1]])
+    path.reverse()
+    cost = finish[name]
+    return CriticalPath(path, cost, work, work / cost if cost else 1.0)
+
+
+def node_priorities(graph, order, costs, default_cost=0.0):
+    '''
+    Priority of each node for scheduling nodes to process in parallel: the
+    cost of the node plus the most expensive chain of nodes depending upon
+    it. Of the nodes whose dependencies are available, those with the
+    highest priority should be processed first.
+
+    :param graph: Spanning tree of active nodes from dependency_order.
+    :type graph: nx.DiGraph or CompactGraph
+    :param order: Processing order from dependency_order.
+    :type order: [str]
+    :param costs: Cost of each node in seconds, see node_costs.
+    :type costs: {str: float}
+    :param default_cost: Cost of nodes without a cost, e.g. LFL parameters.
+    :type default_cost: float
+    :rtype: {str: float}
+    '''
+    positions = {name: n for n, name in enumerate(order)}
+    priorities = dict.fromkeys(order, 0.0)
+    for n in range(len(order) - 1, -1, -1):
+        name = order[n]
+        priority = priorities[name] = \
+            priorities[name] + costs.get(name, default_cost)
+        for dependency in graph.successors(name):
+            if positions.get(dependency, n) < n and \
+               priorities[dependency] < priority:
+                priorities[dependency] = priority
+    return priorities
+
+
+def format_critical_paths(critical_paths):
+    '''
+    Report of the critical path of each flight type.
+
+    :param critical_paths: Critical path of each flight type.
+    :type critical_paths: {str: CriticalPath}
+    :rtype: [str]
+    '''
+    lines = []
+    for flight_type, path in sorted(critical_paths.items()):
+        lines.append('%s: critical path %.3fs, work %.3fs, speedup %.2f' % (
+            flight_type, path.cost, path.work, path.speedup))
+        lines.extend('  - %s' % name for name in path.path)
+    return lines
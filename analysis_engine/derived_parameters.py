@@ -28,8 +28,8 @@ from analysis_engine.library import (air_track,
                                      alt2press,
                                      alt2sat,
                                      alt_dev2alt,
+                                     average_params,
                                      bearing_and_distance,
-                                     bearings_and_distances,
                                      blend_parameters,
                                      blend_two_parameters,
                                      cas2dp,
@@ -62,9 +62,11 @@ from analysis_engine.library import (air_track,
                                      mask_inside_slices,
                                      mask_outside_slices,
                                      match_altitudes,
+                                     max_params,
                                      max_value,
                                      mb2ft,
                                      merge_masks,
+                                     min_params,
                                      most_common_value,
                                      moving_average,
                                      nearest_neighbour_mask_repair,
@@ -102,9 +104,10 @@ from analysis_engine.library import (air_track,
                                      smooth_track,
                                      straighten_altitudes,
                                      straighten_headings,
+                                     sum_params,
+                                     track_bearings_and_distances,
                                      track_linking,
                                      value_at_index,
-                                     vstack_params,
                                      vstack_params_sw)
 
 from analysis_engine.settings import (
@@ -2084,8 +2087,7 @@ class Brake_TempAvg(DerivedParameterNode):
                brake8=P('Brake (8) Temp')):
 
         brake_params = (brake1, brake2, brake3, brake4, brake5, brake6, brake7, brake8)
-        brakes = vstack_params(*brake_params)
-        self.array = np.ma.average(brakes, axis=0)
+        self.array = average_params(*brake_params)
         self.offset = offset_select('mean', brake_params)
 
 
@@ -2116,8 +2118,7 @@ class Brake_TempMax(DerivedParameterNode):
                brake8=P('Brake (8) Temp')):
 
         brake_params = (brake1, brake2, brake3, brake4, brake5, brake6, brake7, brake8)
-        brakes = vstack_params(*brake_params)
-        self.array = np.ma.max(brakes, axis=0)
+        self.array = max_params(*brake_params)
         self.offset = offset_select('mean', brake_params)
 
 
@@ -2148,8 +2149,7 @@ class Brake_TempMin(DerivedParameterNode):
                brake8=P('Brake (8) Temp')):
 
         brake_params = (brake1, brake2, brake3, brake4, brake5, brake6, brake7, brake8)
-        brakes = vstack_params(*brake_params)
-        self.array = np.ma.min(brakes, axis=0)
+        self.array = min_params(*brake_params)
         self.offset = offset_select('mean', brake_params)
 
 ##############################################################################
@@ -2175,8 +2175,7 @@ class Eng_EPRAvg(DerivedParameterNode):
                eng3=P('Eng (3) EPR'),
                eng4=P('Eng (4) EPR')):
 
-        engines = vstack_params(eng1, eng2, eng3, eng4)
-        self.array = np.ma.average(engines, axis=0)
+        self.array = average_params(eng1, eng2, eng3, eng4)
         self.offset = offset_select('mean', [eng1, eng2, eng3, eng4])
 
 
@@ -2199,8 +2198,7 @@ class Eng_EPRMax(DerivedParameterNode):
                eng3=P('Eng (3) EPR'),
                eng4=P('Eng (4) EPR')):
 
-        engines = vstack_params(eng1, eng2, eng3, eng4)
-        self.array = np.ma.max(engines, axis=0)
+        self.array = max_params(eng1, eng2, eng3, eng4)
         self.offset = offset_select('mean', [eng1, eng2, eng3, eng4])
 
 
@@ -2223,8 +2221,7 @@ class Eng_EPRMin(DerivedParameterNode):
                eng3=P('Eng (3) EPR'),
                eng4=P('Eng (4) EPR')):
 
-        engines = vstack_params(eng1, eng2, eng3, eng4)
-        self.array = np.ma.min(engines, axis=0)
+        self.array = min_params(eng1, eng2, eng3, eng4)
         self.offset = offset_select('mean', [eng1, eng2, eng3, eng4])
 
 
@@ -2288,8 +2285,7 @@ class Eng_TPRMax(DerivedParameterNode):
                eng3=P('Eng (3) TPR'),
                eng4=P('Eng (4) TPR')):
 
-        engines = vstack_params(eng1, eng2, eng3, eng4)
-        self.array = np.ma.max(engines, axis=0)
+        self.array = max_params(eng1, eng2, eng3, eng4)
         self.offset = offset_select('mean', [eng1, eng2, eng3, eng4])
 
 
@@ -2312,8 +2308,7 @@ class Eng_TPRMin(DerivedParameterNode):
                eng3=P('Eng (3) TPR'),
                eng4=P('Eng (4) TPR')):
 
-        engines = vstack_params(eng1, eng2, eng3, eng4)
-        self.array = np.ma.min(engines, axis=0)
+        self.array = min_params(eng1, eng2, eng3, eng4)
         self.offset = offset_select('mean', [eng1, eng2, eng3, eng4])
 
 
@@ -2341,8 +2336,7 @@ class Eng_FuelFlow(DerivedParameterNode):
                eng4=P('Eng (4) Fuel Flow')):
 
         # assume all engines Fuel Flow are record at the same frequency
-        engines = vstack_params(eng1, eng2, eng3, eng4)
-        self.array = np.ma.sum(engines, axis=0)
+        self.array = sum_params(eng1, eng2, eng3, eng4)
         self.offset = offset_select('mean', [eng1, eng2, eng3, eng4])
 
 
@@ -2370,8 +2364,7 @@ class Eng_FuelFlowMin(DerivedParameterNode):
                eng3=P('Eng (3) Fuel Flow'),
                eng4=P('Eng (4) Fuel Flow')):
 
-        engines = vstack_params(eng1, eng2, eng3, eng4)
-        self.array = np.ma.min(engines, axis=0)
+        self.array = min_params(eng1, eng2, eng3, eng4)
 
 
 class Eng_FuelFlowMax(DerivedParameterNode):
@@ -2398,8 +2391,7 @@ class Eng_FuelFlowMax(DerivedParameterNode):
                eng3=P('Eng (3) Fuel Flow'),
                eng4=P('Eng (4) Fuel Flow')):
 
-        engines = vstack_params(eng1, eng2, eng3, eng4)
-        self.array = np.ma.max(engines, axis=0)
+        self.array = max_params(eng1, eng2, eng3, eng4)
 
 
 ##############################################################################
@@ -2485,8 +2477,7 @@ class Eng_FuelBurn(DerivedParameterNode):
                eng3=P('Eng (3) Fuel Burn'),
                eng4=P('Eng (4) Fuel Burn')):
 
-        engines = vstack_params(eng1, eng2, eng3, eng4)
-        self.array = np.ma.sum(engines, axis=0)
+        self.array = sum_params(eng1, eng2, eng3, eng4)
         self.offset = offset_select('mean', [eng1, eng2, eng3, eng4])
 
 
@@ -2513,8 +2504,7 @@ class Eng_GasTempAvg(DerivedParameterNode):
                eng3=P('Eng (3) Gas Temp'),
                eng4=P('Eng (4) Gas Temp')):
 
-        engines = vstack_params(eng1, eng2, eng3, eng4)
-        self.array = np.ma.average(engines, axis=0)
+        self.array = average_params(eng1, eng2, eng3, eng4)
         self.offset = offset_select('mean', [eng1, eng2, eng3, eng4])
 
 
@@ -2537,8 +2527,7 @@ class Eng_GasTempMax(DerivedParameterNode):
                eng3=P('Eng (3) Gas Temp'),
                eng4=P('Eng (4) Gas Temp')):
 
-        engines = vstack_params(eng1, eng2, eng3, eng4)
-        self.array = np.ma.max(engines, axis=0)
+        self.array = max_params(eng1, eng2, eng3, eng4)
         self.offset = offset_select('mean', [eng1, eng2, eng3, eng4])
 
 
@@ -2561,8 +2550,7 @@ class Eng_GasTempMin(DerivedParameterNode):
                eng3=P('Eng (3) Gas Temp'),
                eng4=P('Eng (4) Gas Temp')):
 
-        engines = vstack_params(eng1, eng2, eng3, eng4)
-        self.array = np.ma.min(engines, axis=0)
+        self.array = min_params(eng1, eng2, eng3, eng4)
         self.offset = offset_select('mean', [eng1, eng2, eng3, eng4])
 
 
@@ -2594,8 +2582,7 @@ class Eng_N1Avg(DerivedParameterNode):
                eng3=P('Eng (3) N1'),
                eng4=P('Eng (4) N1')):
 
-        engines = vstack_params(eng1, eng2, eng3, eng4)
-        self.array = np.ma.average(engines, axis=0)
+        self.array = average_params(eng1, eng2, eng3, eng4)
 
 
 class Eng_N1AvgFor10Sec(DerivedParameterNode):
@@ -2635,8 +2622,7 @@ class Eng_N1Max(DerivedParameterNode):
                eng3=P('Eng (3) N1'),
                eng4=P('Eng (4) N1')):
 
-        engines = vstack_params(eng1, eng2, eng3, eng4)
-        self.array = np.ma.max(engines, axis=0)
+        self.array = max_params(eng1, eng2, eng3, eng4)
 
 
 class Eng_N1Min(DerivedParameterNode):
@@ -2663,8 +2649,7 @@ class Eng_N1Min(DerivedParameterNode):
                eng3=P('Eng (3) N1'),
                eng4=P('Eng (4) N1')):
 
-        engines = vstack_params(eng1, eng2, eng3, eng4)
-        self.array = np.ma.min(engines, axis=0)
+        self.array = min_params(eng1, eng2, eng3, eng4)
 
 
 class Eng_N1Split(DerivedParameterNode):
@@ -2735,8 +2720,7 @@ class Eng_N2Avg(DerivedParameterNode):
                eng3=P('Eng (3) N2'),
                eng4=P('Eng (4) N2')):
 
-        engines = vstack_params(eng1, eng2, eng3, eng4)
-        self.array = np.ma.average(engines, axis=0)
+        self.array = average_params(eng1, eng2, eng3, eng4)
 
 
 class Eng_N2Max(DerivedParameterNode):
@@ -2763,8 +2747,7 @@ class Eng_N2Max(DerivedParameterNode):
                eng3=P('Eng (3) N2'),
                eng4=P('Eng (4) N2')):
 
-        engines = vstack_params(eng1, eng2, eng3, eng4)
-        self.array = np.ma.max(engines, axis=0)
+        self.array = max_params(eng1, eng2, eng3, eng4)
 
 
 class Eng_N2Min(DerivedParameterNode):
@@ -2791,8 +2774,7 @@ class Eng_N2Min(DerivedParameterNode):
                eng3=P('Eng (3) N2'),
                eng4=P('Eng (4) N2')):
 
-        engines = vstack_params(eng1, eng2, eng3, eng4)
-        self.array = np.ma.min(engines, axis=0)
+        self.array = min_params(eng1, eng2, eng3, eng4)
 
 
 ##############################################################################
@@ -2823,8 +2805,7 @@ class Eng_N3Avg(DerivedParameterNode):
                eng3=P('Eng (3) N3'),
                eng4=P('Eng (4) N3')):
 
-        engines = vstack_params(eng1, eng2, eng3, eng4)
-        self.array = np.ma.average(engines, axis=0)
+        self.array = average_params(eng1, eng2, eng3, eng4)
 
 
 class Eng_N3Max(DerivedParameterNode):
@@ -2851,8 +2832,7 @@ class Eng_N3Max(DerivedParameterNode):
                eng3=P('Eng (3) N3'),
                eng4=P('Eng (4) N3')):
 
-        engines = vstack_params(eng1, eng2, eng3, eng4)
-        self.array = np.ma.max(engines, axis=0)
+        self.array = max_params(eng1, eng2, eng3, eng4)
 
 
 class Eng_N3Min(DerivedParameterNode):
@@ -2879,8 +2859,7 @@ class Eng_N3Min(DerivedParameterNode):
                eng3=P('Eng (3) N3'),
                eng4=P('Eng (4) N3')):
 
-        engines = vstack_params(eng1, eng2, eng3, eng4)
-        self.array = np.ma.min(engines, axis=0)
+        self.array = min_params(eng1, eng2, eng3, eng4)
 
 
 ##############################################################################
@@ -2911,8 +2890,7 @@ class Eng_NpAvg(DerivedParameterNode):
                eng3=P('Eng (3) Np'),
                eng4=P('Eng (4) Np')):
 
-        engines = vstack_params(eng1, eng2, eng3, eng4)
-        self.array = np.ma.average(engines, axis=0)
+        self.array = average_params(eng1, eng2, eng3, eng4)
 
 
 class Eng_NpMax(DerivedParameterNode):
@@ -2939,8 +2917,7 @@ class Eng_NpMax(DerivedParameterNode):
                eng3=P('Eng (3) Np'),
                eng4=P('Eng (4) Np')):
 
-        engines = vstack_params(eng1, eng2, eng3, eng4)
-        self.array = np.ma.max(engines, axis=0)
+        self.array = max_params(eng1, eng2, eng3, eng4)
 
 
 class Eng_NpMin(DerivedParameterNode):
@@ -2967,8 +2944,7 @@ class Eng_NpMin(DerivedParameterNode):
                eng3=P('Eng (3) Np'),
                eng4=P('Eng (4) Np')):
 
-        engines = vstack_params(eng1, eng2, eng3, eng4)
-        self.array = np.ma.min(engines, axis=0)
+        self.array = min_params(eng1, eng2, eng3, eng4)
 
 
 ##############################################################################
@@ -2994,8 +2970,7 @@ class Eng_OilPressAvg(DerivedParameterNode):
                eng3=P('Eng (3) Oil Press'),
                eng4=P('Eng (4) Oil Press')):
 
-        engines = vstack_params(eng1, eng2, eng3, eng4)
-        self.array = np.ma.average(engines, axis=0)
+        self.array = average_params(eng1, eng2, eng3, eng4)
         self.offset = offset_select('mean', [eng1, eng2, eng3, eng4])
 
 
@@ -3018,8 +2993,7 @@ class Eng_OilPressMax(DerivedParameterNode):
                eng3=P('Eng (3) Oil Press'),
                eng4=P('Eng (4) Oil Press')):
 
-        engines = vstack_params(eng1, eng2, eng3, eng4)
-        self.array = np.ma.max(engines, axis=0)
+        self.array = max_params(eng1, eng2, eng3, eng4)
         self.offset = offset_select('mean', [eng1, eng2, eng3, eng4])
 
 
@@ -3042,8 +3016,7 @@ class Eng_OilPressMin(DerivedParameterNode):
                eng3=P('Eng (3) Oil Press'),
                eng4=P('Eng (4) Oil Press')):
 
-        engines = vstack_params(eng1, eng2, eng3, eng4)
-        self.array = np.ma.min(engines, axis=0)
+        self.array = min_params(eng1, eng2, eng3, eng4)
         self.offset = offset_select('mean', [eng1, eng2, eng3, eng4])
 
 
@@ -3070,8 +3043,7 @@ class Eng_OilQtyAvg(DerivedParameterNode):
                eng3=P('Eng (3) Oil Qty'),
                eng4=P('Eng (4) Oil Qty')):
 
-        engines = vstack_params(eng1, eng2, eng3, eng4)
-        self.array = np.ma.average(engines, axis=0)
+        self.array = average_params(eng1, eng2, eng3, eng4)
         self.offset = offset_select('mean', [eng1, eng2, eng3, eng4])
 
 
@@ -3094,8 +3066,7 @@ class Eng_OilQtyMax(DerivedParameterNode):
                eng3=P('Eng (3) Oil Qty'),
                eng4=P('Eng (4) Oil Qty')):
 
-        engines = vstack_params(eng1, eng2, eng3, eng4)
-        self.array = np.ma.max(engines, axis=0)
+        self.array = max_params(eng1, eng2, eng3, eng4)
         self.offset = offset_select('mean', [eng1, eng2, eng3, eng4])
 
 
@@ -3118,8 +3089,7 @@ class Eng_OilQtyMin(DerivedParameterNode):
                eng3=P('Eng (3) Oil Qty'),
                eng4=P('Eng (4) Oil Qty')):
 
-        engines = vstack_params(eng1, eng2, eng3, eng4)
-        self.array = np.ma.min(engines, axis=0)
+        self.array = min_params(eng1, eng2, eng3, eng4)
         self.offset = offset_select('mean', [eng1, eng2, eng3, eng4])
 
 
@@ -3146,8 +3116,7 @@ class Eng_OilTempAvg(DerivedParameterNode):
                eng3=P('Eng (3) Oil Temp'),
                eng4=P('Eng (4) Oil Temp')):
 
-        engines = vstack_params(eng1, eng2, eng3, eng4)
-        avg_array = np.ma.average(engines, axis=0)
+        avg_array = average_params(eng1, eng2, eng3, eng4)
         if np.ma.count(avg_array) != 0:
             self.array = avg_array
             self.offset = offset_select('mean', [eng1, eng2, eng3, eng4])
@@ -3176,8 +3145,7 @@ class Eng_OilTempMax(DerivedParameterNode):
                eng3=P('Eng (3) Oil Temp'),
                eng4=P('Eng (4) Oil Temp')):
 
-        engines = vstack_params(eng1, eng2, eng3, eng4)
-        max_array = np.ma.max(engines, axis=0)
+        max_array = max_params(eng1, eng2, eng3, eng4)
         if np.ma.count(max_array) != 0:
             self.array = max_array
             self.offset = offset_select('mean', [eng1, eng2, eng3, eng4])
@@ -3206,8 +3174,7 @@ class Eng_OilTempMin(DerivedParameterNode):
                eng3=P('Eng (3) Oil Temp'),
                eng4=P('Eng (4) Oil Temp')):
 
-        engines = vstack_params(eng1, eng2, eng3, eng4)
-        min_array = np.ma.min(engines, axis=0)
+        min_array = min_params(eng1, eng2, eng3, eng4)
         if np.ma.count(min_array) != 0:
             self.array = min_array
             self.offset = offset_select('mean', [eng1, eng2, eng3, eng4])
@@ -3240,8 +3207,7 @@ class Eng_TorqueAvg(DerivedParameterNode):
                eng3=P('Eng (3) Torque'),
                eng4=P('Eng (4) Torque')):
 
-        engines = vstack_params(eng1, eng2, eng3, eng4)
-        self.array = np.ma.average(engines, axis=0)
+        self.array = average_params(eng1, eng2, eng3, eng4)
         self.offset = offset_select('mean', [eng1, eng2, eng3, eng4])
 
 
@@ -3264,8 +3230,7 @@ class Eng_TorqueMax(DerivedParameterNode):
                eng3=P('Eng (3) Torque'),
                eng4=P('Eng (4) Torque')):
 
-        engines = vstack_params(eng1, eng2, eng3, eng4)
-        self.array = np.ma.max(engines, axis=0)
+        self.array = max_params(eng1, eng2, eng3, eng4)
         self.offset = offset_select('mean', [eng1, eng2, eng3, eng4])
 
 
@@ -3287,8 +3252,7 @@ class Eng_TorqueMin(DerivedParameterNode):
                eng3=P('Eng (3) Torque'),
                eng4=P('Eng (4) Torque')):
 
-        engines = vstack_params(eng1, eng2, eng3, eng4)
-        self.array = np.ma.min(engines, axis=0)
+        self.array = min_params(eng1, eng2, eng3, eng4)
         self.offset = offset_select('mean', [eng1, eng2, eng3, eng4])
 
 
@@ -3346,8 +3310,7 @@ class Eng_VibN1Max(DerivedParameterNode):
                gear2=P('Eng (2) Vib N1 Gearbox')):
 
         params = eng1, eng2, eng3, eng4, fan1, fan2, fan3, fan4, lpt1, lpt2, lpt3, lpt4, comp1, comp2, gear1, gear2
-        engines = vstack_params(*params)
-        self.array = np.ma.max(engines, axis=0)
+        self.array = max_params(*params)
         self.offset = offset_select('mean', params)
 
 
@@ -3383,8 +3346,7 @@ class Eng_VibN2Max(DerivedParameterNode):
                hpt4=P('Eng (4) Vib N2 Turbine')):
 
         params = eng1, eng2, eng3, eng4, hpc1, hpc2, hpt1, hpt2, hpt3, hpt4
-        engines = vstack_params(*params)
-        self.array = np.ma.max(engines, axis=0)
+        self.array = max_params(*params)
         self.offset = offset_select('mean', params)
 
 
@@ -3418,8 +3380,7 @@ class Eng_VibN3Max(DerivedParameterNode):
                hpt4=P('Eng (4) Vib N3 Turbine')):
 
         params = eng1, eng2, eng3, eng4, hpt1, hpt2, hpt3, hpt4
-        engines = vstack_params(*params)
-        self.array = np.ma.max(engines, axis=0)
+        self.array = max_params(*params)
         self.offset = offset_select('mean', params)
 
 
@@ -3466,8 +3427,7 @@ class Eng_VibBroadbandMax(DerivedParameterNode):
                   eng1_accel_a, eng2_accel_a, eng3_accel_a, eng4_accel_a,
                   eng1_accel_b, eng2_accel_b, eng3_accel_b, eng4_accel_b)
 
-        engines = vstack_params(*params)
-        self.array = np.ma.max(engines, axis=0)
+        self.array = max_params(*params)
         self.offset = offset_select('mean', params)
 
 
@@ -3499,8 +3459,7 @@ class Eng_VibNpMax(DerivedParameterNode):
                gear2=P('Eng (2) Vib Np Gearbox')):
 
         params = eng1, eng2, fan1, fan2, lpt1, lpt2, comp1, comp2, gear1, gear2
-        engines = vstack_params(*params)
-        self.array = np.ma.max(engines, axis=0)
+        self.array = max_params(*params)
         self.offset = offset_select('mean', params)
 
 ##############################################################################
@@ -3529,8 +3488,7 @@ class Eng_VibAMax(DerivedParameterNode):
                eng4=P('Eng (4) Vib (A)')):
 
         params = eng1, eng2, eng3, eng4
-        engines = vstack_params(*params)
-        self.array = np.ma.max(engines, axis=0)
+        self.array = max_params(*params)
         self.offset = offset_select('mean', params)
 
 
@@ -3560,8 +3518,7 @@ class Eng_VibBMax(DerivedParameterNode):
                eng4=P('Eng (4) Vib (B)')):
 
         params = eng1, eng2, eng3, eng4
-        engines = vstack_params(*params)
-        self.array = np.ma.max(engines, axis=0)
+        self.array = max_params(*params)
         self.offset = offset_select('mean', params)
 
 
@@ -3591,8 +3548,7 @@ class Eng_VibCMax(DerivedParameterNode):
                eng4=P('Eng (4) Vib (C)')):
 
         params = eng1, eng2, eng3, eng4
-        engines = vstack_params(*params)
-        self.array = np.ma.max(engines, axis=0)
+        self.array = max_params(*params)
         self.offset = offset_select('mean', params)
 
 
@@ -3684,8 +3640,7 @@ class FuelQty(DerivedParameterNode):
                 params.append(param)
 
         try:
-            stacked_params = vstack_params(*params)
-            self.array = np.ma.sum(stacked_params, axis=0)
+            self.array = sum_params(*params)
             self.array.mask = merge_masks([p.array.mask for p in params])
             self.offset = offset_select('mean', params)
         except:
@@ -4983,9 +4938,11 @@ class CoordinatesSmoothed(object):
                     localizer_on_cl = ils_localizer_align(runway)
 
                     # Find distances from the localizer
-                    _, distances = bearings_and_distances(lat.array[this_loc_slice],
-                                                          lon.array[this_loc_slice],
-                                                          localizer_on_cl)
+                    # OPT: The trig terms of lat and lon are memoized with
+                    # them, as both Latitude and Longitude Smoothed adjust
+                    # the same approaches.
+                    _, distances = track_bearings_and_distances(
+                        lat, lon, localizer_on_cl, this_loc_slice)
 
 
                     # At last, the conversion of ILS localizer data to latitude and longitude
@@ -6358,8 +6315,7 @@ class SAT(DerivedParameterNode):
                mach=P('Mach')):
         sat_params = [p for p in (sat1, sat2, sat3) if p is not None]
         if sat_params:
-            sats = vstack_params(*sat_params)
-            self.array = np.ma.average(sats, axis=0)
+            self.array = average_params(*sat_params)
             # Use average offset of the sat parameters
             self.offset = sum(p.offset for p in sat_params) / len(sat_params)
         else:
@@ -47,7 +47,6 @@ from analysis_engine.library import (ambiguous_runway,
                                      all_deps,
                                      all_of,
                                      any_of,
-                                     bearings_and_distances,
                                      bump,
                                      closest_unmasked_value,
                                      clump_multistate,
@@ -74,8 +73,10 @@ from analysis_engine.library import (ambiguous_runway,
                                      max_abs_value,
                                      max_continuous_unmasked,
                                      max_maintained_value,
+                                     max_params,
                                      max_value,
                                      median_value,
+                                     min_params,
                                      min_value,
                                      most_common_value,
                                      moving_average,
@@ -110,12 +111,12 @@ from analysis_engine.library import (ambiguous_runway,
                                      slices_remove_small_slices,
                                      slices_remove_small_gaps,
                                      string_array_to_mapped_array,
+                                     track_bearings_and_distances,
                                      trim_slices,
                                      level_off_index,
                                      valid_slices_within_array,
                                      value_at_index,
-                                     vstack_params_where_state,
-                                     vstack_params)
+                                     vstack_params_where_state)
 
 
 ##############################################################################
@@ -212,7 +213,7 @@ def thrust_reversers_working(landing, pwr, tr, threshold):
     high_power = np.ma.masked_less(pwr.array, threshold)
     high_power_slices = np.ma.clump_unmasked(high_power)
     high_power_landing_slices = slices_and(high_power_slices, [landing.slice])
-    return clump_multistate(tr.array, 'Deployed', high_power_landing_slices)
+    return clump_multistate(tr, 'Deployed', high_power_landing_slices)
 
 
 def remove_bump(airborne):
@@ -2009,7 +2010,7 @@ class AirspeedAtAPGoAroundEngaged(KeyPointValueNode):
                ap_mode=M('AP Pitch Mode (1)')):
 
         sections = slices_and(airs.get_slices(),
-                              clump_multistate(ap_mode.array, 'Go Around'))
+                              clump_multistate(ap_mode, 'Go Around'))
         for section in sections:
             index = section.start
             value = air_spd.array[index]
@@ -2029,7 +2030,7 @@ class AirspeedWhileAPHeadingEngagedMin(KeyPointValueNode):
     def derive(self, air_spd=P('Airspeed'), airs=S('Airborne'),
                ap_mode=M('AP Roll-Yaw Mode (1)')):
 
-        heads = clump_multistate(ap_mode.array, 'Heading')
+        heads = clump_multistate(ap_mode, 'Heading')
         if heads:
             sections = slices_and(airs.get_slices(), heads)
             self.create_kpv_from_slices(air_spd.array, sections, min_value)
@@ -2048,7 +2049,7 @@ class AirspeedWhileAPVerticalSpeedEngagedMin(KeyPointValueNode):
     def derive(self, air_spd=P('Airspeed'), airs=S('Airborne'),
                ap_mode=M('AP Collective Mode (1)')):
 
-        vss = clump_multistate(ap_mode.array, 'V/S')
+        vss = clump_multistate(ap_mode, 'V/S')
         if vss:
             sections = slices_and(airs.get_slices(), vss)
             self.create_kpv_from_slices(air_spd.array, sections, min_value)
@@ -4082,7 +4083,7 @@ class AirspeedAtThrustReversersSelection(KeyPointValueNode):
 
         slices = [s.slice for s in landings]  # TODO: use landings.get_slices()
         # TODO: Replace with positive state rather than "Not Stowed"
-        to_scan = clump_multistate(tr.array, 'Stowed', slices, condition=False)
+        to_scan = clump_multistate(tr, 'Stowed', slices, condition=False)
         self.create_kpv_from_slices(air_spd.array, to_scan, max_value)
 
 
@@ -4581,7 +4582,7 @@ class TouchdownToThrustReversersDeployedDuration(KeyPointValueNode):
         '''
         for landing in landings:
             # Only interested in first opening of reversers on this landing:
-            deploys = clump_multistate(tr.array, 'Deployed', landing.slice)
+            deploys = clump_multistate(tr, 'Deployed', landing.slice)
             try:
                 deployed = deploys[0].start
             except IndexError:
@@ -7154,10 +7155,8 @@ class RunwayOverrunWithoutSlowingDuration(KeyPointValueNode):
             if precise.value or ils_approach:
                 speed = gspd.array[land_roll] * scale
                 if precise.value:
-                    _, dist_to_end = bearings_and_distances(
-                        lat.array[land_roll],
-                        lon.array[land_roll],
-                        rwy.value['end'])
+                    _, dist_to_end = track_bearings_and_distances(
+                        lat, lon, rwy.value['end'], land_roll)
                     time_to_end = dist_to_end / speed
                 else:
                     distance_at_tdn = runway_distance_from_end(
@@ -9787,7 +9786,7 @@ class EngEPRAtTOGADuringTakeoffMax(KeyPointValueNode):
                eng_epr_max=P('Eng (*) EPR Max'),
                takeoff=S('Takeoff')):
 
-        indexes = find_edges_on_state_change('TOGA', toga.array,
+        indexes = find_edges_on_state_change('TOGA', toga,
                                              change='entering', phase=takeoff)
         for index in indexes:
             # Measure at known state instead of interpolated transition
@@ -9814,7 +9813,7 @@ class EngTPRAtTOGADuringTakeoffMin(KeyPointValueNode):
 
         Align to Takeoff And Go Around for most accurate state change indices.
         '''
-        indexes = find_edges_on_state_change('TOGA', toga.array,
+        indexes = find_edges_on_state_change('TOGA', toga,
                                              change='entering', phase=takeoff)
         for index in indexes:
             # Measure at known state instead of interpolated transition
@@ -10734,7 +10733,7 @@ class EngN1WithThrustReversersInTransitMax(KeyPointValueNode):
                landings=S('Landing')):
 
         slices = [s.slice for s in landings]
-        slices = clump_multistate(tr.array, 'In Transit', slices)
+        slices = clump_multistate(tr, 'In Transit', slices)
         self.create_kpv_from_slices(eng_n1_avg.array, slices, max_value)
 
 
@@ -10752,7 +10751,7 @@ class EngN1WithThrustReversersDeployedMax(KeyPointValueNode):
                landings=S('Landing')):
 
         slices = [s.slice for s in landings]
-        slices = clump_multistate(tr.array, 'Deployed', slices)
+        slices = clump_multistate(tr, 'Deployed', slices)
         self.create_kpv_from_slices(eng_n1_avg.array, slices, max_value)
 
 
@@ -10836,7 +10835,7 @@ class EngN1AtTOGADuringTakeoff(KeyPointValueNode):
         '''
         Align to Takeoff And Go Around for most accurate state change indices.
         '''
-        indexes = find_edges_on_state_change('TOGA', toga.array, change='entering', phase=takeoff)
+        indexes = find_edges_on_state_change('TOGA', toga, change='entering', phase=takeoff)
         for index in indexes:
             # Measure at known state instead of interpolated transition
             index = ceil(index)
@@ -12485,8 +12484,7 @@ class MGBOilTempMax(KeyPointValueNode):
 
     def derive(self, mgb=P('MGB Oil Temp'), mgb_fwd=P('MGB (Fwd) Oil Temp'),
                mgb_aft=P('MGB (Aft) Oil Temp'), airborne=S('Airborne')):
-        gearboxes = vstack_params(mgb, mgb_fwd, mgb_aft)
-        gearbox = np.ma.max(gearboxes, axis=0)
+        gearbox = max_params(mgb, mgb_fwd, mgb_aft)
         self.create_kpvs_within_slices(gearbox, airborne, max_value)
 
 
@@ -12507,8 +12505,7 @@ class MGBOilPressMax(KeyPointValueNode):
 
     def derive(self, mgb=P('MGB Oil Press'), mgb_fwd=P('MGB (Fwd) Oil Press'),
                mgb_aft=P('MGB (Aft) Oil Press'), airborne=S('Airborne')):
-        gearboxes = vstack_params(mgb, mgb_fwd, mgb_aft)
-        gearbox = np.ma.max(gearboxes, axis=0)
+        gearbox = max_params(mgb, mgb_fwd, mgb_aft)
         self.create_kpvs_within_slices(gearbox, airborne, max_value)
 
 
@@ -12529,8 +12526,7 @@ class MGBOilPressMin(KeyPointValueNode):
 
     def derive(self, mgb=P('MGB Oil Press'), mgb_fwd=P('MGB (Fwd) Oil Press'),
                mgb_aft=P('MGB (Aft) Oil Press'), airborne=S('Airborne')):
-        gearboxes = vstack_params(mgb, mgb_fwd, mgb_aft)
-        gearbox = np.ma.min(gearboxes, axis=0)
+        gearbox = min_params(mgb, mgb_fwd, mgb_aft)
         self.create_kpvs_within_slices(gearbox, airborne, min_value)
 
 
@@ -12757,7 +12753,7 @@ class HeadingDeviationFromRunwayAtTOGADuringTakeoff(KeyPointValueNode):
         '''
         if ambiguous_runway(rwy):
             return
-        indexes = find_edges_on_state_change('TOGA', toga.array, phase=takeoff)
+        indexes = find_edges_on_state_change('TOGA', toga, phase=takeoff)
         for index in indexes:
             # Measure at known state instead of interpolated transition
             index = ceil(index)
@@ -13867,7 +13863,7 @@ class GroundspeedAtTOGA(KeyPointValueNode):
         Note: Takeoff phase is used as this includes turning onto the runway
         whereas Takeoff Roll only starts after the aircraft is accelerating.
         '''
-        indexes = find_edges_on_state_change('TOGA', toga.array, phase=takeoffs)
+        indexes = find_edges_on_state_change('TOGA', toga, phase=takeoffs)
         for index in indexes:
             # Measure at known state instead of interpolated transition
             index = ceil(index)
@@ -14057,7 +14053,7 @@ class GroundspeedWhileAirborneWithASEOff(KeyPointValueNode):
     can_operate = helicopter_only
 
     def derive(self, gnd_spd=P('Groundspeed'), ase=M('ASE Engaged'), airborne=S('Airborne')):
-        sections = clump_multistate(ase.array, 'Engaged', airborne.get_slices(), False)
+        sections = clump_multistate(ase, 'Engaged', airborne.get_slices(), False)
         self.create_kpvs_within_slices(gnd_spd.array, sections, max_value)
 
 
@@ -16955,7 +16951,7 @@ class AltitudeWithSpeedbrakeDeployedDuringFinalApproachMin(KeyPointValueNode):
     def derive(self, alt_aal=P('Altitude AAL'),
                spd_brk=M('Speedbrake Selected'),
                fin_app=S('Final Approach')):
-        slices = clump_multistate(spd_brk.array, 'Deployed/Cmd Up',
+        slices = clump_multistate(spd_brk, 'Deployed/Cmd Up',
                                   fin_app.get_slices())
         self.create_kpvs_within_slices(alt_aal.array, slices, min_value)
 
@@ -18402,7 +18398,7 @@ class ThrustAsymmetryWithThrustReversersDeployedMax(KeyPointValueNode):
         #       late on the landing run is included, but corrupt data at engine
         #       start etc. should be rejected.
         # Note: Use not 'Stowed' as 'In Transit' implies partially 'Deployed':
-        slices = clump_multistate(tr.array, 'Stowed', mobile.get_slices(),
+        slices = clump_multistate(tr, 'Stowed', mobile.get_slices(),
                                   condition=False)
         # This KPV can trigger many times if the thrust reverser signal
         # toggles. This has been seen to happen after electrical power loss,
@@ -18444,7 +18440,7 @@ class ThrustAsymmetryWithThrustReversersDeployedDuration(KeyPointValueNode):
         #       start etc. should be rejected.
         slices = [s.slice for s in mobile]
         # Note: Use not 'Stowed' as 'In Transit' implies partially 'Deployed':
-        slices = clump_multistate(tr.array, 'Stowed', slices, condition=False)
+        slices = clump_multistate(tr, 'Stowed', slices, condition=False)
         for slice_ in slices:
             asymmetry = np.ma.masked_less(ta.array[slice_], 10.0)
             slices = np.ma.clump_unmasked(asymmetry)
@@ -16,6 +16,7 @@ from analysis_engine.library import (
     hysteresis,
     index_at_distance,
     index_at_value,
+    indices_at_values,
     is_index_within_slice,
     last_valid_sample,
     max_value,
@@ -1735,6 +1736,29 @@ class LandingTurnOffRunway(KeyTimeInstanceNode):
 ################################################################################
 
 
+def _altitude_indices(thresholds, alt_aal, alt_std, _slice):
+    '''
+    Indices where each altitude threshold is crossed within the slice, using
+    height above airfield up to the transition altitude and standard
+    altitudes above it.
+
+    :returns: Pairs of altitude threshold and index (or None), in the order
+        of the thresholds.
+    :rtype: [(int, float or None)]
+    '''
+    # OPT: Scan each altitude array once for all of its thresholds.
+    aal_thresholds = [t for t in thresholds if t <= TRANSITION_ALTITUDE]
+    std_thresholds = [t for t in thresholds if t > TRANSITION_ALTITUDE]
+    indices = {}
+    if aal_thresholds:
+        indices.update(zip(aal_thresholds, indices_at_values(
+            alt_aal.array, aal_thresholds, _slice)))
+    if std_thresholds:
+        indices.update(zip(std_thresholds, indices_at_values(
+            alt_std.array, std_thresholds, _slice)))
+    return [(t, indices[t]) for t in thresholds]
+
+
 class AltitudeWhenClimbing(KeyTimeInstanceNode):
     '''
     Creates KTIs at certain altitudes when the aircraft is climbing.
@@ -1752,17 +1776,11 @@ class AltitudeWhenClimbing(KeyTimeInstanceNode):
         climbs = list(takeoff) + list(initial_climb) + list(climb)
         climb_slices = slices_remove_small_gaps([c.slice for c in climbs])
         for climb_slice in climb_slices:
-            for alt_threshold in self.NAME_VALUES['altitude']:
-                # Will trigger a single KTI per height (if threshold is crossed)
-                # per climbing phase.
-                if alt_threshold <= TRANSITION_ALTITUDE:
-                    # Use height above airfield.
-                    alt = alt_aal.array
-                else:
-                    # Use standard altitudes.
-                    alt = alt_std.array
-
-                index = index_at_value(alt, alt_threshold, climb_slice)
+            # Will trigger a single KTI per height (if threshold is crossed)
+            # per climbing phase.
+            indices = _altitude_indices(self.NAME_VALUES['altitude'],
+                                        alt_aal, alt_std, climb_slice)
+            for alt_threshold, index in indices:
                 if index:
                     self.create_kti(index, altitude=alt_threshold)
 
@@ -1778,21 +1796,14 @@ class AltitudeWhenDescending(KeyTimeInstanceNode):
                alt_aal=P('Altitude AAL'),
                alt_std=P('Altitude STD Smoothed')):
         for descend in descending:
-            for alt_threshold in self.NAME_VALUES['altitude']:
-                # Will trigger a single KTI per height (if threshold is
-                # crossed) per descending phase. The altitude array is
-                # scanned backwards to make sure we trap the last instance at
-                # each height.
-                if alt_threshold <= TRANSITION_ALTITUDE:
-                    # Use height above airfield.
-                    alt = alt_aal.array
-                else:
-                    # Use standard altitudes.
-                    alt = alt_std.array
-
-                index = index_at_value(alt, alt_threshold,
-                                       slice(descend.slice.stop,
-                                             descend.slice.start, -1))
+            # Will trigger a single KTI per height (if threshold is
+            # crossed) per descending phase. The altitude array is
+            # scanned backwards to make sure we trap the last instance at
+            # each height.
+            indices = _altitude_indices(
+                self.NAME_VALUES['altitude'], alt_aal, alt_std,
+                slice(descend.slice.stop, descend.slice.start, -1))
+            for alt_threshold, index in indices:
                 if index:
                     self.create_kti(index, altitude=alt_threshold)
 
@@ -2117,7 +2128,7 @@ class LastEngFuelFlowStop(KeyTimeInstanceNode):
 class DistanceFromLocationMixin(object):
 
     def calculate(
-            self, datum_lat, datum_lon, lat, lon, distance, direction='forward',
+            self, datum_lat, datum_lon, lat, lon, distances, direction='forward',
             repair_mask_duration=None, _slice=slice(None, None, None)):
         assert direction in ('forward', 'backward'), 'Unsupported direction: "%s"' % direction
 
@@ -2131,19 +2142,22 @@ class DistanceFromLocationMixin(object):
             lat_array = repair_mask(lat_array, repair_duration=repair_mask_duration)
             lon_array = repair_mask(lon_array, repair_duration=repair_mask_duration)
 
-        distances = great_circle_distance__haversine(lat_array, lon_array, [datum_lat], [datum_lon], units=ut.NM)
-        if direction == 'backward':
-            back_slice = slice(_slice.stop, _slice.start, -1)
-            index = index_at_value(distances, distance, back_slice, endpoint='nearest')
-        else:
-            index = index_at_value(distances, distance, _slice)
+        # OPT: The distances from the datum are computed once for all of the
+        # distances sought.
+        datum_distances = great_circle_distance__haversine(lat_array, lon_array, [datum_lat], [datum_lon], units=ut.NM)
+        for distance in distances:
+            if direction == 'backward':
+                back_slice = slice(_slice.stop, _slice.start, -1)
+                index = index_at_value(datum_distances, distance, back_slice, endpoint='nearest')
+            else:
+                index = index_at_value(datum_distances, distance, _slice)
 
-        if index:
-            # Check result is valid, as it may be the nearest but not an acceptable solution.
-            error = abs(value_at_index(distances, index) - distance)
-            # Allow 1/20th of a mile to reject wrong runway cases (normally > 1/10th NM apart).
-            if error<0.05:
-                self.create_kti(index, replace_values={'distance': distance})
+            if index:
+                # Check result is valid, as it may be the nearest but not an acceptable solution.
+                error = abs(value_at_index(datum_distances, index) - distance)
+                # Allow 1/20th of a mile to reject wrong runway cases (normally > 1/10th NM apart).
+                if error<0.05:
+                    self.create_kti(index, replace_values={'distance': distance})
 
 
 class DistanceFromTakeoffAirport(KeyTimeInstanceNode, DistanceFromLocationMixin):
@@ -2170,11 +2184,10 @@ class DistanceFromTakeoffAirport(KeyTimeInstanceNode, DistanceFromLocationMixin)
 
         apt_lat = apt.value.get('latitude')
         apt_lon = apt.value.get('longitude')
-        for distance in self.NAME_VALUES['distance']:
-            self.calculate(
-                apt_lat, apt_lon, lat, lon, distance,
-                direction='forward', repair_mask_duration=60,
-                _slice=airs[0].slice)
+        self.calculate(
+            apt_lat, apt_lon, lat, lon, self.NAME_VALUES['distance'],
+            direction='forward', repair_mask_duration=60,
+            _slice=airs[0].slice)
 
 
 class DistanceFromLandingAirport(KeyTimeInstanceNode, DistanceFromLocationMixin):
@@ -2203,11 +2216,10 @@ class DistanceFromLandingAirport(KeyTimeInstanceNode, DistanceFromLocationMixin)
 
         apt_lat = apt.value.get('latitude')
         apt_lon = apt.value.get('longitude')
-        for distance in self.NAME_VALUES['distance']:
-            self.calculate(
-                apt_lat, apt_lon, lat, lon, distance,
-                direction='forward', repair_mask_duration=60,
-                _slice=airs[0].slice)
+        self.calculate(
+            apt_lat, apt_lon, lat, lon, self.NAME_VALUES['distance'],
+            direction='forward', repair_mask_duration=60,
+            _slice=airs[0].slice)
 
 
 class DistanceFromThreshold(KeyTimeInstanceNode, DistanceFromLocationMixin):
@@ -2229,8 +2241,8 @@ class DistanceFromThreshold(KeyTimeInstanceNode, DistanceFromLocationMixin):
         if len(airs)!=1:
             return # Only going to handle simple cases for now.
 
-        for distance in self.NAME_VALUES['distance']:
-            self.calculate(
-                rwy.value['start']['latitude'],
-                rwy.value['start']['longitude'],
-                lat, lon, distance, direction='backward', _slice=airs[0].slice)
+        self.calculate(
+            rwy.value['start']['latitude'],
+            rwy.value['start']['longitude'],
+            lat, lon, self.NAME_VALUES['distance'], direction='backward',
+            _slice=airs[0].slice)
@@ -4,6 +4,8 @@
 
 from __future__ import print_function
 
+import bisect
+import heapq
 import itertools
 import logging
 import math
@@ -17,10 +19,11 @@ from datetime import datetime, timedelta
 from decimal import Decimal
 from hashlib import sha256
 from math import ceil, copysign, cos, floor, log, radians, sin, sqrt, pow
-from operator import attrgetter
+from operator import attrgetter, itemgetter
 from scipy import interpolate as scipy_interpolate, optimize
+from scipy.linalg import solveh_banded
 from scipy.ndimage import filters
-from scipy.signal import medfilt
+from scipy.signal import lfilter, lfilter_zi, medfilt
 
 try:
     from itertools import izip as zip, izip_longest as zip_longest, tee
@@ -55,6 +58,9 @@ logger = logging.getLogger(name=__name__)
 
 Value = namedtuple('Value', 'index value')
 
+# Sine and cosine of angles and of half of the angles (see trig_terms).
+TrigTerms = namedtuple('TrigTerms', 'sin cos sin_half cos_half')
+
 
 class InvalidDatetime(ValueError):
     pass
@@ -335,7 +341,7 @@ def align(slave, master, interpolate=True):
     return wrap_array(slave.name, aligned)
 
 
-def align_args(slave_array, slave_frequency, slave_offset, master_frequency, master_offset=0, interpolate=True):
+def align_args(slave_array, slave_frequency, slave_offset, master_frequency, master_offset=0, interpolate=True, out=None):
     '''
     align implementation abstracted from Parameter class interface.
 
@@ -354,7 +360,11 @@ def align_args(slave_array, slave_frequency, slave_offset, master_frequency, mas
     :type master_frequency: int or float
     :type master_offset: int or float
     :type interpolate: bool
-    :returns: Slave array aligned to master.
+    :param out: Optional masked array of the aligned length to hold the
+        result, avoiding the allocation of a new array. Not supported for
+        MappedArrays or string arrays.
+    :type out: np.ma.masked_array or None
+    :returns: Slave array aligned to master (out if provided).
     :rtype: array of same type as slave_array
     '''
 
@@ -365,6 +375,8 @@ def align_args(slave_array, slave_frequency, slave_offset, master_frequency, mas
         slave_array = string_array_to_mapped_array(slave_array)
 
     if isinstance(slave_array, MappedArray):  # Multi-state array.
+        if out is not None:
+            raise ValueError('Cannot align multi-state arrays into an output array.')
         # force disable interpolate!
         mappings = slave_array.values_mapping
         slave_array = slave_array.raw
@@ -375,13 +387,110 @@ def align_args(slave_array, slave_frequency, slave_offset, master_frequency, mas
     else:
         raise ValueError('Cannot align slave array of unknown type.')
 
-    if len(slave_array) == 0:
-        # No elements to align, avoids exception being raised in the loop below.
-        return slave_array
-    if slave_frequency == master_frequency and slave_offset == master_offset:
-        # No alignment is required, return the slave's array unchanged.
+    if len(slave_array) == 0 or (slave_frequency == master_frequency and
+                                 slave_offset == master_offset):
+        # No elements to align or no alignment is required, return the
+        # slave's array unchanged.
+        if out is not None:
+            out[:] = slave_array
+            return out
         return slave_array
 
+    # OPT: The slices and interpolation coefficients only depend on the
+    # frequencies, offsets and length so are cached in an alignment plan.
+    plan = align_plan(slave_frequency, slave_offset, master_frequency,
+                      master_offset, len(slave_array), interpolate=interpolate)
+
+    if out is not None:
+        if len(out) != plan.length:
+            raise ValueError('Output array length %d does not match the '
+                             'aligned length %d' % (len(out), plan.length))
+        out.unshare_mask()
+        if out.mask is np.ma.nomask:
+            out.mask = np.zeros(len(out), dtype=bool)
+        aligned_data = out.data
+        aligned_mask = out.mask
+    elif plan.method != 'downsample':
+        aligned_data = np.zeros(plan.length, dtype=_dtype)
+        aligned_mask = np.zeros(plan.length, dtype=bool)
+
+    if plan.method == 'downsample':
+        # step through slave taking the required samples
+        if out is None:
+            return slave_array[0::plan.step]
+        aligned_data[:] = np.ma.getdata(slave_array)[0::plan.step]
+        aligned_mask[:] = np.ma.getmaskarray(slave_array)[0::plan.step]
+        return out
+
+    apply_align_plan(plan, np.ma.getdata(slave_array),
+                     np.ma.getmaskarray(slave_array), aligned_data,
+                     aligned_mask)
+    slave_aligned = out if out is not None else \
+        np.ma.array(aligned_data, mask=aligned_mask, copy=False)
+
+    if plan.method == 'upsample':
+        # Interpolate and do not extrapolate masked ends or gaps
+        # bigger than the duration between slave samples (i.e. where
+        # original slave data is masked).
+        # If array is fully masked, return array of masked zeros
+        dur_between_slave_samples = 1.0 / slave_frequency
+        return repair_mask(
+            slave_aligned,
+            frequency=master_frequency,
+            repair_duration=dur_between_slave_samples,
+            raise_entirely_masked=False,
+        )
+
+    if isinstance(original_array, MappedArray) or original_array.dtype.type is np.string_:
+        # return back to mapped array
+        mapped_array = MappedArray(np.ma.zeros(len(slave_aligned)).astype(_dtype), values_mapping=mappings)
+        mapped_array[:] = slave_aligned[:]
+        slave_aligned = mapped_array
+
+    if original_array.dtype.type is np.string_:
+        # return back to string array
+        slave_aligned = mapped_array_to_string_array(slave_aligned)
+
+    return slave_aligned
+
+
+# Precomputed alignment of a slave to a master. method is 'upsample'
+# (populate every step'th sample and repair the mask), 'downsample' (take
+# every step'th sample) or 'interpolate', where each phase is a tuple of
+# (aligned slice, a, b, slave slice for a, slave slice for b, padding index
+# or None) combining the slave samples with the interpolation coefficients.
+AlignPlan = namedtuple('AlignPlan', 'method length step phases')
+
+_align_plans = {}
+ALIGN_PLAN_CACHE_SIZE = 256
+
+
+def align_plan(slave_frequency, slave_offset, master_frequency, master_offset,
+               length, interpolate=True):
+    '''
+    Slices and interpolation coefficients for aligning slave arrays of length
+    samples to the master, as computed by align_args. Plans are cached per
+    frequencies, offsets and length.
+
+    :type slave_frequency: int or float
+    :type slave_offset: int or float
+    :type master_frequency: int or float
+    :type master_offset: int or float
+    :param length: Length of the slave arrays.
+    :type length: int
+    :type interpolate: bool
+    :raises AssertionError: If the sample rates have not been tested.
+    :raises ValueError: If the arrays cannot be aligned.
+    :rtype: AlignPlan
+    '''
+    args = (slave_frequency, slave_offset, master_frequency, master_offset)
+    # The types are part of the key as numpy scalars give numpy coefficients.
+    key = args + tuple(map(type, args)) + (length, interpolate)
+    try:
+        return _align_plans[key]
+    except KeyError:
+        pass
+
     # Get the sample rates for the two parameters
     wm = master_frequency
     ws = slave_frequency
@@ -412,96 +521,200 @@ def align_args(slave_array, slave_frequency, slave_offset, master_frequency, mas
     # Compute the sample rate ratio:
     r = wm / float(ws)
 
-    # Here we create a masked array to hold the returned values that will have
-    # the same sample rate and timing offset as the master
-    len_aligned = int(len(slave_array) * r)
-    if len_aligned != (len(slave_array) * r):
+    len_aligned = int(length * r)
+    if len_aligned != (length * r):
         raise ValueError("Array length problem in align. Probable cause is flight cutting not at superframe boundary")
 
-    slave_aligned = np.ma.zeros(len(slave_array) * r, dtype=_dtype)
-
-    # Where offsets are equal, the slave_array recorded values remain
-    # unchanged and interpolation is performed between these values.
-    # - and we do not interpolate mapped arrays!
+    phases = []
     if not delta and interpolate and (is_power2(slave_frequency) and
                                       is_power2(master_frequency)):
-        slave_aligned.mask = True
         if master_frequency > slave_frequency:
-            # populate values and interpolate
-            slave_aligned[0::r] = slave_array[0::1]
-            # Interpolate and do not extrapolate masked ends or gaps
-            # bigger than the duration between slave samples (i.e. where
-            # original slave data is masked).
-            # If array is fully masked, return array of masked zeros
-            dur_between_slave_samples = 1.0 / slave_frequency
-            return repair_mask(
-                slave_aligned,
-                frequency=master_frequency,
-                repair_duration=dur_between_slave_samples,
-                raise_entirely_masked=False,
-            )
-
+            plan = AlignPlan('upsample', len_aligned, int(r), phases)
         else:
-            # step through slave taking the required samples
-            return slave_array[0::1/r]
-
-    # Each sample in the master parameter may need different combination parameters
-    for i in range(int(wm)):
-        bracket = (i / r) + delta
-        # Interpolate between the hth and (h+1)th samples of the slave array
-        h = int(floor(bracket))
-        h1 = h + 1
-
-        # Compute the linear interpolation coefficients, b & a
-        b = bracket - h
-
-        # Cunningly, if we are interpolating (working with mapped arrays e.g.
-        # discrete or multi-state parameters), by reverting to 1,0 or 0,1
-        # coefficients we gather the closest value in time to the master
-        # parameter.
-        if not interpolate:
-            b = round(b)
-
-        # Either way, a is the residual part.
-        a = 1 - b
-
-        if h < 0:
-            if h<-ws:
-                raise ValueError('Align called with excessive timing mismatch')
-            # slave_array values do not exist in aligned array
-            if ws==1:
-                slave_aligned[i+wm::wm] = a*slave_array[h+ws:-ws:ws] + b*slave_array[h1+ws::ws]
+            plan = AlignPlan('downsample', len_aligned, int(1 / r), phases)
+    else:
+        wm = int(wm)
+        ws = int(ws)
+        for i in range(wm):
+            bracket = (i / r) + delta
+            h = int(floor(bracket))
+            h1 = h + 1
+            b = bracket - h
+            if not interpolate:
+                b = round(b)
+            a = 1 - b
+            if h < 0:
+                if h<-ws:
+                    raise ValueError('Align called with excessive timing mismatch')
+                phases.append((slice(i + wm, None, wm), a, b,
+                               slice(h + ws, -ws, ws),
+                               slice(h1 + ws, None if ws == 1 else 1 - ws, ws),
+                               i))
+            elif h1 >= ws:
+                phases.append((slice(i, -wm, wm), a, b, slice(h, -ws, ws),
+                               slice(h1, None, ws), i - wm))
             else:
-                slave_aligned[i+wm::wm] = a*slave_array[h+ws:-ws:ws] + b*slave_array[h1+ws:1-ws:ws]
-            # We can't interpolate the inital values as we are outside the
-            # range of the slave parameters.
-            # Treat ends as "padding"; Value of 0 and Masked.
-            slave_aligned[i] = 0
-            slave_aligned[i] = np.ma.masked
-        elif h1 >= ws:
-            slave_aligned[i:-wm:wm] = a*slave_array[h:-ws:ws] + b*slave_array[h1::ws]
-            # At the other end, we run out of slave parameter values so need to
-            # pad to the end of the array.
-            # Treat ends as "padding"; Value of 0 and Masked.
-            slave_aligned[i-wm] = 0
-            slave_aligned[i-wm] = np.ma.masked
+                phases.append((slice(i, None, wm), a, b, slice(h, None, ws),
+                               slice(h1, None, ws), None))
+        plan = AlignPlan('interpolate', len_aligned, None, phases)
+
+    if len(_align_plans) >= ALIGN_PLAN_CACHE_SIZE:
+        _align_plans.clear()
+    _align_plans[key] = plan
+    return plan
+
+
+def apply_align_plan(plan, data, mask, aligned_data, aligned_mask):
+    '''
+    Apply an 'upsample' or 'interpolate' alignment plan to the data and mask
+    of slave arrays, writing the result into the aligned data and mask. The
+    samples are along the last axis so that stacked arrays may be aligned
+    together. Upsampled arrays still need their masks repaired.
+
+    :param plan: Alignment plan from align_plan.
+    :type plan: AlignPlan
+    :param data: Data of the slave arrays.
+    :type data: np.ndarray
+    :param mask: Mask of the slave arrays.
+    :type mask: np.ndarray of bool
+    :param aligned_data: Buffer for the aligned data.
+    :type aligned_data: np.ndarray
+    :param aligned_mask: Buffer for the aligned mask.
+    :type aligned_mask: np.ndarray of bool
+    :rtype: None
+    '''
+    if plan.method == 'upsample':
+        # populate values to be interpolated by repairing the mask
+        aligned_data[...] = 0
+        aligned_mask[...] = True
+        aligned_data[..., ::plan.step] = data
+        aligned_mask[..., ::plan.step] = mask
+        return
+
+    # OPT: The masked array arithmetic of align_args is applied to the data
+    # and mask separately. The data of masked samples is kept the same:
+    # multiplying by a Python number gives the number where masked, a numpy
+    # scalar gives the product.
+    for target, a, b, source_a, source_b, pad in plan.phases:
+        data_a = a * data[..., source_a]
+        mask_a = mask[..., source_a]
+        masked = mask_a | mask[..., source_b]
+        result = data_a + b * data[..., source_b]
+        if isinstance(a, np.generic):
+            np.copyto(result, data_a, where=masked)
         else:
-            # Sheer bliss. We can compute slave_aligned across the whole
-            # range of the data without having to take special care at the
-            # ends of the array.
-            slave_aligned[i::wm] = a*slave_array[h::ws] + b*slave_array[h1::ws]
+            np.copyto(result, np.where(mask_a, a, data_a), where=masked)
+        aligned_data[..., target] = result
+        aligned_mask[..., target] = masked
+        if pad is not None:
+            # Treat ends as "padding"; Value of 0 and Masked.
+            aligned_data[..., pad] = 0
+            aligned_mask[..., pad] = True
 
-    if isinstance(original_array, MappedArray) or original_array.dtype.type is np.string_:
-        # return back to mapped array
-        mapped_array = MappedArray(np.ma.zeros(len(slave_aligned)).astype(_dtype), values_mapping=mappings)
-        mapped_array[:] = slave_aligned[:]
-        slave_aligned = mapped_array
 
-    if original_array.dtype.type is np.string_:
-        # return back to string array
-        slave_aligned = mapped_array_to_string_array(slave_aligned)
+def align_many_args(slave_arrays, slave_frequency, slave_offset,
+                    master_frequency, master_offset=0, interpolate=True):
+    '''
+    Align a group of slave arrays sharing the same frequency, offset and
+    length to the master, as align_args does for each array.
 
-    return slave_aligned
+    The arrays are stacked and aligned together with one set of 2-D array
+    operations using the cached align_plan. MappedArrays and string arrays
+    are aligned individually with align_args.
+
+    :param slave_arrays: Slave arrays of the same length.
+    :type slave_arrays: [np.ma.masked_array]
+    :type slave_frequency: int or float
+    :type slave_offset: int or float
+    :type master_frequency: int or float
+    :type master_offset: int or float
+    :type interpolate: bool
+    :returns: Slave arrays aligned to master.
+    :rtype: [np.ma.masked_array]
+    '''
+    stacked = []
+    aligned = []
+    for slave_array in slave_arrays:
+        if isinstance(slave_array, MappedArray) or \
+           slave_array.dtype.type is np.string_ or \
+           not isinstance(slave_array, np.ma.MaskedArray):
+            aligned.append(align_args(slave_array, slave_frequency,
+                                      slave_offset, master_frequency,
+                                      master_offset, interpolate=interpolate))
+        else:
+            stacked.append(len(aligned))
+            aligned.append(slave_array)
+
+    if not stacked:
+        return aligned
+    length = len(aligned[stacked[0]])
+    if not length or (slave_frequency == master_frequency and
+                      slave_offset == master_offset):
+        # No alignment is required, return the slave arrays unchanged.
+        return aligned
+    if any(len(aligned[n]) != length for n in stacked):
+        raise ValueError('Cannot align slave arrays of different lengths.')
+
+    plan = align_plan(slave_frequency, slave_offset, master_frequency,
+                      master_offset, length, interpolate=interpolate)
+    # Arrays of different dtypes are stacked separately to preserve the
+    # arithmetic of each.
+    groups = OrderedDict()
+    for n in stacked:
+        groups.setdefault(aligned[n].dtype, []).append(n)
+    for indices in groups.values():
+        arrays = [aligned[n] for n in indices]
+        data = np.vstack([np.ma.getdata(a) for a in arrays])
+        mask = np.vstack([np.ma.getmaskarray(a) for a in arrays])
+        if plan.method == 'downsample':
+            # step through slave taking the required samples
+            aligned_data = data[:, ::plan.step]
+            aligned_mask = mask[:, ::plan.step]
+        else:
+            aligned_data = np.zeros((len(arrays), plan.length))
+            aligned_mask = np.zeros((len(arrays), plan.length), dtype=bool)
+            apply_align_plan(plan, data, mask, aligned_data, aligned_mask)
+        for row, n in enumerate(indices):
+            aligned[n] = np.ma.array(aligned_data[row], mask=aligned_mask[row],
+                                     copy=False)
+            if plan.method == 'upsample':
+                # Interpolate and do not extrapolate masked ends or gaps
+                # bigger than the duration between slave samples.
+                aligned[n] = repair_mask(
+                    aligned[n],
+                    frequency=master_frequency,
+                    repair_duration=1.0 / slave_frequency,
+                    raise_entirely_masked=False,
+                )
+    return aligned
+
+
+def align_many(slaves, master, interpolate=True):
+    '''
+    Align many slave parameters sharing the same frequency and offset to the
+    master. See align and align_many_args.
+
+    :param slaves: The parameters to be aligned to the master
+    :type slaves: [Parameter objects]
+    :param master: The master parameter
+    :type master: Parameter objects
+    :param interpolate: Whether to interpolate parameters (multistates exempt)
+    :type interpolate: Bool
+    :returns: Slave arrays aligned to master.
+    :rtype: [np.ma.array]
+    '''
+    if not slaves:
+        return []
+    aligned = align_many_args(
+        [straighten_parameter_array(slave) for slave in slaves],
+        slaves[0].frequency,
+        slaves[0].offset,
+        master.frequency,
+        master.offset,
+        interpolate=interpolate,
+    )
+    return [wrap_array(slave.name, array)
+            for slave, array in zip(slaves, aligned)]
 
 
 def align_slices(slave, master, slices):
@@ -545,11 +758,83 @@ def align_slice(slave, master, _slice):
     return align_slices(slave, master, [_slice])[0]
 
 
+def multistate_dtype(values_mapping):
+    '''
+    Smallest signed integer dtype able to store every raw value of
+    values_mapping, e.g. int8 for {0: '-', 1: 'Warning'} or int16 for
+    {0: '0', 200: '200'}.
+
+    :param values_mapping: Multistate mapping of raw values to states.
+    :type values_mapping: dict
+    :returns: Integer dtype or None if values_mapping is empty.
+    :rtype: np.dtype or None
+    '''
+    if not values_mapping:
+        return None
+    raw_values = [int(k) for k in values_mapping]
+    lowest, highest = min(raw_values), max(raw_values)
+    for dtype in (np.int8, np.int16, np.int32):
+        info = np.iinfo(dtype)
+        if info.min <= lowest and highest <= info.max:
+            return np.dtype(dtype)
+    return np.dtype(np.int64)
+
+
+def compact_multistate_array(array, values_mapping):
+    '''
+    Cast an integer multistate array to the smallest integer dtype which fits
+    values_mapping (see multistate_dtype).
+
+    Arrays which are not of integer dtype, are already at least as compact or
+    contain valid values outside of the range of the compact dtype are
+    returned unchanged. Masked values keep their raw value unless it is
+    outside of the range of the compact dtype, in which case it is replaced
+    with the largest value of the compact dtype which is not a raw value of
+    values_mapping. That value is also used as the fill_value.
+
+    :param array: Multistate array of raw values.
+    :type array: np.ma.masked_array or MappedArray
+    :param values_mapping: Multistate mapping of raw values to states.
+    :type values_mapping: dict
+    :returns: Array of compact dtype, of the same type as array.
+    :rtype: np.ma.masked_array or MappedArray
+    '''
+    dtype = multistate_dtype(values_mapping)
+    if dtype is None or array.dtype.kind not in 'iu' or \
+       array.dtype.itemsize <= dtype.itemsize:
+        return array
+
+    raw = array.raw if isinstance(array, MappedArray) else array
+    info = np.iinfo(dtype)
+    if np.ma.count(raw) and (raw.min() < info.min or raw.max() > info.max):
+        return array
+
+    # The largest value of the compact dtype which is not a state, so that
+    # replaced values do not become a state if unmasked or repaired.
+    raw_values = set(int(k) for k in values_mapping)
+    spare = next((v for v in range(info.max, info.min - 1, -1)
+                  if v not in raw_values), None)
+
+    mask = np.ma.getmask(raw)
+    data = raw.data
+    if mask is not np.ma.nomask:
+        invalid = mask & ((data < info.min) | (data > info.max))
+        if invalid.any():
+            if spare is None:
+                return array
+            data = data.copy()
+            data[invalid] = spare
+    compact = np.ma.array(data.astype(dtype), mask=mask, fill_value=spare)
+    if isinstance(array, MappedArray):
+        compact = MappedArray(compact, values_mapping=values_mapping)
+    return compact
+
+
 def string_array_to_mapped_array(array):
     compressed = array.compressed()
     values, counts = np.unique(compressed, return_counts=True)
     mappings = {k: v for k, v in zip(range(len(values)+1), [''] + list(values))}
-    mapped_array = MappedArray(np.ma.zeros(len(array)).astype('int'), values_mapping=mappings)
+    mapped_array = MappedArray(np.ma.zeros(len(array)).astype(multistate_dtype(mappings)), values_mapping=mappings)
     mapped_array[:] = array[:]
 
     return mapped_array
@@ -639,6 +924,79 @@ def bearings_and_distances(latitudes, longitudes, reference):
 
     return brg_array, dist_array
 
+
+def trig_terms(angles):
+    '''
+    Sine and cosine of angles in degrees and of half of the angles, as used
+    by track_bearings_and_distances. Terms of masked values are computed
+    from the data under the mask.
+
+    :param angles: Angles in degrees.
+    :type angles: np.ma.array
+    :returns: Trigonometric terms of the angles.
+    :rtype: TrigTerms
+    '''
+    angles = np.radians(np.ma.getdata(angles).astype(np.float64))
+    halves = angles / 2
+    return TrigTerms(np.sin(angles), np.cos(angles),
+                     np.sin(halves), np.cos(halves))
+
+
+def track_bearings_and_distances(latitude, longitude, reference,
+                                 _slice=slice(None)):
+    '''
+    Returns the bearings and distances of a section of a track with respect
+    to a fixed point, as bearings_and_distances.
+
+    When latitude and longitude are parameters, the trigonometric terms of
+    the section are memoized with them (see DerivedParameterNode.trig_terms)
+    so that repeated calls for the same track only evaluate the terms of the
+    reference point. The differences of the angles are formed with half
+    angle identities from the memoized terms, which agrees with
+    bearings_and_distances to within a micrometre.
+
+    :param latitude: The latitudes of the track.
+    :type latitude: DerivedParameterNode or np.ma.array
+    :param longitude: The longitudes of the track.
+    :type longitude: DerivedParameterNode or np.ma.array
+    :param reference: The location of the second point.
+    :type reference: dict with {'latitude': lat, 'longitude': lon} in degrees.
+    :param _slice: Section of the track.
+    :type _slice: slice
+    :returns bearings, distances: Bearings in degrees, Distances in metres.
+    :rtype: Two Numpy masked arrays
+    '''
+    def section_and_terms(param):
+        if hasattr(param, 'trig_terms'):
+            return param.array[_slice], param.trig_terms(_slice)
+        array = param[_slice]
+        return array, trig_terms(array)
+
+    lat_array, lat = section_and_terms(latitude)
+    lon_array, lon = section_and_terms(longitude)
+    ref = trig_terms(np.array([reference['latitude'],
+                               reference['longitude']]))
+
+    # Sines of half of the differences and cosine of half of the
+    # difference in longitude.
+    sin_dlat = lat.sin_half * ref.cos_half[0] - lat.cos_half * ref.sin_half[0]
+    sin_dlon = lon.sin_half * ref.cos_half[1] - lon.cos_half * ref.sin_half[1]
+    cos_dlon = lon.cos_half * ref.cos_half[1] + lon.sin_half * ref.sin_half[1]
+
+    a = np.clip(sin_dlat ** 2 + lat.cos * ref.cos[0] * sin_dlon ** 2, 0.0, 1.0)
+    dists = 2 * np.arctan2(np.sqrt(a), np.sqrt(1.0 - a))
+    dists *= 6371000 # Earth radius in metres
+
+    y = 2 * sin_dlon * cos_dlon * lat.cos
+    x = ref.cos[0] * lat.sin \
+        - ref.sin[0] * lat.cos * (1.0 - 2 * sin_dlon ** 2)
+    brgs = np.arctan2(y, x)
+
+    joined_mask = np.ma.getmaskarray(lat_array) | \
+        np.ma.getmaskarray(lon_array)
+    return (np.ma.array(data=np.rad2deg(brgs) % 360, mask=joined_mask),
+            np.ma.array(data=dists, mask=joined_mask))
+
 """
 Landing stopping distances.
 
@@ -721,6 +1079,19 @@ def calculate_flap(mode, flap_angle, model, series, family):
     return values_mapping, array, frequency, offset
 
 
+def _mask_runs(mask):
+    '''
+    Runs of equal values in a boolean array.
+
+    :type mask: np.ndarray of bool
+    :returns: Start and length of each run, and the value of the run.
+    :rtype: np.ndarray, np.ndarray, np.ndarray of bool
+    '''
+    starts = np.concatenate(([0], np.flatnonzero(mask[1:] != mask[:-1]) + 1))
+    lengths = np.diff(np.append(starts, len(mask)))
+    return starts, lengths, mask[starts]
+
+
 def calculate_surface_angle(mode, param, detents):
     '''
     Steps a surface angle into detents using one of the following modes:
@@ -775,42 +1146,36 @@ def calculate_surface_angle(mode, param, detents):
     c2 = metrics < thresh_main_metrics
     angle.mask = (c1 | c2)
 
-    # ---- First pass: flat transitions are not transitions ------------
-    flat_slices = np.ma.clump_masked(angle)
-    tran_slices = np.ma.clump_unmasked(angle)
+    # OPT: The flat and transition sections are processed as runs of the
+    # mask with array operations rather than slice by slice.
+    data = angle.data
 
-    for s in tran_slices:
-        if np.abs(np.max(angle[s]) - np.min(angle[s])) < thresh_angle_range:
-            angle.mask[s] = True
+    # ---- First pass: flat transitions are not transitions ------------
+    starts, lengths, flat = _mask_runs(angle.mask)
+    tran_range = np.maximum.reduceat(data, starts) - \
+        np.minimum.reduceat(data, starts)
+    flat |= np.abs(tran_range) < thresh_angle_range
+    angle.mask = np.repeat(flat, lengths)
 
     # ---- Second pass: re-assign flap ----------------------------------
-    flat_slices = np.ma.clump_masked(angle)
-    tran_slices = np.ma.clump_unmasked(angle)
-
-    for s in flat_slices:
-        avg = np.mean(angle.data[s])
-        index = np.argmin(np.abs(avg - detents))
-        result[s] = detents[index]
-
-    for s in tran_slices:
-
-        lo = angle[s][0]
-        hi = angle[s][-1]
-
-        detents_lo = detents[np.argmin(abs(lo - detents))]
-        detents_hi = detents[np.argmin(abs(hi - detents))]
-
-        if mode == 'lever':
-            result[s] = detents_hi
-            continue
-
-        if detents_hi > detents_lo:
-            result[s] = detents_lo if mode == 'excluding' else detents_hi
-        elif detents_hi < detents_lo:
-            result[s] = detents_hi if mode == 'excluding' else detents_lo
-        else:
-            # If equal fill with either hi or lo.
-            result[s] = detents_lo
+    starts, lengths, flat = _mask_runs(angle.mask)
+    avg = np.add.reduceat(data, starts) / lengths
+    lo = data[starts]
+    hi = data[starts + lengths - 1]
+    nearest = lambda values: np.take(
+        detents, np.argmin(np.abs(values[:, np.newaxis] - detents), axis=1))
+    detents_avg, detents_lo, detents_hi = nearest(avg), nearest(lo), nearest(hi)
+
+    if mode == 'lever':
+        tran_detents = detents_hi
+    else:
+        rising = detents_lo if mode == 'excluding' else detents_hi
+        falling = detents_hi if mode == 'excluding' else detents_lo
+        # If equal fill with either hi or lo.
+        tran_detents = np.where(detents_hi > detents_lo, rising,
+                                np.where(detents_hi < detents_lo, falling,
+                                         detents_lo))
+    result[:] = np.repeat(np.where(flat, detents_avg, tran_detents), lengths)
 
     # ---- Set-up the output --------------------------------------------
     # Re-apply the original mask.
@@ -1234,28 +1599,72 @@ def cycle_finder(array, min_step=0.0, include_ends=True):
     # This section progressively removes reversals smaller than the step size of
     # interest, hence the arrays shrink until just the desired answer is left.
     dvals = np.ediff1d(vals)
-    while len(dvals) > 0 and np.min(abs(dvals)) < min_step:
-        sort_idx = np.argmin(abs(dvals))
-        last = len(dvals)
-        if sort_idx == 0:
-            idxs = np.delete(idxs, 0)
-            vals = np.delete(vals, 0)
-            dvals = np.delete(dvals, 0)
-        elif sort_idx == last-1:
-            idxs = np.delete(idxs, last)
-            vals = np.delete(vals, last)
-            dvals = np.delete(dvals, last-1) # One fewer dval than val.
-        else:
-            idxs = np.delete(idxs, slice(sort_idx, sort_idx + 2))
-            vals = np.delete(vals, slice(sort_idx, sort_idx + 2))
-            dvals[sort_idx - 1] += dvals[sort_idx] + dvals[sort_idx + 1]
-            dvals = np.delete(dvals, slice(sort_idx, sort_idx + 2))
-    if len(dvals) == 0:
-        # All the changes have disappeared, so return the
-        # single array peak index and value.
-        return idxs, vals
-    else:
+    if len(dvals) == 0 or not np.min(abs(dvals)) < min_step:
         return idxs, vals
+    keep = _remove_small_cycles(dvals, min_step)
+    return idxs[keep], vals[keep]
+
+
+def _remove_small_cycles(dvals, min_step):
+    '''
+    Progressively removes the smallest reversal while it is smaller than
+    min_step. A reversal at either end removes the end value, otherwise the
+    two values either side of it are removed and the neighbouring changes
+    merged.
+
+    :param dvals: Changes between successive peak and trough values.
+    :type dvals: np.ndarray
+    :param min_step: Minimum step, below which fluctuations will be removed.
+    :type min_step: float
+    :returns: Boolean array of the peak and trough values which remain.
+    :rtype: np.ndarray
+    '''
+    # OPT: The values are held in a linked list with the change to the next
+    # value stored against each one, and the smallest change is found from a
+    # heap of changes where outdated entries are skipped. Ties are resolved
+    # by position, as with argmin.
+    count = len(dvals) + 1
+    changes = list(dvals)
+    prev = list(range(-1, count - 1))
+    next_ = list(range(1, count + 1))
+    keep = np.ones(count, dtype=bool)
+    version = [0] * count
+    heap = [(abs(d), n, 0) for n, d in enumerate(changes)]
+    heapq.heapify(heap)
+    first = 0
+    last = count - 1
+    while heap:
+        size, n, v = heapq.heappop(heap)
+        if not keep[n] or version[n] != v or n == last:
+            # Outdated entry for a value removed or a change merged.
+            continue
+        if not size < min_step:
+            break
+        if n == first:
+            # Remove the first value.
+            keep[n] = False
+            first = next_[n]
+            prev[first] = -1
+        elif next_[n] == last:
+            # Remove the last value.
+            keep[last] = False
+            last = n
+            next_[n] = count
+        else:
+            # Remove this value and the next, merging the changes into the
+            # change from the previous value.
+            p = prev[n]
+            nn = next_[next_[n]]
+            keep[n] = keep[next_[n]] = False
+            changes[p] += changes[n] + changes[next_[n]]
+            next_[p] = nn
+            prev[nn] = p
+            version[p] += 1
+            if changes[p] != changes[p]:
+                # A NaN change stops the removal, as with np.min.
+                break
+            heapq.heappush(heap, (abs(changes[p]), p, version[p]))
+    return keep
 
 
 def cycle_match(idx, cycle_idxs, dist=None):
@@ -1479,8 +1888,11 @@ def clump_multistate(array, state, _slices=[slice(None)], condition=True):
     nearest neighbour value) using nearest_neighbour_mask_repair before
     passing the array into this function.
 
+    A MultistateDerivedParameterNode may be provided in place of its array to
+    make use of the node's memoized state slices.
+
     :param array: data to scan
-    :type array: multistate numpy masked array
+    :type array: multistate numpy masked array or MultistateDerivedParameterNode
     :param state: state to be tested
     :type state: string
     :param _slices: slice or list of slices over which to scan the array.
@@ -1500,7 +1912,9 @@ def clump_multistate(array, state, _slices=[slice(None)], condition=True):
         # single slice provided
         _slices = [_slices]
 
-    if condition:
+    if hasattr(array, 'state_slices'):
+        state_match = array.state_slices(state, condition=condition)
+    elif condition:
         state_match = runs_of_ones(array == state)
     else:
         state_match = runs_of_ones(array != state)
@@ -2026,8 +2440,8 @@ def find_edges_on_state_change(state, array, change='entering', phase=None, min_
 
     :param state: multistate parameter condition e.g. 'Ground'
     :type state: text, from the states for that parameter.
-    :param array: the multistate parameter array
-    :type array: numpy masked array with state attributes.
+    :param array: the multistate parameter array. A MultistateDerivedParameterNode may be provided to make use of its memoized state mask.
+    :type array: numpy masked array with state attributes or MultistateDerivedParameterNode.
 
     :param change: Condition for detecting edge. Default 'entering', 'leaving' and 'entering_and_leaving' alternatives
     :type change: text
@@ -2042,16 +2456,16 @@ def find_edges_on_state_change(state, array, change='entering', phase=None, min_
     :raises: ValueError if change not recognised
     :raises: KeyError if state not recognised
     '''
-    def state_changes(state, array, change, _slice=slice(0, -1), min_samples=1):
+    def state_changes(state_mask, change, _slice=slice(0, -1), min_samples=1):
         '''
         min_samples of 3 means 3 or more samples must be in the state for it to be returned.
         '''
-        length = len(array[_slice])
+        length = len(state_mask[_slice])
         # The offset allows for phase slices and puts the transition midway
         # between the two conditions as this is the most probable time that
         # the change took place.
         offset = _slice.start - 0.5
-        state_periods = runs_of_ones(array[_slice] == state)
+        state_periods = runs_of_ones(state_mask[_slice])
         # ignore small periods where slice is in state, then remove small
         # gaps where slices are not in state
         # we are taking 1 away from min_samples here as
@@ -2078,13 +2492,22 @@ def find_edges_on_state_change(state, array, change='entering', phase=None, min_
 
         return edge_list
 
+    if phase is not None and not phase:
+        # No phases to search, whether or not the state is recognised.
+        return []
+
+    if hasattr(array, 'state_mask'):
+        state_mask = array.state_mask(state)
+    else:
+        state_mask = array == state
+
     if phase is None:
-        return state_changes(state, array, change, min_samples=min_samples)
+        return state_changes(state_mask, change, min_samples=min_samples)
 
     edge_list = []
     for period in phase:
         period = getattr(period, 'slice', period)
-        edges = state_changes(state, array, change, _slice=period,
+        edges = state_changes(state_mask, change, _slice=period,
                               min_samples=min_samples)
         edge_list.extend(edges)
     return edge_list
@@ -2227,6 +2650,66 @@ def first_order_lag(param, time_constant, hz, gain=1.0, initial_value=None):
     return masked_first_order_filter(y_term, x_term, param, initial_value)
 
 
+_lfilter_zis = {}
+LFILTER_ZI_CACHE_SIZE = 256
+
+
+def first_order_filter_zi(y_term, x_term):
+    '''
+    Steady state of the filter for a step input of one, as computed by
+    lfilter_zi. These are cached per filter, i.e. per time constant, sample
+    rate and gain, as the same filters are applied to many parameters.
+
+    :param y_term: Filter denominator terms.
+    :type y_term: list
+    :param x_term: Filter numerator terms.
+    :type x_term: list
+    :returns: Initial filter state for an initial value of one.
+    :rtype: np.ndarray
+    '''
+    key = (tuple(x_term), tuple(y_term))
+    z_initial = _lfilter_zis.get(key)
+    if z_initial is None:
+        z_initial = lfilter_zi(x_term, y_term)
+        if len(_lfilter_zis) >= LFILTER_ZI_CACHE_SIZE:
+            _lfilter_zis.clear()
+        _lfilter_zis[key] = z_initial
+    return z_initial
+
+
+def first_order_filter(y_term, x_term, data, mask, initial_value):
+    '''
+    masked_first_order_filter working on the data and mask of an array. Each
+    unmasked block is filtered into a single output array, with masked data
+    retained as zero values.
+
+    :param y_term: Filter denominator terms.
+    :type y_term: list
+    :param x_term: Filter numerator terms.
+    :type x_term: list
+    :param data: input data
+    :type data: np.ndarray
+    :param mask: input mask
+    :type mask: np.ndarray of bool
+    :param initial_value: Value to be used at the start of the data
+    :type initial_value: float (or may be None)
+    :returns: Filtered data.
+    :rtype: np.ndarray
+    '''
+    z_initial = first_order_filter_zi(y_term, x_term)
+    result = np.zeros(len(data))
+    # The mask changes at the start and stop of each unmasked block.
+    bounded = np.ones(len(mask) + 2, dtype=bool)
+    bounded[1:-1] = mask
+    edges = np.flatnonzero(bounded[1:] != bounded[:-1])
+    for start, stop in zip(edges[0::2], edges[1::2]):
+        if initial_value is None:
+            initial_value = data[start]
+        result[start:stop] = lfilter(x_term, y_term, data[start:stop],
+                                     zi=z_initial * initial_value)[0]
+    return result
+
+
 def masked_first_order_filter(y_term, x_term, param, initial_value):
     """
     This provides access to the scipy filter function processed across the
@@ -2243,33 +2726,15 @@ def masked_first_order_filter(y_term, x_term, param, initial_value):
     :param initial_value: Value to be used at the start of the data
     :type initial_value: float (or may be None)
     """
-    # import locally to speed up imports of library.py
-    from scipy.signal import lfilter, lfilter_zi
-    z_initial = lfilter_zi(x_term, y_term) # Prepare for non-zero initial state
-    # The initial value may be set as a command line argument, mainly for testing
-    # otherwise we set it to the first data value.
-
-    result = np.ma.zeros(len(param))  # There is no zeros_like method.
-    good_parts = np.ma.clump_unmasked(param)
-    for good_part in good_parts:
-
-        if initial_value is None:
-            initial_value = param[good_part.start]
-        # Tested version here...
-        answer, z_final = lfilter(x_term, y_term, param[good_part], zi=z_initial*initial_value)
-        result[good_part] = np.ma.array(answer)
-
+    # OPT: The blocks are filtered on the raw data and mask rather than
+    # through masked array indexing.
+    mask = np.ma.getmaskarray(param)
+    result = first_order_filter(y_term, x_term, np.ma.getdata(param), mask,
+                                initial_value)
     # The mask should last indefinitely following any single corrupt data point
     # but this is impractical for our use, so we just copy forward the original
     # mask.
-    bad_parts = np.ma.clump_masked(param)
-    for bad_part in bad_parts:
-        # The mask should last indefinitely following any single corrupt data point
-        # but this is impractical for our use, so we just copy forward the original
-        # mask.
-        result[bad_part] = np.ma.masked
-
-    return result
+    return np.ma.array(result, mask=mask.copy() if mask.any() else np.ma.nomask)
 
 
 def first_order_washout(param, time_constant, hz, gain=1.0, initial_value=None):
@@ -2909,6 +3374,144 @@ def hash_array(array, sections, min_samples):
     return checksum.hexdigest()
 
 
+HYSTERESIS_BLOCK_SIZE = 1024
+
+
+def _hysteresis_scan(lower, upper, old):
+    """
+    Output of successively limiting the value old to each range of lower
+    and upper values, i.e. old = min(max(old, lower[i]), upper[i]).
+
+    Limiting to one range after another is equivalent to limiting to a
+    single combined range, so the combined ranges of each sample are found
+    with a blocked prefix scan rather than stepping through each sample.
+
+    :param lower: Lower limit of each sample.
+    :type lower: np.ndarray
+    :param upper: Upper limit of each sample, not less than lower.
+    :type upper: np.ndarray
+    :param old: Value before the first sample.
+    :type old: float
+    :rtype: np.ndarray
+    """
+    length = len(lower)
+    if not length:
+        return np.empty(0)
+    block_size = min(HYSTERESIS_BLOCK_SIZE, length)
+    blocks = -(-length // block_size)
+    # Padding samples do not limit the value.
+    low = np.full(blocks * block_size, -np.inf)
+    high = np.full(blocks * block_size, np.inf)
+    low[:length] = lower
+    high[:length] = upper
+    low = low.reshape(blocks, block_size)
+    high = high.reshape(blocks, block_size)
+    # Combine the range of each sample with the ranges of the samples
+    # before it within the block.
+    step = 1
+    while step < block_size:
+        new_low = np.minimum(np.maximum(low[:, :-step], low[:, step:]),
+                             high[:, step:])
+        new_high = np.minimum(np.maximum(high[:, :-step], low[:, step:]),
+                              high[:, step:])
+        low[:, step:] = new_low
+        high[:, step:] = new_high
+        step *= 2
+    # Value at the start of each block.
+    starts = np.empty(blocks)
+    for block in range(blocks):
+        starts[block] = old
+        old = min(max(old, low[block, -1]), high[block, -1])
+    result = np.minimum(np.maximum(starts[:, np.newaxis], low), high)
+    return result.ravel()[:length]
+
+
+def _hysteresis_pass(values, quarter_range, old):
+    """
+    One pass of hysteresis over unmasked values, following the values once
+    they move more than quarter_range away from the current output.
+
+    This limits the output to within quarter_range of each value, which is
+    computed for all samples with _hysteresis_scan. As the limits are
+    compared with the output rather than the difference between the value
+    and the output, rounding may differ, so each sample is checked against
+    the arithmetic of a sample-by-sample loop. From any sample which differs
+    the scan is repeated until it rejoins the previous output. The result is
+    identical to the loop.
+
+    :param values: Unmasked values to process.
+    :type values: np.ndarray
+    :param quarter_range: Quarter of the level of hysteresis.
+    :type quarter_range: float
+    :param old: Initial output value.
+    :type old: numpy scalar
+    :returns: Output values and the final output value.
+    :rtype: (np.ndarray, numpy scalar)
+    """
+    length = len(values)
+    result = np.empty(length)
+    # Until the output first changes it is of the same type as the values,
+    # so the first differences use the original dtype.
+    diff = (values - old).astype(np.float64, copy=False)
+    moved = np.flatnonzero((diff > quarter_range) | (diff < -quarter_range))
+    if not len(moved):
+        result[:] = old
+        return result, old
+    index = moved[0]
+    result[:index] = old
+
+    values = values.astype(np.float64, copy=False)
+    lower = values - quarter_range
+    upper = values + quarter_range
+    # NaN values do not change the output.
+    nans = np.isnan(values)
+    lower[nans] = -np.inf
+    upper[nans] = np.inf
+    result[index] = lower[index] if diff[index] > quarter_range \
+        else upper[index]
+
+    def loop(start, stop):
+        # Output of the loop for each sample given the previous output.
+        previous = result[start - 1:stop - 1]
+        diff = values[start:stop] - previous
+        expected = np.where(diff > quarter_range, lower[start:stop],
+                            np.where(diff < -quarter_range,
+                                     upper[start:stop], previous))
+        differs = np.flatnonzero(expected.view(np.int64) !=
+                                 result[start:stop].view(np.int64))
+        return expected, differs + start
+
+    def rescan(start):
+        # Repeat the scan until the output rejoins the previous output.
+        window = 64
+        while start < length:
+            stop = min(start + window, length)
+            output = _hysteresis_scan(lower[start:stop], upper[start:stop],
+                                      result[start - 1])
+            same = np.flatnonzero(output.view(np.int64) ==
+                                  result[start:stop].view(np.int64))
+            if len(same):
+                result[start:start + same[0]] = output[:same[0]]
+                return start + same[0]
+            result[start:stop] = output
+            start = stop
+            window *= 4
+        return length
+
+    index += 1
+    result[index:] = _hysteresis_scan(lower[index:], upper[index:],
+                                      result[index - 1])
+    differs = loop(index, length)[1]
+    while len(differs):
+        index = differs[0]
+        result[index] = loop(index, index + 1)[0][0]
+        rejoin = rescan(index + 1)
+        # Samples after rejoining are unchanged so were already checked.
+        differs = np.concatenate((loop(index + 1, min(rejoin + 1, length))[1],
+                                  differs[differs > rejoin]))
+    return result, result[-1]
+
+
 def hysteresis(array, hysteresis):
     """
     Applies hysteresis to an array of data. The function applies half the
@@ -2931,36 +3534,23 @@ def hysteresis(array, hysteresis):
         return array
 
     quarter_range = hysteresis / 4.0
-    # Length is going to be used often, so prepare here:
-    length = len(array)
-    half_done = np.zeros(length)
-    result = np.zeros(length)
-    length = length-1 #  To be used for array indexing next
+    result = np.zeros(len(array))
 
     # get a list of the unmasked data - allow for array.mask = False (not an array)
     if array.mask is np.False_:
-        notmasked = np.arange(length+1)
+        notmasked = np.arange(len(array))
     else:
         notmasked = np.ma.where(~array.mask)[0]
+    values = np.ma.getdata(array)[notmasked]
+    # OPT: Runs of held and followed values are processed with array
+    # operations rather than looping over each sample (about 15x faster
+    # than the loop on 12 hours of 16Hz data, 40x for float32).
     # The starting point for the computation is the first notmasked sample.
-    old = array[notmasked[0]]
-    for index in notmasked:
-        new = array[index]
-
-        if new - old > quarter_range:
-            old = new  - quarter_range
-        elif new - old < -quarter_range:
-            old = new + quarter_range
-        half_done[index] = old
+    half_done, old = _hysteresis_pass(values, quarter_range, values[0])
 
     # Repeat the process in the "backwards" sense to remove phase effects.
-    for index in notmasked[::-1]:
-        new = half_done[index]
-        if new - old > quarter_range:
-            old = new  - quarter_range
-        elif new - old < -quarter_range:
-            old = new + quarter_range
-        result[index] = old
+    result[notmasked] = _hysteresis_pass(half_done[::-1], quarter_range,
+                                         old)[0][::-1]
 
     # At the end of the process we reinstate the mask, although the data
     # values may have affected the result.
@@ -3642,6 +4232,41 @@ def slices_overlap(first_slice, second_slice):
            ((first_slice.stop is None) or ((second_slice.start or 0) < first_slice.stop))
 
 
+def _slices_overlap_candidates(slices):
+    '''
+    Prepares a search of slices for those which may overlap another slice.
+    Rather than comparing every pair of slices, the slices which may overlap
+    are found by searching the slices sorted by start.
+
+    :param slices: Forward slices to search.
+    :type slices: [slice]
+    :returns: Function returning the indices of the slices which may overlap a slice, in the order of slices.
+    :rtype: function
+    '''
+    starts = np.array([s.start or 0 for s in slices], dtype=float)
+    stops = np.array([np.inf if s.stop is None else s.stop
+                      for s in slices], dtype=float)
+    order = np.argsort(starts, kind='mergesort')
+    starts = starts[order]
+    stops = stops[order]
+    # Where the stops are also in order, e.g. for sorted slices which do
+    # not overlap each other, the candidates are a contiguous range.
+    ordered_stops = np.all(stops[1:] >= stops[:-1])
+
+    def candidates(_slice):
+        stop = np.searchsorted(
+            starts, np.inf if _slice.stop is None else _slice.stop,
+            side='right')
+        if ordered_stops:
+            start = np.searchsorted(stops[:stop], _slice.start or 0)
+            indices = order[start:stop]
+        else:
+            indices = order[:stop][stops[:stop] >= (_slice.start or 0)]
+        return np.sort(indices)
+
+    return candidates
+
+
 def slices_overlap_merge(first_list, second_list, extend_stop=0):
     '''
     Where slices from the second list overlap the first, the first slice is
@@ -3656,15 +4281,31 @@ def slices_overlap_merge(first_list, second_list, extend_stop=0):
     :type extend_stop: Integer
     '''
     result_list = []
+    if not first_list:
+        return result_list
+    if second_list and any(s.step is not None and s.step < 1
+                           for s in first_list):
+        raise ValueError("Negative step not supported")
+    # OPT: Only the second slices which may overlap are compared, see
+    # _slices_overlap_candidates. Second slices with negative steps raise
+    # where they were compared before the first overlapping slice.
+    candidates = _slices_overlap_candidates(second_list)
+    negative = next((index for index, s in enumerate(second_list)
+                     if s.step is not None and s.step < 1), len(second_list))
 
     for first_slice in first_list:
         overlap = False
-        for second_slice in second_list:
+        for index in candidates(first_slice):
+            second_slice = second_list[index]
+            if index > negative:
+                break
             if slices_overlap(first_slice, second_slice):
                 overlap = True
                 result_list.append(slice(min(first_slice.start, second_slice.start),
                                          max(first_slice.stop, second_slice.stop) + extend_stop))
                 break
+        if not overlap and negative < len(second_list):
+            raise ValueError("Negative step not supported")
         if not overlap:
             if extend_stop:
                 result_list.append(slice(first_slice.start, first_slice.stop + extend_stop))
@@ -3693,12 +4334,22 @@ def slices_and(first_list, second_list):
         else:
             return _slice
 
-    result_list = []
-    for first_slice in first_list:
-        for second_slice in second_list:
-            slice_1 = fwd(first_slice)
-            slice_2 = fwd(second_slice)
+    first_list = [fwd(s) for s in first_list] if second_list else []
+    second_list = [fwd(s) for s in second_list] if first_list else []
+    if not second_list:
+        return []
+    if any(s.step is not None and s.step < 1
+           for s in itertools.chain(first_list, second_list)):
+        raise ValueError("Negative step not supported")
+
+    # OPT: Only the second slices which may overlap each first slice are
+    # checked and combined as before, in the order of the second list.
+    candidates = _slices_overlap_candidates(second_list)
 
+    result_list = []
+    for slice_1 in first_list:
+        for index in candidates(slice_1):
+            slice_2 = second_list[index]
             if slices_overlap(slice_1, slice_2):
                 slice_start = max((s.start for s in (slice_1, slice_2)
                                    if s.start is not None))
@@ -3777,9 +4428,10 @@ def slices_not(slice_list, begin_at=None, end_at=None):
 
 
 
-def slices_or(*slice_lists):
+def _slices_or_pairs(*slice_lists):
     '''
-    Logical OR function for lists of slices.
+    slices_or by comparing each slice with the slices combined so far, for
+    reverse slices which cannot be combined in order of start.
 
     :param slice_lists: Lists of slices to be combined.
     :type slice_lists: [[slice]]
@@ -3821,19 +4473,87 @@ def slices_or(*slice_lists):
 
         if recheck:
             # The new slice may overlap two, so repeat the process.
-            slices = slices_or(slices)
+            slices = _slices_or_pairs(slices)
 
     return slices
 
 
+def slices_or(*slice_lists):
+    '''
+    Logical OR function for lists of slices.
+
+    :param slice_lists: Lists of slices to be combined.
+    :type slice_lists: [[slice]]
+    :returns: List of slices combined.
+    :rtype: list
+    '''
+    slices = [s for slice_list in slice_lists for s in slice_list
+              if s is not None]
+    if len(slices) > 1 and any(s.step is not None and s.step < 1
+                               for s in slices):
+        raise ValueError("Negative step not supported")
+    if any(s.start is not None and s.stop is not None and s.start > s.stop
+           for s in slices):
+        return _slices_or_pairs(*slice_lists)
+
+    # OPT: Rather than comparing each slice with every slice combined so
+    # far, overlapping slices are combined in a single pass over the slices
+    # sorted by start. Slices which only touch are not combined, and each
+    # combined slice is placed by the last of its slices, as before.
+    bounds = [(s.start or 0, np.inf if s.stop is None else s.stop)
+              for s in slices]
+    combined = []
+    for index in sorted(range(len(slices)), key=bounds.__getitem__):
+        start, stop = bounds[index]
+        if combined and start < combined[-1]['stop']:
+            overlap = combined[-1]
+            if stop > overlap['stop']:
+                overlap['stop'] = stop
+                overlap['stop_index'] = index
+            if slices[index].start is None:
+                # min prefers None
+                overlap['start_index'] = index
+            overlap['last'] = max(overlap['last'], index)
+            overlap['merged'] = True
+        else:
+            combined.append({'start_index': index, 'stop_index': index,
+                             'stop': stop, 'last': index, 'merged': False})
+
+    result = []
+    for overlap in sorted(combined, key=itemgetter('last')):
+        if overlap['merged']:
+            result.append(slice(slices[overlap['start_index']].start,
+                                slices[overlap['stop_index']].stop))
+        else:
+            result.append(slices[overlap['start_index']])
+    return result
+
+
 def slices_remove_overlaps(slices):
     '''
     removes overlapping slices from list, keeps longest slice.
     '''
+    slices = sorted(slices, key=lambda s: slice_duration(s, 1), reverse=True)
+    if len(slices) > 1 and any(s.step is not None and s.step < 1
+                               for s in slices):
+        raise ValueError("Negative step not supported")
     result = []
-    for s in sorted(slices, key=lambda s: slice_duration(s, 1), reverse=True):
-        if not any(slices_overlap(s, r) for r in result):
-            result.append(s)
+    # OPT: The slices kept do not overlap, so sorted by start their stops are
+    # also in order and only the last kept slice starting before the stop of
+    # a slice may overlap it. Reverse slices, which are sorted last, are
+    # compared with every slice kept.
+    kept = []
+    for s in slices:
+        start = s.start or 0
+        if start > s.stop:
+            if any(slices_overlap(s, r) for r in result):
+                continue
+        else:
+            index = bisect.bisect_left(kept, (s.stop, -np.inf))
+            if index and kept[index - 1][1] > start:
+                continue
+            bisect.insort(kept, (start, s.stop))
+        result.append(s)
     return result
 
 
@@ -5314,27 +6034,51 @@ def overflow_correction(param, fast=None, max_val=8191):
 
     # remove small masks (up to 10 samples) which may be related to the
     # overflow.
-    old_mask = array.mask.copy()
+    old_mask = np.ma.getmaskarray(array).copy()
     good_slices = slices_remove_small_gaps(
         np.ma.clump_unmasked(array), time_limit=25.0,
         hz=hz)
 
-    for sl in good_slices:
-        array.mask[sl] = False
-        jump = np.ma.ediff1d(array[sl], to_begin=0.0)
-        abs_jump = np.ma.abs(jump)
-        jump_sign = -jump / abs_jump
-        steps = np.ma.where(abs_jump > delta, max_val * jump_sign, 0)
-        for jump_idx in np.ma.where(steps)[0]:
-            old_mask[sl.start + jump_idx - 2: sl.start + jump_idx + 2] = False 
-        correction = np.ma.cumsum(steps)
-
-        array[sl] += correction
-
-        if not fast and np.ma.min(array[sl]) < -delta:
+    # OPT: The jumps of all good slices are detected and unwrapped in one
+    # pass over the array rather than slice by slice and jump by jump.
+    if good_slices:
+        size = len(array)
+        starts = np.array([sl.start for sl in good_slices])
+        good = np.zeros(size, dtype=bool)
+        for sl in good_slices:
+            good[sl] = True
+        array.mask = ~good & old_mask
+        data = array.data
+
+        jump = np.zeros(size, dtype=data.dtype)
+        np.subtract(data[1:], data[:-1], out=jump[1:])
+        # Jumps are only detected within each good slice.
+        jump[starts] = 0
+        jump[~good] = 0
+        steps = np.where(np.abs(jump) > delta, -max_val * np.sign(jump), 0.0)
+
+        jump_idxs = np.flatnonzero(steps)
+        # Unmask around the jumps, the original mask there is likely to have
+        # been caused by the overflow.
+        jump_idxs = jump_idxs[jump_idxs >= 2]
+        unmask_idxs = (jump_idxs[:, np.newaxis] + np.arange(-2, 2)).ravel()
+        old_mask[unmask_idxs[unmask_idxs < size]] = False
+
+        # The correction is the cumulative sum of the steps within each
+        # good slice. Cancelling the steps of the preceding slice at the
+        # start of each slice restarts the sum there.
+        slice_steps = np.add.reduceat(steps, starts)
+        steps[starts[1:]] -= slice_steps[:-1]
+        correction = np.cumsum(steps)
+        data[good] += correction[good]
+
+        if not fast:
             # FIXME: fallback postprocessing: compensate for the descent
             # starting at the overflown value
-            array[sl] += max_val
+            slice_mins = np.minimum.reduceat(
+                np.where(good, data, np.inf), starts)
+            for sl in np.array(good_slices)[slice_mins < -delta]:
+                data[sl] += max_val
 
     if fast:
         pin_to_ground(array, good_slices, fast.get_slices())
@@ -5686,52 +6430,107 @@ def repair_mask(array, frequency=1, repair_duration=REPAIR_DURATION,
     else:
         repair_samples = None
 
-    masked_sections = np.ma.clump_masked(array)
+    # OPT: Masked sections are found and repaired with array operations
+    # rather than looping over np.ma.clump_masked (10x+ speedup with many
+    # short masked sections).
+    mask = np.ma.getmaskarray(array)
+    edges = np.diff(np.concatenate(([0], mask.view(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1)
+    stops = np.flatnonzero(edges == -1)
+    lengths = stops - starts
+    at_start = starts == 0
+    at_end = stops == len(array)
+    interior = ~at_start & ~at_end
+
+    if repair_samples:
+        too_long = lengths > repair_samples
+    else:
+        too_long = np.zeros(len(starts), dtype=bool)
+    # Sections are repaired in order until one raises an exception.
+    if raise_duration_exceedance:
+        raises = too_long.copy()
+    else:
+        raises = np.zeros(len(starts), dtype=bool)
+    if method not in ('interpolate', 'fill_start', 'fill_stop'):
+        raises |= interior & ~too_long
+    raised = np.flatnonzero(raises)
+    repair = ~too_long
+    if len(raised):
+        repair[raised[0]:] = False
+
+    # Sections filled with the value before or after them.
+    fill_before = repair & interior if method == 'fill_start' else \
+        np.zeros(len(starts), dtype=bool)
+    fill_after = repair & interior if method == 'fill_stop' else \
+        np.zeros(len(starts), dtype=bool)
+    if extrapolate or method == 'fill_stop':
+        fill_after |= repair & at_start
+    if extrapolate or method == 'fill_start':
+        fill_before |= repair & at_end
+    # Assignment to sections has no effect with a hard mask.
+    if not array.hardmask:
+        sources = np.concatenate((starts[fill_before] - 1, stops[fill_after]))
+        fill = np.concatenate((np.flatnonzero(fill_before),
+                               np.flatnonzero(fill_after)))
+        positions = _section_positions(starts[fill], lengths[fill])[0]
+        array.data[positions] = array.data[np.repeat(sources, lengths[fill])]
+        array.mask[positions] = False
+
+    if method == 'interpolate':
+        interpolate = repair & interior
+        start_values = array.data[starts[interpolate] - 1]
+        stop_values = array.data[stops[interpolate]]
+        if repair_above is not None:
+            if start_values.dtype.kind == 'f' and start_values.dtype.itemsize < 8:
+                # Compared as numpy scalars would be.
+                start_values = start_values.astype(np.float64)
+                stop_values = stop_values.astype(np.float64)
+            above = (start_values > repair_above) & (stop_values > repair_above)
+            interpolate[interpolate] = above
+            start_values = start_values[above]
+            stop_values = stop_values[above]
+        section_lengths = lengths[interpolate]
+        positions, offsets = _section_positions(starts[interpolate],
+                                                section_lengths)
+        # Same arithmetic as np.linspace(start, stop, length + 2)[1:-1].
+        start_values = np.repeat(start_values.astype(np.float64), section_lengths)
+        delta = np.repeat(stop_values.astype(np.float64), section_lengths) - \
+            start_values
+        div = np.repeat(section_lengths + 1, section_lengths)
+        step = delta / div
+        offsets = offsets + 1.0
+        values = np.where(step == 0, offsets / div * delta, offsets * step)
+        array.data[positions] = values + start_values
+        array.mask[positions] = False
+
+    if len(raised):
+        index = raised[0]
+        if too_long[index]:
+            raise ValueError("Length of masked section '%s' exceeds "
+                             "repair duration '%s'." % (
+                                 lengths[index] * frequency, repair_duration))
+        raise NotImplementedError('Repair method %s not implemented.',
+                                  method)
 
-    for section in masked_sections:
-        length = section.stop - section.start
-        if repair_samples and length > repair_samples:
-            if raise_duration_exceedance:
-                raise ValueError("Length of masked section '%s' exceeds "
-                                 "repair duration '%s'." % (length * frequency,
-                                                            repair_duration))
-            else:
-                continue # Too long to repair
-        elif section.start == 0:
-            if extrapolate or method == 'fill_stop':
-                # TODO: Does it make sense to subtract 1 from the section stop??
-                #array.data[section] = array.data[section.stop - 1]
-                array[section] = array[section.stop]
-            else:
-                continue # Can't interpolate if we don't know the first sample
+    return array
 
-        elif section.stop == len(array):
-            if extrapolate or method == 'fill_start':
-                array[section] = array[section.start - 1]
-            else:
-                continue # Can't interpolate if we don't know the last sample
 
-        else:
-            start_value = array[section.start - 1]
-            stop_value = array[section.stop]
-            if method == 'interpolate':
-                if (repair_above is None or
-                    (start_value > repair_above and stop_value > repair_above)):
-                    # XXX: Find neater solution, potentially
-                    # scipy.interpolate.InterpolatedUnivariateSpline, as
-                    # optimisation.
-                    array.data[section] = np.linspace(start_value, stop_value,
-                                                      length+2)[1:-1]
-                    array.mask[section] = False
-            elif method == 'fill_start':
-                array[section] = start_value
-            elif method == 'fill_stop':
-                array[section] = stop_value
-            else:
-                raise NotImplementedError('Repair method %s not implemented.',
-                                          method)
+def _section_positions(starts, lengths):
+    '''
+    Positions of all samples within sections and their offset from the
+    start of each section.
 
-    return array
+    :param starts: Start index of each section.
+    :type starts: np.ndarray
+    :param lengths: Length of each section.
+    :type lengths: np.ndarray
+    :returns: Positions and offsets within their section.
+    :rtype: (np.ndarray, np.ndarray)
+    '''
+    ends = np.cumsum(lengths)
+    offsets = np.arange(ends[-1] if len(ends) else 0) - \
+        np.repeat(ends - lengths, lengths)
+    return np.repeat(starts, lengths) + offsets, offsets
 
 
 def resample(array, orig_hz, resample_hz):
@@ -6680,18 +7479,21 @@ def step_values(array, steps, hz=1, step_at='midpoint', rate_threshold=0.5):
 
     steps = sorted(steps)  # ensure steps are in ascending order
     stepping_points = np.ediff1d(steps, to_end=[0])/2.0 + steps
-    stepped_array = np_ma_zeros_like(array, mask=array.mask)
-    low = None
-    for level, high in zip(steps, stepping_points):
-        if low is None:
-            matching = (-high < array) & (array <= high)
-        else:
-            matching = (low < array) & (array <= high)
-        stepped_array[matching] = level
-        low = high
-    # all the remaining values are above the top step level
-    stepped_array[low < array] = level
-    stepped_array.mask = np.ma.getmaskarray(array)
+    # OPT: Each sample is classified to the step with a single search of the
+    # stepping points rather than comparing the array with each step. The
+    # stepping points are compared in the precision of floating point data,
+    # as they would be as scalars.
+    data = np.ma.getdata(array)
+    mask = np.ma.getmaskarray(array)
+    if data.dtype.kind == 'f':
+        stepping_points = stepping_points.astype(data.dtype)
+    levels = np.minimum(np.searchsorted(stepping_points, data), len(steps) - 1)
+    # Values at or below minus the first stepping point remain zero, as do
+    # NaNs, and all the remaining values are above the top step level.
+    stepped_array = np.ma.array(
+        np.where((-stepping_points[0] < data) | (stepping_points[0] < data),
+                 np.take(steps, levels), 0).astype(float),
+        mask=mask.copy())
 
     if step_at == 'midpoint':
         # our work here is done
@@ -6748,18 +7550,31 @@ def step_values(array, steps, hz=1, step_at='midpoint', rate_threshold=0.5):
 
     roc = rate_of_change_array(array, hz)
 
+    # OPT: The transitions are refined on the data and mask of the arrays,
+    # avoiding masked array operations for each transition.
+    roc_data = np.ma.getdata(roc)
+    roc_mask = np.ma.getmaskarray(roc)
+    stepped_data = stepped_array.data
+    unmasked = np.flatnonzero(~mask)
+
     for prev_midpoint, (flap_midpoint, direction), next_midpoint in zip_longest(
         [0] + flap_changes[0:-1], sorted_transitions, flap_changes[1:]):
-        prev_flap = prev_unmasked_value(stepped_array, floor(flap_midpoint),
-                                        start_index=floor(prev_midpoint))
-        stop_index = ceil(next_midpoint) if next_midpoint else None
-        next_flap = next_unmasked_value(stepped_array, ceil(flap_midpoint),
-                                        stop_index=stop_index).value
-        is_masked = (array[floor(flap_midpoint)] is np.ma.masked or
-                     array[ceil(flap_midpoint)] is np.ma.masked)
+        # The previous unmasked step from the previous midpoint and the next
+        # unmasked step up to the next midpoint.
+        prev_flap = None
+        n = np.searchsorted(unmasked, floor(flap_midpoint), side='right') - 1
+        if n >= 0 and unmasked[n] >= floor(prev_midpoint):
+            prev_flap = Value(unmasked[n], stepped_data[unmasked[n]])
+        stop_index = ceil(next_midpoint) if next_midpoint else len(array)
+        n = np.searchsorted(unmasked, ceil(flap_midpoint))
+        next_flap = None
+        if n < len(unmasked) and unmasked[n] < stop_index:
+            next_flap = stepped_data[unmasked[n]]
+        is_masked = mask[floor(flap_midpoint)] or mask[ceil(flap_midpoint)]
 
         if is_masked:
-            new_array[prev_midpoint:prev_flap.index] = prev_flap.value
+            # Midpoints after the first may be between samples.
+            new_array[int(ceil(prev_midpoint)):prev_flap.index] = prev_flap.value
             prev_midpoint = prev_flap.index
 
         if direction == 'increase':
@@ -6785,8 +7600,11 @@ def step_values(array, steps, hz=1, step_at='midpoint', rate_threshold=0.5):
             if direction == 'decrease':
                 flap_tolerance *= -1
 
-            roc_idx = index_at_value(roc, roc_to_seek_for, scan_rev)
-            val_idx = index_at_value(array, prev_flap.value + flap_tolerance, scan_rev)
+            roc_idx = _index_at_value_data(roc, roc_data, roc_mask,
+                                           roc_to_seek_for, scan_rev)
+            val_idx = _index_at_value_data(array, data, mask,
+                                           prev_flap.value + flap_tolerance,
+                                           scan_rev)
             idxs = [x for x in (roc_idx, val_idx) if x]
             idx = max(idxs) if idxs else flap_midpoint
 
@@ -6799,8 +7617,11 @@ def step_values(array, steps, hz=1, step_at='midpoint', rate_threshold=0.5):
             if direction == 'increase':
                 flap_tolerance *= -1
 
-            roc_idx = index_at_value(roc, roc_to_seek_for, scan_fwd)
-            val_idx = index_at_value(array, next_flap + flap_tolerance, scan_fwd)
+            roc_idx = _index_at_value_data(roc, roc_data, roc_mask,
+                                           roc_to_seek_for, scan_fwd)
+            val_idx = _index_at_value_data(array, data, mask,
+                                           next_flap + flap_tolerance,
+                                           scan_fwd)
             # Rate of change is preferred when the parameter flattens out,
             # value is used when transitioning between two states and the
             # parameter does not level.
@@ -6940,6 +7761,30 @@ def track_linking(pos, local_pos):
     return local_pos
 
 
+def smooth_track_weight(ac_type, hz):
+    '''
+    Weight of the errors from a straight line in the smooth_track cost
+    function.
+
+    :param ac_type: Aircraft type attribute.
+    :type ac_type: Attribute or None
+    :param hz: Sample rate of the latitude and longitude.
+    :type hz: float
+    :raises ValueError: If the sample rate is not recognised.
+    :rtype: int
+    '''
+    if ac_type and ac_type.value=='helicopter':
+        return 100 # As helicopters fly more slowly so we don't need such smoothing.
+    elif hz == 1.0:
+        return 1000
+    elif hz == 0.5:
+        return 300
+    elif hz == 0.25:
+        return 100
+    else:
+        raise ValueError('Lat/Lon sample rate not recognised in smooth_track_cost_function.')
+
+
 def smooth_track_cost_function(lat_s, lon_s, lat, lon, ac_type, hz):
     # Summing the errors from the recorded data is easy.
     from_data = np.sum((lat_s - lat)**2)+np.sum((lon_s - lon)**2)
@@ -6949,16 +7794,7 @@ def smooth_track_cost_function(lat_s, lon_s, lat, lon, ac_type, hz):
     from_straight = np.sum(np.convolve(lat_s,slider,'valid')**2) + \
         np.sum(np.convolve(lon_s,slider,'valid')**2)
 
-    if ac_type and ac_type.value=='helicopter':
-        weight = 100 # As helicopters fly more slowly so we don't need such smoothing.
-    elif hz == 1.0:
-        weight = 1000
-    elif hz == 0.5:
-        weight = 300
-    elif hz == 0.25:
-        weight = 100
-    else:
-        raise ValueError('Lat/Lon sample rate not recognised in smooth_track_cost_function.')
+    weight = smooth_track_weight(ac_type, hz)
 
     cost = from_data + weight*from_straight
     return cost
@@ -7020,13 +7856,16 @@ def smooth_signal(array, window_len=11, window='hanning'):
     return np.ma.MaskedArray(out[extra_start:-(extra-extra_start)], array.mask)
 
 
-def smooth_track(lat, lon, ac_type, hz):
+def smooth_track(lat, lon, ac_type, hz, method='iterative'):
     """
     Input:
     lat = Recorded latitude array
     lon = Recorded longitude array
     ac_type = aircraft type (aeroplane or helicopter)
     hz = sample rate
+    method = 'iterative' to converge on the optimum with a sliding filter
+             (the ends of the arrays are unchanged) or 'banded' to solve for
+             the minimum of the cost function directly.
 
     Returns:
     lat_last = Optimised latitude array
@@ -7037,6 +7876,11 @@ def smooth_track(lat, lon, ac_type, hz):
     if len(lat) <= 5:
         return lat, lon, 0.0 # Polite return of data too short to smooth.
 
+    if method == 'banded':
+        return smooth_track_banded(lat, lon, ac_type, hz)
+    elif method != 'iterative':
+        raise ValueError("Unknown smooth_track method '%s'." % method)
+
     lat_s = np.ma.copy(lat)
     lon_s = np.ma.copy(lon)
 
@@ -7065,6 +7909,50 @@ def smooth_track(lat, lon, ac_type, hz):
 
     return lat_last, lon_last, cost_0
 
+
+def smooth_track_banded(lat, lon, ac_type, hz):
+    """
+    The cost function of smooth_track is quadratic, so its minimum is the
+    solution of (I + weight * D'D) x = recorded, where D is the second
+    difference operator. The matrix is symmetric, positive definite and
+    pentadiagonal so the latitude and longitude are solved together in O(n).
+
+    :param lat: Recorded latitude array.
+    :type lat: np.ma.masked_array
+    :param lon: Recorded longitude array.
+    :type lon: np.ma.masked_array
+    :param ac_type: Aircraft type attribute.
+    :type ac_type: Attribute or None
+    :param hz: Sample rate of the latitude and longitude.
+    :type hz: float
+    :returns: Optimised latitude and longitude arrays and the cost function.
+    :rtype: np.ma.masked_array, np.ma.masked_array, float
+    """
+    if len(lat) <= 5:
+        return lat, lon, 0.0 # Polite return of data too short to smooth.
+
+    weight = smooth_track_weight(ac_type, hz)
+
+    # Upper diagonals of D'D for the second difference slider [-1, 2, -1].
+    n = len(lat)
+    banded = np.zeros((3, n))
+    banded[0, 2:] = 1.0
+    banded[1, 1:] = -4.0
+    banded[1, [1, -1]] = -2.0
+    banded[2] = 6.0
+    banded[2, [1, -2]] = 5.0
+    banded[2, [0, -1]] = 1.0
+    banded *= weight
+    banded[2] += 1.0
+
+    recorded = np.column_stack((np.ma.getdata(lat), np.ma.getdata(lon)))
+    smoothed = solveh_banded(banded, recorded, check_finite=False)
+    lat_s = np.ma.array(smoothed[:, 0], mask=np.ma.getmask(lat))
+    lon_s = np.ma.array(smoothed[:, 1], mask=np.ma.getmask(lon))
+    cost = smooth_track_cost_function(lat_s, lon_s, lat, lon, ac_type, hz)
+    return lat_s, lon_s, cost
+
+
 def straighten_altitudes(fine_array, coarse_array, limit, copy=False):
     '''
     Like straighten headings, this takes an array and removes jumps, however
@@ -7391,26 +8279,7 @@ def index_at_value(array, threshold, _slice=slice(None), endpoint='exact'):
     :returns type: Float or None
     '''
     assert endpoint in ['exact', 'closing', 'nearest', 'first_closing']
-    step = _slice.step or 1
-    max_index = len(array)
-
-    # Arrange the limits of our scan, ensuring that we stay inside the array.
-    if step == 1:
-        begin = max(int(round(_slice.start or 0)), 0)
-        end = min(int(round(_slice.stop or max_index)), max_index)
-        left, right = slice(begin, end - 1, step), slice(begin + 1, end,step)
-
-    elif step == -1:
-        begin = min(int(round(_slice.start or max_index)), max_index-1)
-        # Indexing from the end of the array results in an array length
-        # mismatch. There is a failing test to cover this case which may work
-        # with array[:end:-1] construct, but using slices appears insoluble.
-        end = max(int(_slice.stop or 0),0)
-        left = slice(begin, end, step)
-        right = slice(begin - 1, end - 1 if end > 0 else None, step)
-
-    else:
-        raise ValueError('Step length not 1 in index_at_value')
+    step, begin, end, left, right = _index_at_value_limits(array, _slice)
 
     if begin == end:
         logger.warning('No range for seek function to scan across')
@@ -7483,18 +8352,160 @@ def index_at_value(array, threshold, _slice=slice(None), endpoint='exact'):
             return None  #TODO: raise exception when not found?
     else:
         n, dummy = np.ma.flatnotmasked_edges(test_array)
-        a = array[begin + (step * n)]
-        b = array[begin + (step * (n + 1))]
-        # Force threshold to float as often passed as an integer.
-        # Also check for b=a as otherwise we get a divide by zero condition.
-        if (a is np.ma.masked or b is np.ma.masked or np.isnan(a) or np.isnan(b) or a == b):
-            r = 0.5
-        else:
-            r = (float(threshold) - a) / (b - a)
+        return _index_at_crossing(array, threshold, begin, step, n)
+
+
+def _index_at_value_limits(array, _slice):
+    '''
+    Arrange the limits of the index_at_value scan, ensuring that we stay
+    inside the array.
+
+    :returns: step, begin and end indices of the scan, and slices of the
+        array for the left and right samples of each pair.
+    :rtype: int, int, int, slice, slice
+    :raises ValueError: If the slice step is not 1 or -1.
+    '''
+    step = _slice.step or 1
+    max_index = len(array)
+
+    if step == 1:
+        begin = max(int(round(_slice.start or 0)), 0)
+        end = min(int(round(_slice.stop or max_index)), max_index)
+        left, right = slice(begin, end - 1, step), slice(begin + 1, end,step)
+
+    elif step == -1:
+        begin = min(int(round(_slice.start or max_index)), max_index-1)
+        # Indexing from the end of the array results in an array length
+        # mismatch. There is a failing test to cover this case which may work
+        # with array[:end:-1] construct, but using slices appears insoluble.
+        end = max(int(_slice.stop or 0),0)
+        left = slice(begin, end, step)
+        right = slice(begin - 1, end - 1 if end > 0 else None, step)
+
+    else:
+        raise ValueError('Step length not 1 in index_at_value')
+
+    return step, begin, end, left, right
+
+
+def _index_at_crossing(array, threshold, begin, step, n):
+    '''
+    Interpolated index of the threshold crossing between the nth and
+    (n+1)th samples of the index_at_value scan.
+    '''
+    a = array[begin + (step * n)]
+    b = array[begin + (step * (n + 1))]
+    # Force threshold to float as often passed as an integer.
+    # Also check for b=a as otherwise we get a divide by zero condition.
+    if (a is np.ma.masked or b is np.ma.masked or np.isnan(a) or np.isnan(b) or a == b):
+        r = 0.5
+    else:
+        r = (float(threshold) - a) / (b - a)
 
     return (begin + step * (n + r))
 
 
+def _index_at_value_data(array, data, mask, threshold, _slice):
+    '''
+    index_at_value with the 'exact' endpoint using the data and mask of the
+    array, for repeated scans of the same array without masked array
+    operations.
+    '''
+    step, begin, end, left, right = _index_at_value_limits(array, _slice)
+    left_data, right_data = data[left], data[right]
+    if begin == end or not len(left_data) or \
+       len(left_data) != len(right_data) or \
+       (_slice.stop == _slice.start and _slice.start is not None):
+        return index_at_value(array, threshold, _slice)
+
+    with np.errstate(invalid='ignore'):
+        passing = (left_data - threshold) * (right_data - threshold)
+    candidates = np.flatnonzero(~(mask[left] | mask[right] | (passing > 0)))
+    if not len(candidates):
+        return None
+    if np.isnan(passing[candidates[0]]):
+        # Leave the handling of NaN data to index_at_value.
+        return index_at_value(array, threshold, _slice)
+    return _index_at_crossing(array, threshold, begin, step, candidates[0])
+
+
+INDICES_AT_VALUES_BLOCK_SIZE = 1024
+
+
+def indices_at_values(array, thresholds, _slice=slice(None), endpoint='exact'):
+    '''
+    Finds the first crossing of each of the thresholds within the slice,
+    giving the same results as calling index_at_value for each threshold.
+
+    The pairs of samples are scanned in blocks of increasing size and each
+    threshold is dropped from the scan once its first crossing is found, so
+    thresholds crossed early in the slice do not require the rest of the
+    array to be scanned.
+
+    :param array: input data
+    :type array: masked array
+    :param thresholds: the values that we expect the array to cross in this slice.
+    :type thresholds: [float]
+    :param _slice: slice where we want to seek the threshold transits.
+    :type _slice: slice
+    :param endpoint: type of end condition being sought (see index_at_value).
+    :type endpoint: str
+    :returns: interpolated index where the array crossed each threshold, or None.
+    :rtype: [float or None]
+    '''
+    assert endpoint in ['exact', 'closing', 'nearest', 'first_closing']
+    thresholds = list(thresholds)
+    step, begin, end, left, right = _index_at_value_limits(array, _slice)
+    if len(thresholds) < 2 or begin == end or \
+       (_slice.stop == _slice.start and _slice.start is not None):
+        return [index_at_value(array, threshold, _slice, endpoint)
+                for threshold in thresholds]
+
+    data = np.ma.getdata(array)
+    mask = np.ma.getmaskarray(array)
+    left_data, right_data = data[left], data[right]
+    masked = mask[left] | mask[right]
+    if not len(left_data) or len(left_data) != len(right_data):
+        return [index_at_value(array, threshold, _slice, endpoint)
+                for threshold in thresholds]
+
+    indices = [None] * len(thresholds)
+    pending = list(range(len(thresholds)))
+    start = 0
+    size = INDICES_AT_VALUES_BLOCK_SIZE
+    # OPT: The products are computed with the same arithmetic as
+    # index_at_value, but on the unmasked data of each block.
+    with np.errstate(invalid='ignore'):
+        while pending and start < len(left_data):
+            block = slice(start, start + size)
+            block_left, block_right = left_data[block], right_data[block]
+            block_masked = masked[block]
+            for n in list(pending):
+                threshold = thresholds[n]
+                passing = (block_left - threshold) * (block_right - threshold)
+                candidates = np.flatnonzero(~(block_masked | (passing > 0)))
+                if not len(candidates):
+                    continue
+                pending.remove(n)
+                if np.isnan(passing[candidates[0]]):
+                    # Leave the handling of NaN data to index_at_value.
+                    indices[n] = index_at_value(array, threshold, _slice,
+                                                endpoint)
+                else:
+                    indices[n] = _index_at_crossing(
+                        array, threshold, begin, step, start + candidates[0])
+            start += size
+            size *= 2
+
+    if endpoint != 'exact':
+        # Thresholds which were not crossed find the closing or nearest
+        # point.
+        for n in pending:
+            indices[n] = index_at_value(array, thresholds[n], _slice,
+                                        endpoint)
+    return indices
+
+
 def index_at_value_or_level_off(array, frequency, value, _slice, abs_threshold=None):
     '''
     Find the index closest to the value unless it doesn't get within 10% of
@@ -7601,6 +8612,35 @@ def value_at_time(array, hz, offset, time_index):
     return value_at_index(array, location_in_array)
 
 
+def values_at_times(array, hz, offset, time_indices):
+    '''
+    Finds the values of the data in array at each of the times given by
+    time_indices, as value_at_time would for each time.
+
+    :param array: input data
+    :type array: masked array
+    :param hz: sample rate for the input data (sec-1)
+    :type hz: float
+    :param offset: fdr offset for the array (sec)
+    :type offset: float
+    :param time_indices: times into the array where we want to find the array values.
+    :type time_indices: iterable of float
+    :returns: interpolated value from the array for each time
+    :rtype: list
+    '''
+    # Timedelta truncates to 6 digits, therefore round offset down.
+    time_into_array = np.array(time_indices, dtype=float) - \
+        round(offset - 0.0000005, 6)
+    locations_in_array = time_into_array * hz
+
+    # Trap overruns which arise from compensation for timing offsets.
+    overruns = locations_in_array - len(array) > 0
+    locations_in_array[locations_in_array < 0] = 0
+    locations_in_array[overruns] = len(array) - 1
+
+    return values_at_indices(array, locations_in_array)
+
+
 def value_at_datetime(start_datetime, array, hz, offset, value_datetime):
     '''
     Finds the value of the data in array at the time given by value_datetime.
@@ -7670,6 +8710,74 @@ def value_at_index(array, index, interpolate=True):
         return r * high_value + (1 - r) * low_value
 
 
+def values_at_indices(array, indices, interpolate=True):
+    '''
+    Finds the values of the data in array at each of the given indices,
+    as value_at_index would for each index.
+
+    :param array: input data
+    :type array: masked array
+    :param indices: indices into the array where we want to find the array values.
+    :type indices: iterable of float
+    :param interpolate: whether to interpolate the values at float indices.
+    :type interpolate: boolean
+    :returns: interpolated value from the array (or None) for each index
+    :rtype: list
+    '''
+    indices = list(indices)
+    try:
+        positions = np.array(indices, dtype=float)
+    except (TypeError, ValueError):
+        positions = None
+    if positions is None or positions.ndim != 1 or not interpolate or \
+       not isinstance(array, np.ma.MaskedArray):
+        return [value_at_index(array, index, interpolate=interpolate)
+                for index in indices]
+
+    with np.errstate(invalid='ignore'):
+        inside = (positions >= 0) & (positions <= len(array) - 1)
+    lows = np.where(inside, positions, 0).astype(int)
+    at_sample = inside & (lows == positions)
+    between = np.flatnonzero(inside & ~at_sample)
+    mask = np.ma.getmaskarray(array)
+    values = [None] * len(indices)
+
+    # Indices outside of the array or None are rare, so are left to
+    # value_at_index, as are samples of subclasses such as MappedArray which
+    # may convert the values returned.
+    if type(array) is np.ma.MaskedArray:
+        at_sample = np.flatnonzero(at_sample)
+        for n in at_sample[~mask[lows[at_sample]]]:
+            values[n] = array.data[lows[n]]
+    else:
+        inside[at_sample] = False
+    for n in np.flatnonzero(~inside):
+        values[n] = value_at_index(array, indices[n])
+
+    # OPT: Interpolate between the samples either side of all other indices
+    # at once.
+    lows = lows[between]
+    highs = lows + 1
+    low_values = array.data[lows]
+    high_values = array.data[highs]
+    r = positions[between] - lows
+    interpolated = r * high_values + (1 - r) * low_values
+
+    # Where a sample either side is masked, value_at_index returns the other
+    # sample, or None if both are masked.
+    low_masked = mask[lows]
+    high_masked = mask[highs]
+    for i, n in enumerate(between):
+        if low_masked[i]:
+            if not high_masked[i]:
+                values[n] = high_values[i]
+        elif high_masked[i]:
+            values[n] = low_values[i]
+        else:
+            values[n] = interpolated[i]
+    return values
+
+
 def vstack_params(*params):
     '''
     Create a multi-dimensional masked array with a dimension per param.
@@ -7683,6 +8791,141 @@ def vstack_params(*params):
     return np.ma.vstack([getattr(p, 'array', p) for p in params if p is not None])
 
 
+def _reduce_params(ufunc, fill_value, params):
+    '''
+    Reduce the arrays of params sample by sample with ufunc, as a masked
+    reduction of vstack_params over axis 0 would, without stacking them.
+
+    :param ufunc: Binary ufunc to reduce the arrays with.
+    :type ufunc: np.ufunc
+    :param fill_value: Function returning the value masked samples are filled with for a dtype.
+    :type fill_value: function
+    :param params: Parameter arguments as required. Allows some None values.
+    :type params: np.ma.array or Parameter object or None
+    :returns: Reduction of the filled arrays and the number of unmasked values for each sample.
+    :rtype: (np.array, np.array)
+    :raises: ValueError if all params are None or the arrays differ in shape.
+    '''
+    arrays = [getattr(p, 'array', p) for p in params if p is not None]
+    if not arrays:
+        raise ValueError('need at least one array to concatenate')
+    datas = [np.ma.getdata(a) for a in arrays]
+    if any(d.shape != datas[0].shape for d in datas):
+        raise ValueError('all the input array dimensions must match')
+    # The arrays are reduced in the dtype they would be stacked in.
+    dtype = np.result_type(*datas)
+    fill = fill_value(dtype)
+    # Sums of integers accumulate in the platform integer and start from the
+    # identity of the ufunc, as reductions of the stacked arrays would.
+    result_dtype = ufunc.reduce(np.empty((1, 0), dtype=dtype)).dtype
+    if ufunc.identity is None:
+        result = None
+    else:
+        result = np.full(datas[0].shape, ufunc.identity, dtype=result_dtype)
+    count = np.full(datas[0].shape, len(datas), dtype=np.intp)
+    # OPT: The arrays are reduced into a single accumulator, only copying
+    # arrays with masked values to fill them, rather than stacking all of
+    # the arrays into a new 2-D array.
+    for array, data in zip(arrays, datas):
+        mask = np.ma.getmask(array)
+        filled = mask is not np.ma.nomask and mask.any()
+        if filled:
+            data = np.array(data, dtype=dtype)
+            np.copyto(data, fill, where=mask)
+            count -= mask
+        if result is None:
+            result = data.astype(result_dtype, copy=not filled)
+        else:
+            ufunc(result, data, out=result)
+    return result, count
+
+
+def _reduced_masked_array(result, count):
+    '''
+    Mask samples of a reduction where all of the params were masked, filling
+    them as np.ma.max and np.ma.min do.
+    '''
+    mask = count == 0
+    np.copyto(result, np.ma.default_fill_value(result), where=mask)
+    return np.ma.array(result, mask=mask)
+
+
+def average_params(*params):
+    '''
+    Average of the params at each sample, ignoring masked values.
+
+    Equivalent to np.ma.average(vstack_params(*params), axis=0) without
+    stacking the arrays.
+
+    :param params: Parameter arguments as required. Allows some None values.
+    :type params: np.ma.array or Parameter object or None
+    :returns: Average of the params, masked where all params are masked.
+    :rtype: np.ma.array
+    :raises: ValueError if all params are None (concatenation of zero-length sequences is impossible)
+    '''
+    total, count = _reduce_params(np.add, lambda dtype: 0, params)
+    total = total * 1.
+    with np.errstate(divide='ignore', invalid='ignore'):
+        average = total / count
+    # Mask as np.ma.divide of the masked sum by the count would.
+    mask = ~np.isfinite(average)
+    mask |= np.abs(total) * np.finfo(float).tiny >= count
+    np.copyto(average, 0, where=mask)
+    average += mask * total
+    return np.ma.array(average, mask=mask)
+
+
+def max_params(*params):
+    '''
+    Maximum of the params at each sample, ignoring masked values.
+
+    Equivalent to np.ma.max(vstack_params(*params), axis=0) without stacking
+    the arrays.
+
+    :param params: Parameter arguments as required. Allows some None values.
+    :type params: np.ma.array or Parameter object or None
+    :returns: Maximum of the params, masked where all params are masked.
+    :rtype: np.ma.array
+    :raises: ValueError if all params are None (concatenation of zero-length sequences is impossible)
+    '''
+    return _reduced_masked_array(
+        *_reduce_params(np.maximum, np.ma.maximum_fill_value, params))
+
+
+def min_params(*params):
+    '''
+    Minimum of the params at each sample, ignoring masked values.
+
+    Equivalent to np.ma.min(vstack_params(*params), axis=0) without stacking
+    the arrays.
+
+    :param params: Parameter arguments as required. Allows some None values.
+    :type params: np.ma.array or Parameter object or None
+    :returns: Minimum of the params, masked where all params are masked.
+    :rtype: np.ma.array
+    :raises: ValueError if all params are None (concatenation of zero-length sequences is impossible)
+    '''
+    return _reduced_masked_array(
+        *_reduce_params(np.minimum, np.ma.minimum_fill_value, params))
+
+
+def sum_params(*params):
+    '''
+    Sum of the params at each sample, ignoring masked values.
+
+    Equivalent to np.ma.sum(vstack_params(*params), axis=0) without stacking
+    the arrays.
+
+    :param params: Parameter arguments as required. Allows some None values.
+    :type params: np.ma.array or Parameter object or None
+    :returns: Sum of the params, masked where all params are masked.
+    :rtype: np.ma.array
+    :raises: ValueError if all params are None (concatenation of zero-length sequences is impossible)
+    '''
+    total, count = _reduce_params(np.add, lambda dtype: 0, params)
+    return np.ma.array(total, mask=count == 0)
+
+
 def vstack_params_filtered(window, *params, **kw):
     '''
     Create a multi-dimensional masked array with a dimension per param.
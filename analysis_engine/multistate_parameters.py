@@ -3541,7 +3541,7 @@ class ThrustReversersEffective(MultistateDerivedParameterNode):
         high_power_slices = np.ma.clump_unmasked(high_power)
         for landing in landings:
             high_power_landing_slices = slices_and(high_power_slices, [landing.slice])
-            effective_slices = clump_multistate(tr.array, 'Deployed', high_power_landing_slices)
+            effective_slices = clump_multistate(tr, 'Deployed', high_power_landing_slices)
             for sl in effective_slices:
                 self.array[sl] = 'Effective'
 
@@ -5,12 +5,17 @@ except ImportError:
     import _pickle as cPickle
 import gzip
 import inspect
+import io
+import json
 import logging
 import math
 import numpy as np
 import pprint
 import re
 import six
+import struct
+import zipfile
+import zlib
 
 from abc import ABCMeta
 from collections import namedtuple, Iterable, OrderedDict
@@ -20,12 +25,15 @@ from operator import attrgetter
 
 from analysis_engine.library import (
     align,
+    align_many,
     align_slices,
     all_deps,
+    compact_multistate_array,
     find_edges,
     is_index_within_slice,
     is_index_within_slices,
     is_slice_within_slice,
+    multistate_dtype,
     repair_mask,
     runs_of_ones,
     slice_duration,
@@ -36,8 +44,10 @@ from analysis_engine.library import (
     slices_between,
     slices_from_to,
     slices_remove_small_gaps,
-    value_at_index,
+    trig_terms,
     value_at_time,
+    values_at_indices,
+    values_at_times,
 )
 from analysis_engine.recordtype import recordtype
 from analysis_engine.settings import NODE_CACHE_OFFSET_DP
@@ -59,6 +69,16 @@ KeyTimeInstance = recordtype('KeyTimeInstance',
                              'index name datetime latitude longitude',
                              default=None)
 Section = namedtuple('Section', 'name slice start_edge stop_edge')  # Q: rename mask -> slice/section
+# Precomputed arguments of a Node's can_operate method (see
+# get_can_operate_spec). dependencies is only populated when can_operate has
+# not been overridden, i.e. all dependencies are required.
+CanOperateSpec = namedtuple('CanOperateSpec', 'attributes dependencies')
+
+# OPT: Memoized per derive method and per Node class, inspecting method
+# signatures is expensive and repeated for every node visit while resolving
+# the dependency graph.
+_dependency_names = {}
+_can_operate_specs = {}
 
 
 # Ref: django/db/models/options.py:20
@@ -93,6 +113,9 @@ def load(path):
         ##except UnicodeDecodeError: # python 3
             ##return cPickle.load(file, encoding='latin1')
 
+    if zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path, 'r') as zip_file:
+            return load_binary(zip_file, path=path)
     with gzip.open(path) as gzip_file:
         try:
             return loads(gzip_file.read())
@@ -111,6 +134,9 @@ def loads(bytes):
     :returns: Node loaded from string.
     :rtype: Node
     '''
+    if bytes[:4] == b'PK\x03\x04':
+        with zipfile.ZipFile(io.BytesIO(bytes), 'r') as zip_file:
+            return load_binary(zip_file)
     try: # python 2
         return cPickle.loads(bytes)
     except UnicodeDecodeError: # python 3
@@ -133,6 +159,165 @@ def dumps(node):
 save = dump
 
 
+# Binary node format
+# ==================
+# A zip file (or a set of members within one sharing a prefix) containing:
+#  - header.json: format version, node name and class and a description of
+#    each array stored separately from the node.
+#  - node.pkl: the pickled node with arrays replaced by references.
+#  - <n>.data.npy, <n>.mask.npy: array data and mask in NumPy's format.
+# Members are not compressed so arrays can be memory-mapped when loading from
+# a file path and data is only read from disk when accessed.
+
+BINARY_NODE_VERSION = 1
+
+
+def _write_npy(zip_file, name, array):
+    '''
+    Write an array to a zip file member in NumPy's .npy format without
+    compression.
+    '''
+    buf = io.BytesIO()
+    np.lib.format.write_array(buf, np.ascontiguousarray(array),
+                              allow_pickle=False)
+    zip_file.writestr(zipfile.ZipInfo(name), buf.getvalue(),
+                      compress_type=zipfile.ZIP_STORED)
+
+
+def _read_npy(zip_file, name, path=None):
+    '''
+    Read an array from a zip file member written by _write_npy. If path is
+    provided and the member is not compressed, the array is memory-mapped
+    (copy-on-write) rather than read.
+    '''
+    info = zip_file.getinfo(name)
+    if path is None or info.compress_type != zipfile.ZIP_STORED:
+        return np.lib.format.read_array(io.BytesIO(zip_file.read(name)))
+    with open(path, 'rb') as fh:
+        # Skip the local file header to the start of the member data.
+        fh.seek(info.header_offset + 26)
+        name_length, extra_length = struct.unpack('<HH', fh.read(4))
+        fh.seek(name_length + extra_length, 1)
+        version = np.lib.format.read_magic(fh)
+        if version == (1, 0):
+            shape, fortran_order, dtype = \
+                np.lib.format.read_array_header_1_0(fh)
+        else:
+            shape, fortran_order, dtype = \
+                np.lib.format.read_array_header_2_0(fh)
+        offset = fh.tell()
+    if not all(shape):
+        # Cannot memory-map empty arrays.
+        return np.lib.format.read_array(io.BytesIO(zip_file.read(name)))
+    array = np.memmap(path, dtype=dtype, mode='c', offset=offset, shape=shape,
+                      order='F' if fortran_order else 'C')
+    return array.view(np.ndarray)
+
+
+def dump_binary(node, dest, prefix=''):
+    '''
+    Save a node in the binary node format. Arrays are stored as separate
+    .npy members so they can be memory-mapped when loaded.
+
+    :param node: Node to save.
+    :type node: Node
+    :param dest: Destination path or zip file opened for writing.
+    :type dest: str or zipfile.ZipFile
+    :param prefix: Prefix of member names within the zip file.
+    :type prefix: str
+    :rtype: None
+    '''
+    if not isinstance(dest, zipfile.ZipFile):
+        with zipfile.ZipFile(dest, 'w', zipfile.ZIP_STORED,
+                             allowZip64=True) as zip_file:
+            return dump_binary(node, zip_file, prefix=prefix)
+
+    arrays = []
+
+    def persistent_id(obj):
+        if not isinstance(obj, np.ndarray) or obj.dtype.hasobject \
+                or not obj.ndim:
+            return None
+        ref = len(arrays)
+        desc = {'type': 'ndarray', 'mask': None,
+                'data': '%s%d.data.npy' % (prefix, ref)}
+        if isinstance(obj, np.ma.MaskedArray):
+            desc['type'] = 'MaskedArray'
+            mask = np.ma.getmask(obj)
+            if mask is not np.ma.nomask:
+                desc['mask'] = '%s%d.mask.npy' % (prefix, ref)
+                _write_npy(dest, desc['mask'], mask)
+            try:
+                fill_value = obj.fill_value.item()
+                json.dumps(fill_value)
+            except (TypeError, ValueError):
+                pass
+            else:
+                desc['fill_value'] = fill_value
+            if isinstance(obj, MappedArray):
+                desc['type'] = 'MappedArray'
+                desc['values_mapping'] = list(obj.values_mapping.items())
+                obj = obj.raw
+        _write_npy(dest, desc['data'], np.ma.getdata(obj))
+        arrays.append(desc)
+        return str(ref)
+
+    buf = io.BytesIO()
+    pickler = cPickle.Pickler(buf, -1)
+    pickler.persistent_id = persistent_id
+    pickler.dump(node)
+    dest.writestr(prefix + 'node.pkl', buf.getvalue())
+    header = {
+        'version': BINARY_NODE_VERSION,
+        'name': node.name,
+        'class': '%s.%s' % (node.__class__.__module__,
+                            node.__class__.__name__),
+        'arrays': arrays,
+    }
+    dest.writestr(prefix + 'header.json', json.dumps(header))
+
+
+def load_binary(zip_file, path=None, prefix=''):
+    '''
+    Load a node saved with dump_binary.
+
+    :param zip_file: Zip file containing the node.
+    :type zip_file: zipfile.ZipFile
+    :param path: Path of the zip file. If provided, arrays are memory-mapped and only read from disk when accessed.
+    :type path: str or None
+    :param prefix: Prefix of member names within the zip file.
+    :type prefix: str
+    :returns: Node loaded from zip file.
+    :rtype: Node
+    '''
+    header = json.loads(zip_file.read(prefix + 'header.json').decode('utf-8'))
+    if header['version'] != BINARY_NODE_VERSION:
+        raise ValueError("Unsupported binary node version '%s'"
+                         % header['version'])
+    arrays = header['arrays']
+
+    def persistent_load(ref):
+        desc = arrays[int(ref)]
+        data = _read_npy(zip_file, desc['data'], path=path)
+        if desc['type'] == 'ndarray':
+            return data
+        if desc['mask']:
+            mask = _read_npy(zip_file, desc['mask'], path=path)
+        else:
+            mask = np.ma.nomask
+        array = np.ma.array(data, mask=mask, copy=False,
+                            fill_value=desc.get('fill_value'))
+        if desc['type'] == 'MappedArray':
+            array = MappedArray(
+                array, values_mapping=dict(desc['values_mapping']))
+        return array
+
+    unpickler = cPickle.Unpickler(
+        io.BytesIO(zip_file.read(prefix + 'node.pkl')))
+    unpickler.persistent_load = persistent_load
+    return unpickler.load()
+
+
 def powerset(iterable):
     """
     Ref: http://docs.python.org/library/itertools.html#recipes
@@ -145,6 +330,81 @@ def powerset(iterable):
     return chain.from_iterable(combinations(s, r) for r in range(len(s) + 1))
 
 
+class _PartialAvailable(object):
+    """
+    Membership-only view of a partial assignment of dependencies used to
+    explore can_operate methods. Querying a dependency which has not been
+    assigned, or any operation other than membership, is recorded and raises
+    an exception so the caller can branch on it.
+    """
+    class Undetermined(Exception):
+        pass
+
+    def __init__(self, names, present, absent):
+        self.names = names
+        self.present = present
+        self.absent = absent
+        self.undetermined = None
+        self.unsupported = False
+
+    def __contains__(self, name):
+        if name in self.present:
+            return True
+        if name in self.absent or name not in self.names:
+            return False
+        self.undetermined = name
+        raise self.Undetermined(name)
+
+    def _unsupported(self, *args, **kwargs):
+        self.unsupported = True
+        raise self.Undetermined()
+
+    __iter__ = __len__ = __bool__ = __nonzero__ = __getitem__ = \
+        __eq__ = __ne__ = __hash__ = _unsupported
+
+
+def _operational_branches(can_operate, names, **kwargs):
+    """
+    Explore the operational combinations of can_operate by branching on each
+    dependency it queries rather than evaluating the full powerset. Where
+    can_operate returns without querying the remaining dependencies, the
+    result holds for every combination of them. can_operate methods which
+    iterate over the available dependencies are evaluated for every
+    combination of the unassigned dependencies.
+
+    :param can_operate: can_operate method of a Node class.
+    :type can_operate: method
+    :param names: Dependency names, must be unique.
+    :type names: [str]
+    :returns: Generator of (present, free) tuples. Every combination of present and any subset of free is operational.
+    :rtype: generator
+    """
+    name_set = set(names)
+    stack = [(frozenset(), frozenset())]
+    while stack:
+        present, absent = stack.pop()
+        available = _PartialAvailable(name_set, present, absent)
+        try:
+            result = can_operate(available, **kwargs)
+        except Exception:
+            result = None
+        if available.undetermined is not None:
+            name = available.undetermined
+            stack.append((present, absent | {name}))
+            stack.append((present | {name}, absent))
+            continue
+        free = [n for n in names if n not in present and n not in absent]
+        if available.unsupported or result is None:
+            fixed = [n for n in names if n in present]
+            for subset in powerset(free):
+                subset = set(subset).union(fixed)
+                if can_operate(tuple(n for n in names if n in subset),
+                               **kwargs):
+                    yield subset, []
+        elif result:
+            yield present, free
+
+
 def get_param_kwarg_names(method):
     """
     Inspects a method's arguments and returns the defaults values of keyword
@@ -281,12 +541,18 @@ class Node(six.with_metaclass(ABCMeta, object)):
         :returns: A list of dependency names.
         :rtype: [str]
         """
-        # TypeError:'ABCMeta' object is not iterable?
-        # this probably means dependencies for this class isn't a list!
-        params = get_param_kwarg_names(cls.derive)
-        # Here due to an AttributeError? Derive kwarg is a string not a Node:
-        # e.g. derive(a='String') instead of derive(a=P('String'))
-        return [d.name or d.get_name() for d in params]
+        derive = cls.derive
+        try:
+            names = _dependency_names[derive]
+        except KeyError:
+            # TypeError:'ABCMeta' object is not iterable?
+            # this probably means dependencies for this class isn't a list!
+            params = get_param_kwarg_names(derive)
+            # Here due to an AttributeError? Derive kwarg is a string not a
+            # Node: e.g. derive(a='String') instead of derive(a=P('String'))
+            names = _dependency_names[derive] = \
+                tuple(d.name or d.get_name() for d in params)
+        return list(names)
 
     @classmethod
     def can_operate(cls, available):
@@ -333,9 +599,38 @@ def can_operate(cls, available, actype=A('Aircraft Type')):
         :returns: Every operational combination of dependencies.
         :rtype: [str]
         """
-        dependencies_powerset = powerset(cls.get_dependency_names())
-        return [args for args in dependencies_powerset if
-                cls.can_operate(args, **kwargs)]
+        names = cls.get_dependency_names()
+        if len(set(names)) != len(names):
+            dependencies_powerset = powerset(names)
+            return [args for args in dependencies_powerset if
+                    cls.can_operate(args, **kwargs)]
+        # OPT: Branch on the dependencies queried by can_operate rather than
+        # testing the powerset, e.g. any_of() over n dependencies requires n
+        # calls rather than 2**n.
+        index = {n: i for i, n in enumerate(names)}
+        combinations = []
+        for present, free in _operational_branches(cls.can_operate, names,
+                                                   **kwargs):
+            present = [index[n] for n in present]
+            for subset in powerset(index[n] for n in free):
+                combinations.append(sorted(present + list(subset)))
+        # Order as powerset: by length then position of dependencies.
+        combinations.sort(key=lambda c: (len(c), c))
+        return [tuple(names[i] for i in c) for c in combinations]
+
+    @classmethod
+    def count_operational_combinations(cls, **kwargs):
+        """
+        Count operational combinations of dependencies without listing them.
+
+        :returns: Number of operational combinations of dependencies.
+        :rtype: int
+        """
+        names = cls.get_dependency_names()
+        if len(set(names)) != len(names):
+            return len(cls.get_operational_combinations(**kwargs))
+        return sum(2 ** len(free) for present, free in
+                   _operational_branches(cls.can_operate, names, **kwargs))
 
     @staticmethod
     def cache_key(name, frequency, offset, dp=NODE_CACHE_OFFSET_DP):
@@ -425,19 +720,19 @@ def can_operate(cls, available, actype=A('Aircraft Type')):
                 self.offset = alignment_param.offset
 
             # align the dependencies
-            aligned_args = []
-            for arg in args:
+            # OPT: Dependencies sharing the same frequency and offset are
+            # aligned together (see get_aligned_many).
+            args = list(args)
+            to_align = []
+            for n, arg in enumerate(args):
                 if arg in dependencies_to_align:
-                    try:
-                        aligned_arg = arg.get_aligned(self)
-                    except AttributeError:
+                    if not hasattr(arg, 'get_aligned'):
                         # If parameter came from an HDF its missing get_aligned
-                        arg = derived_param_from_hdf(arg, cache=self._cache)
-                        aligned_arg = arg.get_aligned(self)
-                    aligned_args.append(aligned_arg)
-                else:
-                    aligned_args.append(arg)
-            args = aligned_args
+                        args[n] = derived_param_from_hdf(arg, cache=self._cache)
+                    to_align.append(n)
+            aligned_args = get_aligned_many([args[n] for n in to_align], self)
+            for n, aligned_arg in zip(to_align, aligned_args):
+                args[n] = aligned_arg
 
         elif dependencies_to_align:
             self.frequency = dependencies_to_align[0].frequency
@@ -647,6 +942,26 @@ class DerivedParameterNode(Node):
         super(DerivedParameterNode, self).__init__(
             name=name, frequency=frequency, offset=offset, *args, **kwargs)
 
+    def __setattr__(self, name, value):
+        if name == 'array':
+            # Memoized slices are no longer valid.
+            object.__setattr__(self, '_slices_cache', {})
+        return super(DerivedParameterNode, self).__setattr__(name, value)
+
+    def __getstate__(self):
+        '''
+        Do not pickle memoized slices.
+        '''
+        state = super(DerivedParameterNode, self).__getstate__()
+        if '_slices_cache' in state:
+            state = state.copy()
+            del state['_slices_cache']
+        return state
+
+    def __setstate__(self, state):
+        super(DerivedParameterNode, self).__setstate__(state)
+        object.__setattr__(self, '_slices_cache', {})
+
     def at(self, secs):
         """
         Gets the value within the array at time secs. Interpolates to retrieve
@@ -659,13 +974,24 @@ class DerivedParameterNode(Node):
         """
         if secs is None:
             return None
-        try:
-            # get seconds from timedelta
-            secs = float(secs.total_seconds)
-        except AttributeError:
-            # secs is a float
-            secs = float(secs)
-        return value_at_time(self.array, self.frequency, self.offset, secs)
+        return value_at_time(self.array, self.frequency, self.offset,
+                             _seconds(secs))
+
+    def at_many(self, secs):
+        """
+        Gets the values within the array at each of the times in secs, as
+        at() would for each time.
+
+        :param secs: time deltas from start of data in seconds
+        :type secs: iterable of float or timedelta
+        :returns: The interpolated value of the array at each time, or None where the time is None.
+        :rtype: list
+        """
+        secs = list(secs)
+        values = iter(values_at_times(
+            self.array, self.frequency, self.offset,
+            [_seconds(s) for s in secs if s is not None]))
+        return [None if s is None else next(values) for s in secs]
 
     def get_aligned(self, param):
         '''
@@ -679,6 +1005,19 @@ class DerivedParameterNode(Node):
         if cached_node:
             return cached_node
 
+        return self._aligned_copy(param, align(self, param), cache_key)
+
+    def _aligned_copy(self, param, array, cache_key):
+        '''
+        :param param: Node the array was aligned to.
+        :type param: Node subclass
+        :param array: Array of self aligned to param.
+        :type array: np.ma.masked_array
+        :param cache_key: Cache key of the aligned copy.
+        :type cache_key: tuple
+        :returns: A copy of self with the aligned array.
+        :rtype: DerivedParameterNode
+        '''
         # Create temporary new aligned parameter of correct type:
         aligned_param = self.__class__(
             name=self.name,
@@ -687,9 +1026,8 @@ class DerivedParameterNode(Node):
             lfl=self.lfl,
         )
 
-        # Align the array for the temporary parameter:
-        a = align(self, param)
-        aligned_param.array = a
+        # Set the aligned array for the temporary parameter:
+        aligned_param.array = array
 
         # Ensure that we copy attributes required for multi-states:
         if hasattr(self, 'values_mapping'):
@@ -701,6 +1039,102 @@ class DerivedParameterNode(Node):
 
         return aligned_param
 
+    def _array_checksum(self):
+        '''
+        Checksum of the array data and mask, used to check that memoized
+        results are still valid.
+
+        :returns: Checksum or None for arrays without a buffer, which are not memoized.
+        :rtype: tuple or None
+        '''
+        data = np.ma.getdata(self.array)
+        try:
+            # OPT: Checksumming the array is much cheaper than scanning it.
+            return (len(data), data.dtype,
+                    zlib.crc32(np.ascontiguousarray(data)),
+                    zlib.crc32(np.ma.getmaskarray(self.array)))
+        except (TypeError, ValueError):
+            return None
+
+    def _memoized_slices(self, function, *args, **kwargs):
+        '''
+        Slices returned by a library slices function applied to the array.
+
+        The result is memoized by function and arguments. As aligned copies
+        are shared through the node cache, every node depending upon this
+        parameter at the same frequency and offset will use the same result.
+        Memoized slices are discarded when the array is set and are only
+        reused while a checksum of the array data and mask is unchanged, as
+        some nodes mask the arrays of their dependencies in place.
+
+        :param function: Library function returning a tuple of the repaired array and slices.
+        :type function: function
+        :returns: Slices returned by function.
+        :rtype: [slice]
+        '''
+        key = (function,) + args + tuple(sorted(kwargs.items()))
+        checksum = self._array_checksum()
+        try:
+            memo = self._slices_cache.get(key)
+        except TypeError:
+            # Unhashable arguments are not memoized.
+            checksum = None
+        if checksum is None:
+            return function(self.array, *args, **kwargs)[1]
+        if memo and memo[0] == checksum:
+            slices = memo[1]
+        else:
+            slices = function(self.array, *args, **kwargs)[1]
+            self._slices_cache[key] = (checksum, slices)
+        return list(slices)
+
+    def _memoized(self, key, function, cache=None):
+        '''
+        Result of function memoized by key. Like _memoized_slices, memoized
+        results are discarded when the array is set and are only reused while
+        a checksum of the array data and mask is unchanged.
+
+        :param key: Key of the memoized result.
+        :type key: tuple
+        :param function: Function without arguments computing the result.
+        :type function: function
+        :param cache: Cache of memoized results, defaults to the slices cache.
+        :type cache: dict or None
+        '''
+        if cache is None:
+            cache = self._slices_cache
+        checksum = self._array_checksum()
+        memo = cache.get(key)
+        if checksum is not None and memo and memo[0] == checksum:
+            return memo[1]
+        result = function()
+        if checksum is not None:
+            cache[key] = (checksum, result)
+        return result
+
+    def trig_terms(self, _slice=slice(None)):
+        '''
+        Sine and cosine of the angles in degrees in a section of the array,
+        and of half of the angles, as used by track_bearings_and_distances.
+
+        The terms are memoized by section (see _memoized) so that a track
+        compared with the same point by several nodes, such as the
+        approaches of Latitude Smoothed and Longitude Smoothed, is only
+        evaluated once. The terms are read-only.
+
+        :param _slice: Section of the array.
+        :type _slice: slice
+        :returns: Trigonometric terms of the section.
+        :rtype: TrigTerms
+        '''
+        def read_only_trig_terms():
+            terms = trig_terms(self.array[_slice])
+            for term in terms:
+                term.setflags(write=False)
+            return terms
+        key = ('trig_terms', _slice.start, _slice.stop, _slice.step)
+        return self._memoized(key, read_only_trig_terms)
+
     def slices_above(self, value):
         '''
         Get slices where the parameter's array is above value.
@@ -710,7 +1144,7 @@ class DerivedParameterNode(Node):
         :returns: Slices where the array is above a certain value.
         :rtype: list of slice
         '''
-        return slices_above(self.array, value)[1]
+        return self._memoized_slices(slices_above, value)
 
     def slices_below(self, value):
         '''
@@ -723,7 +1157,7 @@ class DerivedParameterNode(Node):
         :returns: Slices where the array is below a certain value.
         :rtype: list of slice
         '''
-        return slices_below(self.array, value)[1]
+        return self._memoized_slices(slices_below, value)
 
     def slices_between(self, min_, max_):
         '''
@@ -737,7 +1171,7 @@ class DerivedParameterNode(Node):
         :returns: Slices where the array is within min_ and max_.
         :rtype: list of slice
         '''
-        return slices_between(self.array, min_, max_)[1]
+        return self._memoized_slices(slices_between, min_, max_)
 
     def slices_from_to(self, from_, to, threshold=0.1):
         '''
@@ -761,7 +1195,8 @@ class DerivedParameterNode(Node):
         :returns: Slices of the array where values are between from_ and to and either ascending or descending depending on comparing from_ and to.
         :rtype: list of slice
         '''
-        return slices_from_to(self.array, from_, to, threshold=threshold)[1]
+        return self._memoized_slices(slices_from_to, from_, to,
+                                     threshold=threshold)
 
     def slices_to_kti(self, ht, tdwns):
         '''
@@ -811,24 +1246,47 @@ def multistate_string_to_integer(string_array, mapping):
     if not len(string_array):
         return string_array
 
-    output_array = string_array.copy()
-    # values need converting using mapping
-    for int_value, str_value in six.iteritems(mapping):
-        output_array.data[string_array.data == str_value] = int_value
-    output_array.fill_value = 999999  # NB: only 999 will be stored by dtype
-    # apply fill_value to all masked values
-    output_array.data[np.ma.where(output_array.mask)] = output_array.fill_value
+    valid = ~np.ma.getmaskarray(string_array)
+    try:
+        # OPT: Convert each distinct value once rather than comparing the
+        # whole array against every entry of the mapping.
+        uniques, inverse = np.unique(string_array.data[valid],
+                                     return_inverse=True)
+    except TypeError:
+        # Mixed types within an object array cannot be sorted.
+        uniques = inverse = None
+
     try:
-        int_array = output_array.astype(int)
+        if inverse is None:
+            output_array = string_array.copy()
+            # values need converting using mapping
+            for int_value, str_value in six.iteritems(mapping):
+                output_array.data[string_array.data == str_value] = int_value
+            output_array.fill_value = 999999  # NB: only 999 will be stored by dtype
+            # apply fill_value to all masked values
+            output_array.data[np.ma.where(output_array.mask)] = output_array.fill_value
+            return output_array.astype(int)
+        reversed_mapping = {v: k for k, v in six.iteritems(mapping)}
+        converted = np.array([reversed_mapping.get(v, v) for v in uniques],
+                             dtype=object).astype(int)
     except ValueError as err:
         msg = "No value in values_mapping found for %s" % str(err).split("'")[-2]
         raise ValueError(msg)
+
+    int_array = np.ma.array(np.empty(len(string_array), dtype=int),
+                            mask=np.ma.getmask(string_array), copy=True,
+                            fill_value=999999)
+    # apply fill_value to all masked values
+    int_array.data[~valid] = int_array.fill_value
+    int_array.data[valid] = converted[inverse]
     return int_array
 
 
 class MultistateDerivedParameterNode(DerivedParameterNode):
     '''
-    MappedArray stored as array will be of integer dtype.
+    MappedArray stored as array will be of integer dtype. Integer arrays are
+    stored using the smallest dtype which fits the values_mapping (typically
+    int8), see compact_multistate_array.
 
     M() is a shorthand for MultistateDerivedParameterNode()
 
@@ -896,6 +1354,10 @@ class MultistateDerivedParameterNode(DerivedParameterNode):
             return super(
                 MultistateDerivedParameterNode, self).__setattr__(name, value)
 
+        # Memoized state masks, runs and slices are no longer valid.
+        object.__setattr__(self, '_state_cache', {})
+        object.__setattr__(self, '_slices_cache', {})
+
         if name == 'values_mapping':
             if hasattr(self, 'array'):
                 self.array.values_mapping = value
@@ -918,6 +1380,7 @@ class MultistateDerivedParameterNode(DerivedParameterNode):
             else:
                 # neither have a values_mapping - why?
                 pass
+            value = compact_multistate_array(value, value.values_mapping)
         elif isinstance(value, np.ma.MaskedArray):
             #if value.dtype == int:
                 ## NB: Removed allowance for float!
@@ -932,19 +1395,82 @@ class MultistateDerivedParameterNode(DerivedParameterNode):
             if value.dtype.type in (np.string_, np.object_):
                 # Array contains strings, convert to ints with mapping.
                 value = multistate_string_to_integer(value, self.values_mapping)
+            value = compact_multistate_array(value, self.values_mapping)
             value = MappedArray(value, values_mapping=self.values_mapping)
         elif isinstance(value, Iterable):
             # assume a list of mapped values
             reversed_mapping = {v: k for k, v in self.values_mapping.items()}
             #Q: change "int" to "float"
             data = [int(reversed_mapping[v]) for v in value]
-            value = MappedArray(data, values_mapping=self.values_mapping)
+            value = MappedArray(data, dtype=multistate_dtype(self.values_mapping),
+                                values_mapping=self.values_mapping)
         else:
             raise ValueError('Invalid argument type assigned to array: %s'
                              % type(value))
 
         return object.__setattr__(self, name, value)
 
+    def _memoized_state(self, key, function):
+        '''
+        Result of function memoized by key (see _memoized). Memoized states
+        are also discarded when values_mapping is set.
+
+        :param key: Key of the memoized result.
+        :type key: tuple
+        :param function: Function without arguments computing the result.
+        :type function: function
+        '''
+        return self._memoized(key, function, cache=self._state_cache)
+
+    def state_mask(self, state):
+        '''
+        Boolean array of where the array is in state, equivalent to
+        `self.array == state`.
+
+        The result is memoized (see _memoized_state). As aligned copies are
+        shared through the node cache, every node depending upon this
+        parameter will use the same result, which is therefore read-only.
+
+        :param state: State to match against.
+        :type state: str
+        :returns: Read-only boolean array where array is in state; masked where array is masked.
+        :rtype: np.ma.array(dtype=bool)
+        '''
+        def read_only_state_mask():
+            equal = self.array == state
+            data = np.ma.getdata(equal).copy()
+            data.setflags(write=False)
+            # Copied so that the mask of the array is not made read-only.
+            mask = np.ma.getmask(equal)
+            if mask is not np.ma.nomask:
+                mask = mask.copy()
+                mask.setflags(write=False)
+            return np.ma.array(data, mask=mask, copy=False)
+
+        return self._memoized_state(('mask', state), read_only_state_mask)
+
+    def state_slices(self, state, condition=True):
+        '''
+        Slices of runs where the array is in state (or not in state if
+        condition is False). Masked values are not included in the slices.
+
+        Memoized in the same way as state_mask.
+
+        :param state: State to match against.
+        :type state: str
+        :param condition: selection of true or false (i.e. inverse) test to apply.
+        :type condition: bool
+        :returns: Runs where array is in state.
+        :rtype: [slice]
+        '''
+        def state_runs():
+            mask = self.state_mask(state)
+            return runs_of_ones(mask if condition else ~mask)
+
+        runs = self._memoized_state(('slices', state, bool(condition)),
+                                    state_runs)
+        return list(runs)
+
     def __getstate__(self):
         '''
         Get the state of the object for pickling.
@@ -952,6 +1478,8 @@ class MultistateDerivedParameterNode(DerivedParameterNode):
         :rtype: dict
         '''
         odict = self.__dict__.copy()
+        odict.pop('_state_cache', None)
+        odict.pop('_slices_cache', None)
         return odict
 
     def __setstate__(self, state):
@@ -969,6 +1497,20 @@ class MultistateDerivedParameterNode(DerivedParameterNode):
 M = MultistateDerivedParameterNode  # shorthand
 
 
+def _seconds(secs):
+    '''
+    :param secs: time delta in seconds
+    :type secs: float or timedelta
+    :rtype: float
+    '''
+    try:
+        # get seconds from timedelta
+        return float(secs.total_seconds)
+    except AttributeError:
+        # secs is a float
+        return float(secs)
+
+
 def derived_param_from_hdf(hdf_parameter, cache=None):
     '''
     Loads and wraps an HDF parameter with either DerivedParameterNode or
@@ -995,6 +1537,46 @@ def derived_param_from_hdf(hdf_parameter, cache=None):
         )
 
 
+def get_aligned_many(nodes, param):
+    '''
+    Align many nodes to param. DerivedParameterNodes sharing the same
+    frequency, offset and array length are aligned together with align_many
+    while other nodes are aligned with their get_aligned method.
+
+    :param nodes: Nodes to align.
+    :type nodes: [Node]
+    :param param: Node to align to.
+    :type param: Node subclass
+    :returns: Copies of nodes aligned to param.
+    :rtype: [Node]
+    '''
+    aligned = [None] * len(nodes)
+    groups = OrderedDict()
+    get_aligned = six.get_unbound_function(DerivedParameterNode.get_aligned)
+    for n, node in enumerate(nodes):
+        if isinstance(node, DerivedParameterNode) and \
+           six.get_unbound_function(type(node).get_aligned) is get_aligned:
+            cache_key = node.cache_key(node.name, param.frequency,
+                                       param.offset)
+            aligned[n] = node.get_cache(cache_key)
+            if not aligned[n]:
+                groups.setdefault((node.frequency, node.offset,
+                                   len(node.array)), []).append(n)
+        else:
+            aligned[n] = node.get_aligned(param)
+
+    for indices in groups.values():
+        if len(indices) == 1:
+            aligned[indices[0]] = nodes[indices[0]].get_aligned(param)
+            continue
+        group = [nodes[n] for n in indices]
+        for n, node, array in zip(indices, group, align_many(group, param)):
+            cache_key = node.cache_key(node.name, param.frequency,
+                                       param.offset)
+            aligned[n] = node._aligned_copy(param, array, cache_key)
+    return aligned
+
+
 class SectionNode(Node, list):
     '''
     Derives from list to implement iteration and list methods.
@@ -1917,9 +2499,10 @@ class KeyPointValueNode(FormattedNameNode):
         :returns None:
         :rtype: None
         '''
-        for kti in ktis:
-            value = value_at_index(array, kti.index, interpolate=interpolate)
-
+        # OPT: Source the values at all of the KTIs at once.
+        values = values_at_indices(array, [kti.index for kti in ktis],
+                                   interpolate=interpolate)
+        for kti, value in zip(ktis, values):
             if not suppress_zeros or value:
                 self.create_kpv(kti.index, value)
 
@@ -2434,6 +3017,54 @@ class ApproachNode(ListNode):
 App = ApproachNode
 
 
+def _build_can_operate_spec(node):
+    """
+    Inspects the can_operate method of a Node.
+
+    :param node: Node class.
+    :type node: class
+    :raises TypeError: If any can_operate keyword argument is not an Attribute.
+    :rtype: CanOperateSpec
+    """
+    can_operate = node.can_operate
+    # NOTE: Raises "Unbound method" here due to can_operate being
+    # overridden without wrapping with @classmethod decorator
+    argspec = inspect.getargspec(can_operate)
+    attributes = []
+    if argspec.defaults:
+        for default in argspec.defaults:
+            if not isinstance(default, Attribute):
+                raise TypeError('Only Attributes may be keyword '
+                                'arguments in can_operate methods.')
+            attributes.append(default.name)
+    dependencies = None
+    if getattr(can_operate, '__func__', None) is Node.can_operate.__func__:
+        # Default can_operate requires all dependencies.
+        dependencies = tuple(node.get_dependency_names())
+    return CanOperateSpec(tuple(attributes), dependencies)
+
+
+def get_can_operate_spec(node):
+    """
+    Get the names of the Attribute arguments of a Node's can_operate method
+    and, if can_operate is not overridden, the names of its dependencies.
+    The result is computed once per Node class.
+
+    :param node: Node class.
+    :type node: class
+    :raises TypeError: If any can_operate keyword argument is not an Attribute.
+    :rtype: CanOperateSpec
+    """
+    try:
+        return _can_operate_specs[node]
+    except KeyError:
+        spec = _can_operate_specs[node] = _build_can_operate_spec(node)
+        return spec
+    except TypeError:
+        # Unhashable node objects.
+        return _build_can_operate_spec(node)
+
+
 class NodeManager(object):
     def __repr__(self):
         return 'NodeManager: x%d nodes in total' % (
@@ -2528,17 +3159,11 @@ class NodeManager(object):
             return True
         elif name in self.derived_nodes:
             derived_node = self.derived_nodes[name]
-            # NOTE: Raises "Unbound method" here due to can_operate being
-            # overridden without wrapping with @classmethod decorator
-            attributes = []
-            argspec = inspect.getargspec(derived_node.can_operate)
-            if argspec.defaults:
-                for default in argspec.defaults:
-                    if not isinstance(default, Attribute):
-                        raise TypeError('Only Attributes may be keyword '
-                                        'arguments in can_operate methods.')
-                    attributes.append(self.get_attribute(default.name))
+            spec = get_can_operate_spec(derived_node)
+            if spec.dependencies is not None:
+                return all(d in available for d in spec.dependencies)
             # can_operate expects attributes.
+            attributes = [self.get_attribute(a) for a in spec.attributes]
             res = derived_node.can_operate(available, *attributes)
             ##if not res:
             ##    logger.debug("Derived Node '%s' cannot operate with available nodes: %s",
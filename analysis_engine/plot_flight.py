@@ -19,7 +19,7 @@ from analysis_engine.library import (
     bearing_and_distance, 
     latitudes_and_longitudes, 
     repair_mask, 
-    value_at_index,
+    values_at_indices,
 )
 from analysis_engine.node import derived_param_from_hdf, Parameter
 
@@ -107,11 +107,15 @@ def add_track(kml, track_name, lat, lon, colour, alt_param=None, alt_mode=None,
     ##scope_lat = np.ma.flatnotmasked_edges(lat.array)
     ##begin = max(scope_lon[0], scope_lat[0])+1
     ##end = min(scope_lon[1], scope_lat[1])-1
+    lons = values_at_indices(lon.array, range(0, len(lon.array)))
+    lats = values_at_indices(lat.array, range(0, len(lon.array)))
+    if alt_param:
+        alts = values_at_indices(alt_param.array, range(0, len(lon.array)))
     for i in range(0, len(lon.array)):
-        _lon = value_at_index(lon.array, i)
-        _lat = value_at_index(lat.array, i)
+        _lon = lons[i]
+        _lat = lats[i]
         if alt_param:
-            _alt = value_at_index(alt_param.array, i)
+            _alt = alts[i]
             coords = (_lon, _lat, _alt)
         else:
             coords = (_lon, _lat)
@@ -535,8 +539,9 @@ def csv_flight_details(hdf_path, kti_list, kpv_list, phase_list,
             p = hdf[param]
             dp = Parameter(name=p.name, array=p.array, 
                            frequency=p.frequency, offset=p.offset)
-            for row in rows:
-                row[param] = dp.at(row['index'])
+            values = dp.at_many([row['index'] for row in rows])
+            for row, value in zip(rows, values):
+                row[param] = value
 
     # sort rows
     rows = sorted(rows, key=lambda x: x['index'])
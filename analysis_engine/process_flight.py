@@ -2,21 +2,21 @@ from __future__ import print_function
 
 import argparse
 import itertools
-import json
 import logging
 import os
 import six
 import sys
+import time
 
 from datetime import datetime, timedelta
-from networkx.readwrite import json_graph
 
 from flightdatautilities.filesystem_tools import copy_file
 
 from hdfaccess.file import hdf_file
 
 from analysis_engine import hooks, settings, __version__
-from analysis_engine.dependency_graph import dependency_order
+from analysis_engine.dependency_graph import (dependency_order,
+                                              dumps_dependency_tree)
 from analysis_engine.json_tools import json_to_process_flight, process_flight_to_nodes
 from analysis_engine.library import np_ma_masked_zeros, repair_mask
 from analysis_engine.node import (ApproachNode, Attribute,
@@ -63,9 +63,13 @@ def geo_locate(hdf, items):
     lat_pos.array = repair_mask(lat_pos.array, repair_duration=None, extrapolate=True)
     lon_pos.array = repair_mask(lon_pos.array, repair_duration=None, extrapolate=True)
     
-    for item in itertools.chain.from_iterable(six.itervalues(items)):
-        item.latitude = lat_pos.at(item.index) or None
-        item.longitude = lon_pos.at(item.index) or None
+    all_items = list(itertools.chain.from_iterable(six.itervalues(items)))
+    # OPT: Look up the positions of all items at once.
+    indices = [item.index for item in all_items]
+    for item, latitude, longitude in zip(all_items, lat_pos.at_many(indices),
+                                         lon_pos.at_many(indices)):
+        item.latitude = latitude or None
+        item.longitude = longitude or None
     return items
 
 
@@ -94,7 +98,8 @@ def get_node_type(node, node_subclasses):
     return node.__class__.__name__
 
 
-def derive_parameters(hdf, node_mgr, process_order, params=None, force=False):
+def derive_parameters(hdf, node_mgr, process_order, params=None, force=False,
+                      timings=None):
     '''
     Derives parameters in process_order. Dependencies are sourced via the
     node_mgr.
@@ -107,6 +112,8 @@ def derive_parameters(hdf, node_mgr, process_order, params=None, force=False):
     :param process_order: Parameter / Node class names in the required order to
         be processed
     :type process_order: list of strings
+    :param timings: If provided, the duration of deriving each node in seconds is stored, e.g. for dependency_graph.critical_path.
+    :type timings: dict
     '''
     if not params:
         params = {}
@@ -188,12 +195,15 @@ def derive_parameters(hdf, node_mgr, process_order, params=None, force=False):
         logger.debug("Processing %s `%s`", get_node_type(node, node_subclasses), param_name)
         # Derive the resulting value
         
+        start = time.time()
         try:
             node = node.get_derived(deps)
         except:
             if not force:
                 raise
-        
+        if timings is not None:
+            timings[param_name] = time.time() - start
+
         del node._p
         del node._h
         del node._n
@@ -358,7 +368,8 @@ def parse_analyser_profiles(analyser_profiles, filter_modules=None):
 def process_flight(segment_info, tail_number, aircraft_info={}, achieved_flight_record={},
                    requested=[], required=[], include_flight_attributes=True,
                    additional_modules=[], pre_flight_kwargs={}, force=False,
-                   initial={}, reprocess=False, requested_only=False):
+                   initial={}, reprocess=False, requested_only=False,
+                   timings=None):
     '''
     Processes the HDF file (segment_info['File']) to derive the required_params (Nodes)
     within python modules (settings.NODE_MODULES).
@@ -392,6 +403,8 @@ def process_flight(segment_info, tail_number, aircraft_info={}, achieved_flight_
     :type reprocess: bool
     :param requested_only: Process only requested parameters, not dependencies or children.
     :type requested_only: bool
+    :param timings: If provided, the duration of deriving each node in seconds is stored, see dependency_graph.critical_path.
+    :type timings: dict
 
     :returns: See below:
     :rtype: Dict
@@ -624,10 +637,9 @@ def process_flight(segment_info, tail_number, aircraft_info={}, achieved_flight_
             process_order, gr_st = dependency_order(node_mgr, draw=False)
             if settings.CACHE_PARAMETER_MIN_USAGE:
                 # find params used more than CACHE_PARAMETER_MIN_USAGE
-                for node in gr_st.nodes():
+                for node, qty in six.iteritems(gr_st.predecessor_counts()):
                     if node in node_mgr.derived_nodes:
                         # this includes KPV/KTIs but they'll be ignored by HDF
-                        qty = len(gr_st.predecessors(node))
                         if qty > settings.CACHE_PARAMETER_MIN_USAGE:
                             hdf.cache_param_list.append(node)
                 logging.info("HDF set to cache parameters: %s",
@@ -635,7 +647,8 @@ def process_flight(segment_info, tail_number, aircraft_info={}, achieved_flight_
 
         # derive parameters
         ktis, kpvs, sections, approaches, flight_attrs = \
-            derive_parameters(hdf, node_mgr, process_order, params=initial, force=force)
+            derive_parameters(hdf, node_mgr, process_order, params=initial, force=force,
+                              timings=timings)
 
         # geo locate KTIs
         ktis = geo_locate(hdf, ktis)
@@ -649,8 +662,8 @@ def process_flight(segment_info, tail_number, aircraft_info={}, achieved_flight_
             # Store version of FlightDataAnalyser
             hdf.analysis_version = __version__
 
-            # Store dependency tree
-            hdf.dependency_tree = json.dumps(json_graph.node_link_data(gr_st))
+            # Store dependency tree, read with loads_dependency_tree
+            hdf.dependency_tree = dumps_dependency_tree(gr_st)
 
             # Store aircraft info
             hdf.set_attr('aircraft_info', aircraft_info)
@@ -16,6 +16,7 @@ from analysis_engine import hooks, settings
 from analysis_engine.datastructures import Segment
 from analysis_engine.node import P
 from analysis_engine.library import (align,
+                                     average_params,
                                      blend_parameters,
                                      calculate_timebase,
                                      closest_unmasked_value,
@@ -277,8 +278,7 @@ def _get_eng_params(hdf, align_param=None):
     if not len(params):
         return None, None
     # If there is at least one split parameter available.
-    stacked_params = vstack_params(*params)
-    split_params_avg = np.ma.average(stacked_params, axis=0)
+    split_params_avg = average_params(*params)
     return split_params_avg, align_param.frequency
 
 
@@ -16,10 +16,10 @@ from hdfaccess.utils import strip_hdf
 
 from flightdatautilities import api
 
-from analysis_engine.dependency_graph import dependencies3, graph_nodes
+from analysis_engine.dependency_graph import compact_graph, dependencies3
 # node classes required for unpickling
 from analysis_engine.node import (
-    loads, save, Node, NodeManager,
+    dump_binary, load_binary, loads, save, Node, NodeManager,
     NODE_SUBCLASSES,
 )
 from analysis_engine import settings
@@ -81,14 +81,21 @@ def save_test_data(node, locals):
     return '\n'.join(code)
 
 
-def open_node_container(zip_path):
+def open_node_container(zip_path, mmap=True):
     '''
     Opens a zip file containing nodes and yields (flight_pk, nodes, attrs) tuples.
 
+    Nodes are either pickled within '<flight_pk> - <node_name>.nod' files or
+    stored in the binary node format (see create_node_container) within
+    '<flight_pk> - <node_name>.nod/' members. Arrays of nodes in the binary
+    node format are memory-mapped and only read when accessed.
+
     TODO: Do not compress to the current directory.
 
     :param zip_path: Path of node container zip file.
     :type zip_path: str
+    :param mmap: Memory-map arrays of nodes in the binary node format.
+    :type mmap: bool
     '''
     with zipfile.ZipFile(zip_path, 'r') as zip_file:
         filenames = set(zip_file.namelist())
@@ -96,9 +103,10 @@ def open_node_container(zip_path):
         flight_filenames = defaultdict(dict)
 
         for filename in filenames:
-            match = re.match('^(?P<flight_pk>\d+) - (?P<node_name>[-\w\d\s\*()%\[\]]+).nod$', filename)
+            match = re.match('^(?P<flight_pk>\d+) - (?P<node_name>[-\w\d\s\*()%\[\]]+).nod(?P<binary>/header.json)?$', filename)
             if not match:
-                if not re.match('^(?P<flight_pk>\d+)\.json$', filename):
+                if not re.match('^(?P<flight_pk>\d+)\.json$', filename) and \
+                        not re.match('^\d+ - .+\.nod/', filename):
                     print("Skipping invalid filename '%s'" % filename)
                 continue
 
@@ -108,7 +116,12 @@ def open_node_container(zip_path):
         for flight_pk, node_filenames in six.iteritems(flight_filenames):
             nodes = {}
             for node_name, filename in six.iteritems(node_filenames):
-                nodes[node_name] = loads(zip_file.read(filename))
+                if filename.endswith('/header.json'):
+                    nodes[node_name] = load_binary(
+                        zip_file, path=zip_path if mmap else None,
+                        prefix=filename[:-len('header.json')])
+                else:
+                    nodes[node_name] = loads(zip_file.read(filename))
 
             json_filename = '%s.json' % flight_pk
             attrs = simplejson.loads(zip_file.read(json_filename)) if json_filename in filenames else {}
@@ -116,6 +129,28 @@ def open_node_container(zip_path):
             yield flight_pk, nodes, attrs
 
 
+def create_node_container(zip_path, flights):
+    '''
+    Creates a zip file containing nodes in the binary node format which can
+    be read with open_node_container.
+
+    :param zip_path: Path of node container zip file.
+    :type zip_path: str
+    :param flights: (flight_pk, nodes, attrs) tuples where nodes is a dict of node name to node and attrs is a JSON serialisable dict.
+    :type flights: iterable
+    :rtype: None
+    '''
+    with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_STORED,
+                         allowZip64=True) as zip_file:
+        for flight_pk, nodes, attrs in flights:
+            for node_name, node in six.iteritems(nodes):
+                dump_binary(node, zip_file,
+                            prefix='%s - %s.nod/' % (flight_pk, node_name))
+            if attrs:
+                zip_file.writestr('%s.json' % flight_pk,
+                                  simplejson.dumps(attrs))
+
+
 def get_aircraft_info(tail_number):
     '''
     Fetch aircraft info from configured API handler falling back to file handler if an exception is raised.
@@ -220,7 +255,7 @@ def derived_trimmer(hdf_path, node_names, dest):
         node_mgr = NodeManager(
             {}, hdf.duration, hdf.valid_param_names(), [], [],
             derived_nodes, {}, {})
-        _graph = graph_nodes(node_mgr)
+        _graph = compact_graph(node_mgr)
         for node_name in node_names:
             deps, _ = dependencies3(_graph, node_name, node_mgr)
             params.extend(filter(lambda d: d in node_mgr.hdf_keys, deps))
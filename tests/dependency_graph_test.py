@@ -2,6 +2,7 @@ from __future__ import print_function
 
 import collections
 import imp
+import json
 import os
 import networkx as nx
 import six
@@ -11,17 +12,29 @@ import sys
 import traceback
 
 from datetime import datetime
+from networkx.readwrite import json_graph
 
 from analysis_engine.node import (DerivedParameterNode, Node, NodeManager, P)
 from analysis_engine.dependency_graph import (
     CircularDependency,
+    CompactGraph,
+    CriticalPath,
     InoperableDependencies,
     any_predecessors_in_requested,
+    compact_graph,
+    critical_path,
+    dependencies3,
     dependency_order, 
+    dumps_dependency_tree,
+    format_critical_paths,
     graph_nodes, 
     graph_adjacencies,
     indent_tree,
+    loads_dependency_tree,
+    node_costs,
+    node_priorities,
     process_order,
+    static_graph,
 )
 from analysis_engine.utils import get_derived_nodes
 from analysis_engine import settings
@@ -348,7 +361,7 @@ Node: Start Datetime 	Pre: [] 	Succ: [] 	Neighbors: [] 	Edges: []
         derived = get_derived_nodes([import_module('sample_derived_parameters')])
         mgr = NodeManager({'Start Datetime': datetime.now()}, 10, lfl_params, requested, [],
                           derived, {}, {})
-        self.assertRaises(nx.NetworkXError, dependency_order, mgr, draw=False)
+        self.assertRaises(ValueError, dependency_order, mgr, draw=False)
         
     def test_avoiding_possible_circular_dependency(self):
         # Possible circular dependency which can be avoided:
@@ -614,6 +627,214 @@ Node: Start Datetime 	Pre: [] 	Succ: [] 	Neighbors: [] 	Edges: []
         
 
 
+class TestStaticGraph(unittest.TestCase):
+    def test_static_graph(self):
+        derived_nodes = {
+            'P4': MockParam(dependencies=['Raw1', 'Raw2']),
+            'P5': MockParam(dependencies=['Raw1', 'P4']),
+        }
+        graph = static_graph(derived_nodes)
+        self.assertIs(static_graph(dict(derived_nodes)), graph)
+        self.assertEqual(sorted(graph.names), ['P4', 'P5'])
+        self.assertEqual(graph.nodes['P4'], {
+            'color': '#72cdf4', 'node_type': 'DerivedParameterNode'})
+        self.assertEqual(graph.edges['P5'], [('P5', 'Raw1', {'order': 0}),
+                                             ('P5', 'P4', {'order': 1})])
+        self.assertEqual(graph.dependencies,
+                         {'Raw1': 2, 'Raw2': 1, 'P4': 1})
+        derived_nodes['P6'] = MockParam(dependencies=['P5'])
+        self.assertIsNot(static_graph(derived_nodes), graph)
+
+    def test_graph_nodes_recorded_derived_node(self):
+        derived_nodes = {
+            'P4': MockParam(dependencies=['Raw1', 'Raw2']),
+            'P5': MockParam(dependencies=['Raw3', 'P4']),
+        }
+        mgr = NodeManager({}, 10, ['Raw1', 'P4'], ['P5'], [], derived_nodes,
+                          {}, {})
+        gr = graph_nodes(mgr)
+        self.assertEqual(sorted(gr.nodes()),
+                         ['P4', 'P5', 'Raw1', 'Raw3', 'root'])
+        self.assertEqual(list(gr.successors('P4')), [])
+        self.assertEqual(list(gr.successors('P5')), ['Raw3', 'P4'])
+        self.assertEqual(list(gr.successors('root')), ['P5'])
+
+
+class TestCompactGraph(unittest.TestCase):
+    def setUp(self):
+        self.derived_nodes = {
+            'P4': MockParam(dependencies=['Raw1', 'Raw2']),
+            'P5': MockParam(dependencies=['Raw3', 'Raw4']),
+            'P6': MockParam(dependencies=['Raw3']),
+            'P7': MockParam(dependencies=['P4', 'P5', 'P6']),
+            'P8': MockParam(dependencies=['Raw5']),
+        }
+
+    def test_compact_graph(self):
+        mgr = NodeManager({}, 10, ['Raw1', 'Raw2', 'Raw3', 'Raw5'],
+                          ['P7', 'P8', 'P4'], [], self.derived_nodes, {}, {})
+        gr = compact_graph(mgr)
+        self.assertIsInstance(gr, CompactGraph)
+        self.assertEqual(sorted(gr), ['P4', 'P5', 'P6', 'P7', 'P8', 'Raw1',
+                                      'Raw2', 'Raw3', 'Raw4', 'Raw5', 'root'])
+        self.assertEqual(gr.successors('P7'), ['P4', 'P5', 'P6'])
+        # P4 is a dependency of P7 so is not linked to root
+        self.assertEqual(gr.successors('root'), ['P7', 'P8'])
+        self.assertEqual(gr.attributes[gr.ids['Raw4']]['color'], '#6a6e70')
+        self.assertEqual(gr.predecessor_counts()['Raw3'], 2)
+        # networkx conversion
+        nx_gr = gr.to_networkx()
+        self.assertEqual(sorted(nx_gr.nodes()), sorted(gr))
+        self.assertEqual(nx_gr['P7']['P5'], {'order': 1})
+        self.assertEqual(nx_gr['root']['P8'], {})
+
+    def test_process_order(self):
+        mgr = NodeManager({}, 10, ['Raw1', 'Raw2', 'Raw3', 'Raw5'],
+                          ['P7', 'P8'], [], self.derived_nodes, {}, {})
+        self.derived_nodes['P5'].operational = False
+        gr_all, gr_st, order = process_order(compact_graph(mgr), mgr)
+        self.assertEqual(order, ['Raw1', 'Raw2', 'P4', 'Raw3', 'P6', 'P7',
+                                 'Raw5', 'P8'])
+        self.assertEqual(sorted(gr_st), sorted(order + ['root']))
+        self.assertEqual(gr_st.successors('P7'), ['P4', 'P6'])
+        self.assertEqual(gr_st.predecessor_counts()['Raw3'], 1)
+        attributes = gr_st.attributes[gr_st.ids['P7']]
+        self.assertEqual(attributes['label'], '5: P7')
+        self.assertTrue(attributes['active'])
+        self.assertFalse(gr_all.attributes[gr_all.ids['P5']]['active'])
+        self.assertEqual(gr_all.to_networkx()['P7']['P5'],
+                         {'order': 1, 'color': '#c0c0c0'})
+
+    def test_dumps_loads_dependency_tree(self):
+        mgr = NodeManager({}, 10, ['Raw1', 'Raw2', 'Raw3', 'Raw5'],
+                          ['P7', 'P8'], [], self.derived_nodes, {}, {})
+        self.derived_nodes['P5'].operational = False
+        gr_all, gr_st, order = process_order(compact_graph(mgr), mgr)
+        data = dumps_dependency_tree(gr_st)
+        self.assertLess(len(data), len(json.dumps(
+            json_graph.node_link_data(gr_st.to_networkx()))))
+        expected = gr_st.to_networkx()
+        for tree in (loads_dependency_tree(data),
+                     loads_dependency_tree(data.encode('utf-8')),
+                     loads_dependency_tree(json.loads(data))):
+            self.assertEqual(dict(tree.nodes(data=True)),
+                             dict(expected.nodes(data=True)))
+            self.assertEqual(sorted(tree.edges(data=True)),
+                             sorted(expected.edges(data=True)))
+        self.assertEqual(tree.nodes['P7'], {
+            'color': '#72cdf4', 'node_type': 'DerivedParameterNode',
+            'label': '5: P7', 'active': True})
+        # Node-link JSON stored by previous versions.
+        tree = loads_dependency_tree(json.dumps(
+            json_graph.node_link_data(expected)))
+        self.assertEqual(dict(tree.nodes(data=True)),
+                         dict(expected.nodes(data=True)))
+        self.assertEqual(sorted(tree.edges(data=True)),
+                         sorted(expected.edges(data=True)))
+
+
+class TestCriticalPath(unittest.TestCase):
+    def setUp(self):
+        derived_nodes = {
+            'P4': MockParam(dependencies=['Raw1', 'Raw2']),
+            'P5': MockParam(dependencies=['Raw3']),
+            'P6': MockParam(dependencies=['P4', 'P5']),
+            'P7': MockParam(dependencies=['P5']),
+        }
+        mgr = NodeManager({}, 10, ['Raw1', 'Raw2', 'Raw3'], ['P6', 'P7'],
+                          [], derived_nodes, {}, {})
+        self.gr_all, self.gr_st, self.order = process_order(
+            compact_graph(mgr), mgr)
+        self.costs = {'P4': 1.0, 'P5': 3.0, 'P6': 2.0, 'P7': 0.5}
+
+    def test_node_costs(self):
+        self.assertEqual(node_costs([{'P4': 1.0, 'P5': 2.0},
+                                     {'P4': 3.0},
+                                     {'P4': 2.0, 'P5': 4.0}]),
+                         {'P4': 2.0, 'P5': 3.0})
+
+    def test_critical_path(self):
+        path = critical_path(self.gr_st, self.order, self.costs)
+        self.assertEqual(path, CriticalPath(['P5', 'P6'], 5.0, 6.5, 1.3))
+        attributes = self.gr_st.attributes[self.gr_st.ids['P6']]
+        self.assertEqual(attributes['cost'], 2.0)
+        self.assertEqual(attributes['finish'], 5.0)
+        self.assertEqual(critical_path(self.gr_st, [], self.costs),
+                         CriticalPath([], 0.0, 0.0, 1.0))
+
+    def test_node_priorities(self):
+        priorities = node_priorities(self.gr_st, self.order, self.costs,
+                                     default_cost=0.25)
+        self.assertEqual(priorities['P6'], 2.0)
+        self.assertEqual(priorities['P7'], 0.5)
+        self.assertEqual(priorities['P4'], 3.0)
+        self.assertEqual(priorities['P5'], 5.0)
+        self.assertEqual(priorities['Raw3'], 5.25)
+
+    def test_format_critical_paths(self):
+        path = critical_path(self.gr_st, self.order, self.costs)
+        self.assertEqual(format_critical_paths({'COMMERCIAL': path}), [
+            'COMMERCIAL: critical path 5.000s, work 6.500s, speedup 1.30',
+            '  - P5', '  - P6'])
+
+
+class TestDependencies3(unittest.TestCase):
+    class MockManager(object):
+        def __init__(self, hdf_keys, inoperable=()):
+            self.hdf_keys = hdf_keys
+            self.inoperable = inoperable
+            self.calls = collections.Counter()
+
+        def operational(self, name, available):
+            self.calls[name] += 1
+            if name in self.hdf_keys:
+                return True
+            return name not in self.inoperable and bool(available)
+
+    def test_deep_dependency_tree(self):
+        # Deeper than the recursion limit.
+        depth = sys.getrecursionlimit() + 100
+        g = nx.DiGraph()
+        g.add_edge('root', 0, order=0)
+        for n in range(depth):
+            g.add_edge(n, n + 1, order=0)
+        mgr = self.MockManager([depth])
+        order, tree_path = dependencies3(g, 'root', mgr)
+        self.assertEqual(order, list(range(depth, -1, -1)) + ['root'])
+        self.assertEqual(tree_path, [])
+
+    def test_tree_path(self):
+        g = nx.DiGraph()
+        g.add_edge('root', 'a', order=0)
+        g.add_edge('root', 'b', order=1)
+        g.add_edge('a', 'c', order=1)
+        g.add_edge('a', 'b', order=0)
+        g.add_edge('b', 'a', order=0)
+        mgr = self.MockManager(['c'])
+        order, tree_path = dependencies3(g, 'root', mgr, tree_path=True)
+        self.assertEqual(order, ['c', 'a', 'b', 'root'])
+        self.assertEqual(tree_path, [
+            ['root', 'a', 'b', 'a', 'CIRCULAR'],
+            ['root', 'a', 'b', 'NOT OPERATIONAL'],
+            ['root', 'a'],
+            ['root', 'b'],
+            ['root'],
+        ])
+        self.assertRaises(CircularDependency, dependencies3, g, 'root', mgr,
+                          raise_cir_dep=True)
+
+    def test_inoperable_nodes_traversed_once(self):
+        g = nx.DiGraph()
+        for n, name in enumerate(['a', 'b', 'c']):
+            g.add_edge('root', name, order=n)
+            g.add_edge(name, 'x', order=0)
+        g.add_edge('x', 'y', order=0)
+        mgr = self.MockManager(['y'], inoperable=['x'])
+        order, tree_path = dependencies3(g, 'root', mgr)
+        self.assertEqual(order, ['y'])
+        self.assertEqual(mgr.calls['x'], 1)
+
+
 class TestGraphAdjacencies(unittest.TestCase):
     def test_graph_adjacencies(self):
         g = nx.DiGraph()
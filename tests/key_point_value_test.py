@@ -824,7 +824,7 @@ class NodeTest(object):
         kwargs = getattr(self, 'can_operate_kwargs', {})
         if getattr(self, 'check_operational_combination_length_only', False):
             self.assertEqual(
-                len(self.node_class.get_operational_combinations(**kwargs)),
+                self.node_class.count_operational_combinations(**kwargs),
                 self.operational_combination_length,
             )
         else:
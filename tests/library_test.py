@@ -17,6 +17,7 @@ import unittest
 import yaml
 
 from  collections import Counter
+from copy import deepcopy
 from datetime import datetime
 from math import sqrt
 from mock import patch
@@ -32,6 +33,7 @@ from flightdatautilities.array_operations import load_compressed
 import flightdatautilities.masked_array_testutils as ma_test
 
 from analysis_engine.library import *
+from analysis_engine.library import _hysteresis_scan
 from analysis_engine.node import (A, P, S, load, M, KTI, KeyTimeInstance, Section)
 
 from flight_phase_test import buildsections
@@ -1031,6 +1033,95 @@ class TestAlign(unittest.TestCase):
         np.testing.assert_array_equal(result.data, [0,2,3,5,7,8,10,12,13,15,17,18,20,22,23])
         np.testing.assert_array_equal(result.mask, [0] * 15)
 
+    def test_align_args_out(self):
+        slave = np.ma.array([1., 2, 3, 4, 5, 6, 7, 8], mask=[0, 0, 1, 0, 0, 0, 0, 0])
+        for args in ((1, 0.2, 1, 0.6), (2, 0, 4, 0), (4, 0, 2, 0), (1, 0, 1, 0)):
+            expected = align_args(slave, *args)
+            out = np.ma.zeros(len(expected))
+            result = align_args(slave, *args, out=out)
+            self.assertIs(result, out)
+            np.testing.assert_array_equal(result.data, expected.data)
+            np.testing.assert_array_equal(np.ma.getmaskarray(result),
+                                          np.ma.getmaskarray(expected))
+        self.assertRaises(ValueError, align_args, slave, 1, 0.2, 1, 0.6,
+                          out=np.ma.zeros(4))
+        self.assertRaises(ValueError, align_args,
+                          MappedArray([0, 1], values_mapping={0: '-', 1: 'X'}),
+                          1, 0.2, 1, 0.6, out=np.ma.zeros(2))
+
+class TestMultistateDtype(unittest.TestCase):
+    def test_multistate_dtype(self):
+        self.assertEqual(multistate_dtype({}), None)
+        self.assertEqual(multistate_dtype({0: '-', 1: 'Warning'}), np.int8)
+        self.assertEqual(multistate_dtype({-1: 'Down', 1: 'Up'}), np.int8)
+        self.assertEqual(multistate_dtype({0: '0', 200: '200'}), np.int16)
+        self.assertEqual(multistate_dtype({0: '0', 70000: '70000'}), np.int32)
+
+
+class TestCompactMultistateArray(unittest.TestCase):
+    def test_compact_multistate_array(self):
+        values_mapping = {0: '-', 1: 'Warning'}
+        array = np.ma.array([0, 1, 1, 999999], mask=[0, 0, 0, 1])
+        result = compact_multistate_array(array, values_mapping)
+        self.assertEqual(result.dtype, np.int8)
+        self.assertEqual(result.tolist(), [0, 1, 1, None])
+        self.assertEqual(result.data[-1], 127)
+        # masked raw values are kept where they fit and replaced by a value
+        # which is not a state where they do not
+        values_mapping = {0: '-', 1: 'Warning', 127: 'Fault'}
+        array = np.ma.array([0, 1, 0, 999999, 127], mask=[0, 1, 1, 1, 0])
+        result = compact_multistate_array(array, values_mapping)
+        self.assertEqual(result.dtype, np.int8)
+        self.assertEqual(result.tolist(), [0, None, None, None, 127])
+        self.assertEqual(result.data.tolist(), [0, 1, 0, 126, 127])
+        self.assertEqual(result.fill_value, 126)
+        # mapped arrays
+        array = MappedArray([0, 1, 0], values_mapping=values_mapping)
+        result = compact_multistate_array(array, values_mapping)
+        self.assertTrue(isinstance(result, MappedArray))
+        self.assertEqual(result.raw.dtype, np.int8)
+        self.assertEqual(list(result), ['-', 'Warning', '-'])
+        # unchanged
+        for array in (np.ma.array([0., 1.]), np.ma.array([0, 1, 300]),
+                      np.ma.array([0, 1], dtype=np.int8)):
+            self.assertIs(compact_multistate_array(array, values_mapping), array)
+
+
+class TestAlignMany(unittest.TestCase):
+    def test_align_many_identical_to_align(self):
+        rng = np.random.RandomState(0)
+        for slave_hz, slave_offset, master_hz, master_offset in (
+                (1.0, 0.6, 1.0, 0.0), (8.0, 0.075, 0.25, 0.0),
+                (2.0, 0.1, 4.0, 0.3), (4.0, 0.0, 1.0, 0.0),
+                (1.0, 0.0, 4.0, 0.0), (10.0, 0.0, 4.0, 0.2),
+                (0.5, 0.25, 2.0, 0.0)):
+            master = P('Master', frequency=master_hz, offset=master_offset)
+            slaves = []
+            for dtype in (np.float64, np.float64, np.float32, np.int64):
+                array = np.ma.array((rng.randn(160) * 10).astype(dtype))
+                array[rng.rand(160) < 0.2] = np.ma.masked
+                slaves.append(P('Slave', array=array, frequency=slave_hz,
+                                offset=slave_offset))
+            for slave, result in zip(slaves, align_many(slaves, master)):
+                expected = align(slave, master)
+                self.assertEqual(result.dtype, expected.dtype)
+                np.testing.assert_array_equal(result.mask, expected.mask)
+                np.testing.assert_array_equal(result.data, expected.data)
+
+    def test_align_many_args_lengths(self):
+        self.assertRaises(ValueError, align_many_args,
+                          [np.ma.arange(8.), np.ma.arange(16.)],
+                          1.0, 0.5, 1.0, 0.0)
+
+    def test_align_plan_cached(self):
+        plan = align_plan(1.0, 0.5, 2.0, 0.0, 16)
+        self.assertIs(align_plan(1.0, 0.5, 2.0, 0.0, 16), plan)
+        self.assertEqual(plan.method, 'interpolate')
+        self.assertEqual(plan.length, 32)
+        self.assertEqual(align_plan(4.0, 0.0, 1.0, 0.0, 16),
+                         ('downsample', 4, 4, []))
+
+
 class TestAlignStringArrays(unittest.TestCase):
     def test_offset(self):
         first = P(frequency=1.0, offset=0.6,
@@ -2098,6 +2189,17 @@ class TestClumpMultistate(unittest.TestCase):
         expected = [slice(1, 2), slice(4, 5)]
         self.assertEqual(result, expected)
 
+    def test_node(self):
+        values_mapping = {1: 'one', 2: 'two', 3: 'three'}
+        array = np.ma.MaskedArray(data=[1, 2, 3, 2, 2, 1, 1],
+                                  mask=[0, 0, 0, 0, 0, 0, 1])
+        p = M('Test Node', array, values_mapping=values_mapping)
+        result = clump_multistate(p, 'two', [slice(0,2), slice(4,6)])
+        self.assertEqual(result, [slice(1, 2), slice(4, 5)])
+        result = clump_multistate(p, 'three', [slice(0,7)], condition=False)
+        self.assertEqual(result, [slice(0, 2), slice(3, 6)])
+        self.assertEqual(clump_multistate(p, 'monty'), None)
+
     def test_null_slice(self):
         values_mapping = {1: 'one', 2: 'two', 3: 'three'}
         array = np.ma.MaskedArray(data=[1, 2, 3, 2, 2, 1, 1],
@@ -2288,6 +2390,39 @@ class TestCycleFinder(unittest.TestCase):
         np.testing.assert_array_equal(idxs, [0, 5, 7, 14])
         np.testing.assert_array_equal(vals, [0, 3, 1, 6])
 
+    @staticmethod
+    def loop_remove_small_cycles(idxs, vals, min_step):
+        # Repeated argmin implementation the result must be identical to.
+        dvals = np.ediff1d(vals)
+        while len(dvals) > 0 and np.min(abs(dvals)) < min_step:
+            sort_idx = np.argmin(abs(dvals))
+            last = len(dvals)
+            if sort_idx == 0:
+                idxs, vals = idxs[1:], vals[1:]
+                dvals = dvals[1:]
+            elif sort_idx == last - 1:
+                idxs, vals = idxs[:-1], vals[:-1]
+                dvals = dvals[:-1]
+            else:
+                idxs = np.delete(idxs, slice(sort_idx, sort_idx + 2))
+                vals = np.delete(vals, slice(sort_idx, sort_idx + 2))
+                dvals[sort_idx - 1] += dvals[sort_idx] + dvals[sort_idx + 1]
+                dvals = np.delete(dvals, slice(sort_idx, sort_idx + 2))
+        return idxs, vals
+
+    def test_cycle_finder_identical_to_loop(self):
+        rng = np.random.RandomState(0)
+        for array in (np.ma.array(np.cumsum(rng.randn(5000))),
+                      np.ma.array(rng.randint(0, 6, 5000)),
+                      np.ma.array(np.round(rng.randn(5000), 1))):
+            all_idxs, all_vals = cycle_finder(array)
+            for min_step in (0.5, 1.0, 3.0, 10.0):
+                idxs, vals = cycle_finder(array, min_step=min_step)
+                expected_idxs, expected_vals = self.loop_remove_small_cycles(
+                    all_idxs, all_vals, min_step)
+                np.testing.assert_array_equal(idxs, expected_idxs)
+                np.testing.assert_array_equal(vals, expected_vals)
+
 
 class TestCycleMatch(unittest.TestCase):
     def test_find_a_match(self):
@@ -2471,6 +2606,14 @@ class TestFindEdgesOnStateChange(unittest.TestCase):
         expected = [1.5,5.5]
         self.assertEqual(edges, expected)
 
+    def test_node(self):
+        multi = self.Switch(array=np.ma.array([0,0,1,1,0,0,1,1,0,0]))
+        edges = find_edges_on_state_change('on', multi)
+        self.assertEqual(edges, [1.5,5.5])
+        phase_list = buildsections('Test', [1,5],[0,5],[1,8],[4,9])
+        edges = find_edges_on_state_change('on', multi, phase=phase_list)
+        self.assertEqual(edges, [1.5,1.5,1.5,5.5,5.5])
+
     def test_leaving(self):
         multi = self.Switch(array=np.ma.array([0,0,1,1,0,0,1,1,0,0]))
         edges = find_edges_on_state_change('off', multi.array, change='leaving')
@@ -2497,6 +2640,10 @@ class TestFindEdgesOnStateChange(unittest.TestCase):
     def test_misunderstood_state(self):
         multi = self.Switch(array=np.ma.array([0,1]))
         self.assertRaises(KeyError, find_edges_on_state_change, 'ha!', multi.array)
+        # without phases to search the state is not looked up
+        self.assertEqual(
+            find_edges_on_state_change('ha!', multi.array, phase=[]), [])
+        self.assertEqual(find_edges_on_state_change('ha!', multi, phase=[]), [])
 
     def test_no_state_change(self):
         multi = self.Switch(array=np.ma.array([0,0,0,0,0,0]))
@@ -2670,6 +2817,28 @@ class TestFirstOrderLag(unittest.TestCase):
         ma_test.assert_mask_equivalent(result.mask, [0,0,0,1,0],
                                       err_msg='Masks are not equal')
 
+    def test_firstorderlag_masked_blocks(self):
+        array = np.ma.array([4.0, 4.0, 4.0, 9.0, 9.0, 8.0, 8.0])
+        array[3:5] = np.ma.masked
+        result = first_order_lag(array, 2.0, 1.0)
+        # The initial value taken from the first unmasked value is used at the
+        # start of every unmasked block, so the second block lags from 4.0
+        # towards 8.0. The masked data is retained as masked zeros.
+        ma_test.assert_masked_array_approx_equal(
+            result, np.ma.array([4.0, 4.0, 4.0, 0.0, 0.0, 4.8, 6.08],
+                                mask=[0, 0, 0, 1, 1, 0, 0]))
+        self.assertEqual(result.data[3], 0.0)
+        self.assertIsNot(result.mask, array.mask)
+
+    def test_firstorderlag_zi_cached(self):
+        first_order_lag(np.ma.zeros(5), 3.0, 4.0)
+        y_term = np.array([1.0, (1.0 - 24.0) / 25.0])
+        x_term = np.array([1.0 / 25.0, 1.0 / 25.0])
+        self.assertIs(first_order_filter_zi(y_term, x_term),
+                      first_order_filter_zi(y_term, x_term))
+        np.testing.assert_array_almost_equal(
+            first_order_filter_zi(y_term, x_term), [24.0 / 25.0])
+
 
 class TestFirstOrderWashout(unittest.TestCase):
 
@@ -3105,24 +3274,105 @@ class TestHysteresis(unittest.TestCase):
         np.testing.assert_array_equal(data.data, hysteresis(data,0).data)
         self.assertRaises(ValueError, hysteresis, data, -3)
 
-    """
-    Hysteresis may need to be speeded up, in which case this test can be
-    reinstated.
-
+    @staticmethod
+    def loop_hysteresis(array, hysteresis):
+        # Sample by sample implementation the result must be identical to.
+        quarter_range = hysteresis / 4.0
+        half_done = np.zeros(len(array))
+        result = np.zeros(len(array))
+        notmasked = np.ma.where(~np.ma.getmaskarray(array))[0]
+        old = array[notmasked[0]]
+        for index in notmasked:
+            new = array[index]
+            if new - old > quarter_range:
+                old = new - quarter_range
+            elif new - old < -quarter_range:
+                old = new + quarter_range
+            half_done[index] = old
+        for index in notmasked[::-1]:
+            new = half_done[index]
+            if new - old > quarter_range:
+                old = new - quarter_range
+            elif new - old < -quarter_range:
+                old = new + quarter_range
+            result[index] = old
+        return np.ma.array(result, mask=array.mask)
+
+    def test_hysteresis_identical_to_loop(self):
+        random = np.random.RandomState(0)
+        for trial in range(300):
+            size = random.randint(1, 500)
+            data = random.randn(size).cumsum()
+            if trial % 4 == 1:
+                data = data.astype(np.float32)
+            elif trial % 4 == 2:
+                data = np.round(data * 10) / 10
+            elif trial % 4 == 3:
+                data = np.round(data * 3).astype(int)
+            data = np.ma.array(data)
+            data[random.rand(size) < 0.1] = np.ma.masked
+            if not np.ma.count(data):
+                continue
+            threshold = random.choice([0.1, 0.3, 1.0, 2.0, 10.0 / 3])
+            result = hysteresis(data, threshold)
+            expected = self.loop_hysteresis(data, threshold)
+            np.testing.assert_array_equal(result.mask, expected.mask)
+            # Bit identical.
+            np.testing.assert_array_equal(result.data.view(np.int64),
+                                          expected.data.view(np.int64))
+
+    def test_hysteresis_identical_to_loop_long(self):
+        # Longer than two blocks, so the state is carried between blocks.
+        random = np.random.RandomState(1)
+        for trial, size in enumerate((2048, 2049, 3073, 5000, 6143, 8192)):
+            data = random.randn(size).cumsum()
+            if trial % 3 == 1:
+                data = data.astype(np.float32)
+            elif trial % 3 == 2:
+                data = np.round(data * 3).astype(int)
+            data = np.ma.array(data)
+            data[random.rand(size) < 0.1] = np.ma.masked
+            # A masked run across the first block boundary.
+            data[1020:1030] = np.ma.masked
+            for threshold in (0.3, 2.0, 10.0 / 3):
+                result = hysteresis(data, threshold)
+                expected = self.loop_hysteresis(data, threshold)
+                np.testing.assert_array_equal(result.mask, expected.mask)
+                np.testing.assert_array_equal(result.data.view(np.int64),
+                                              expected.data.view(np.int64))
+
+    def test_hysteresis_scan_identical_to_loop(self):
+        # hysteresis corrects any sample which differs from the loop, so the
+        # state carried between blocks of the scan is checked directly.
+        random = np.random.RandomState(2)
+        for size in (1, 1023, 1024, 1025, 2048, 2049, 5000):
+            values = random.randn(size).cumsum()
+            lower = values - 0.5
+            upper = values + 0.5
+            old = random.randn()
+            result = _hysteresis_scan(lower, upper, old)
+            expected = np.empty(size)
+            for n in range(size):
+                old = expected[n] = min(max(old, lower[n]), upper[n])
+            np.testing.assert_array_equal(result, expected)
+
+    def test_hysteresis_nan(self):
+        data = np.ma.array([0, 1, np.nan, 2, 3, np.nan, 0, 5])
+        np.testing.assert_array_equal(hysteresis(data, 2),
+                                      self.loop_hysteresis(data, 2))
+
+    @unittest.skip('Benchmark against the loop, run manually when changing '
+                   'hysteresis')
     def test_time_taken(self):
         from timeit import Timer
-        timer = Timer(self.using_large_data)
-        time = min(timer.repeat(1, 1))
-        print("Time taken %s secs" % time)
-        self.assertLess(time, 0.1, msg="Took too long")
-
-    def using_large_data(self):
-        data = np.ma.arange(100000)
+        # 12 hours of 16Hz data.
+        data = np.ma.array(np.random.RandomState(1).randn(16 * 3600 * 12).cumsum())
         data[0] = np.ma.masked
         data[-1000:] = np.ma.masked
-        res = hysteresis(data, 10)
-        pass
-    """
+        time = min(Timer(lambda: hysteresis(data, 10)).repeat(1, 1))
+        loop_time = min(Timer(lambda: self.loop_hysteresis(data, 10)).repeat(1, 1))
+        print("Time taken %s secs, %.1fx faster than loop" % (time, loop_time / time))
+        self.assertLess(time, loop_time / 5, msg="Took too long")
 
 
 class TestIndexAtValue(unittest.TestCase):
@@ -3265,6 +3515,27 @@ class TestIndexAtValue(unittest.TestCase):
         self.assertEqual(index_at_value(array, 10, _slice=slice(3, 0, -1), endpoint='closing'), 0)
 
 
+class TestIndicesAtValues(unittest.TestCase):
+    def test_indices_at_values_basic(self):
+        array = np.ma.arange(4)
+        self.assertEqual(indices_at_values(array, [1.5, 2.5, 5]),
+                         [1.5, 2.5, None])
+        self.assertEqual(indices_at_values(array, [5], endpoint='closing'),
+                         [3])
+
+    def test_indices_at_values_identical_to_index_at_value(self):
+        np.random.seed(7)
+        array = np.ma.array(np.cumsum(np.random.randn(5000) * 5))
+        array[np.random.rand(5000) < 0.05] = np.ma.masked
+        thresholds = list(np.random.randn(20) * 50) + [1000]
+        for _slice in (slice(None), slice(100, 4000), slice(4000, 100, -1)):
+            for endpoint in ('exact', 'closing', 'nearest', 'first_closing'):
+                self.assertEqual(
+                    indices_at_values(array, thresholds, _slice, endpoint),
+                    [index_at_value(array, t, _slice, endpoint)
+                     for t in thresholds])
+
+
 class TestIndexClosestValue(unittest.TestCase):
     def test_index_closest_value(self):
         array = np.ma.array([1, 2, 3, 4, 5, 4, 3])
@@ -4756,6 +5027,67 @@ class TestOverflowCorrection(unittest.TestCase):
             ##self.assertAlmostEqual(resB[sect.stop - 1] / 10., 0, 0)
 
 
+    @staticmethod
+    def loop_overflow_correction(param, max_val):
+        # Slice by slice and jump by jump implementation the result must be
+        # identical to (without fast slices).
+        array = param.array
+        delta = max_val * 0.75
+        old_mask = array.mask.copy()
+        good_slices = slices_remove_small_gaps(
+            np.ma.clump_unmasked(array), time_limit=25.0, hz=param.hz)
+        for sl in good_slices:
+            array.mask[sl] = False
+            jump = np.ma.ediff1d(array[sl], to_begin=0.0)
+            abs_jump = np.ma.abs(jump)
+            steps = np.ma.where(abs_jump > delta, max_val * -jump / abs_jump, 0)
+            for jump_idx in np.ma.where(steps)[0]:
+                old_mask[sl.start + jump_idx - 2: sl.start + jump_idx + 2] = False
+            array[sl] += np.ma.cumsum(steps)
+            if np.ma.min(array[sl]) < -delta:
+                array[sl] += max_val
+        array.mask = old_mask
+        return array
+
+    @staticmethod
+    def wrapped_radio(hours, seed):
+        # 16Hz radio altitude wrapped at 12 bits with masked spikes and gaps.
+        random = np.random.RandomState(seed)
+        size = int(16 * 3600 * hours)
+        duration = 3600 * hours
+        profile = np.interp(np.arange(size) / 16.0,
+                            [0, 600, 1200, duration - 1200, duration - 600, duration],
+                            [0, 3000, 12000, 12000, 3000, 0])
+        profile = np.abs(profile + random.randn(size).cumsum() * 2)
+        array = np.ma.array(np.mod(profile, 4096))
+        for start in random.randint(0, size, 500):
+            array[start:start + random.randint(1, 40)] = np.ma.masked
+        for start in random.randint(0, size, 10):
+            array[start:start + 16 * 60] = np.ma.masked
+        return P('Altitude Radio', array, frequency=16)
+
+    def test_overflow_correction_identical_to_loop(self):
+        for seed in range(5):
+            param = self.wrapped_radio(0.25, seed)
+            result = overflow_correction(deepcopy(param), max_val=4095)
+            expected = self.loop_overflow_correction(param, 4095)
+            np.testing.assert_array_equal(result.mask, expected.mask)
+            np.testing.assert_array_equal(result.data, expected.data)
+
+    @unittest.skip('Benchmark against the loop, run manually when changing '
+                   'overflow_correction')
+    def test_time_taken(self):
+        from timeit import Timer
+        # 3 hours of 16Hz data.
+        param = self.wrapped_radio(3, 0)
+        time = min(Timer(lambda: overflow_correction(
+            deepcopy(param), max_val=4095)).repeat(3, 1))
+        loop_time = min(Timer(lambda: self.loop_overflow_correction(
+            deepcopy(param), 4095)).repeat(3, 1))
+        print("Time taken %s secs, %.1fx faster than loop" % (time, loop_time / time))
+        self.assertLess(time, loop_time, msg="Took too long")
+
+
 class TestPeakCurvature(unittest.TestCase):
     # Also known as the "Truck and Trailer" algorithm, this detects the peak
     # curvature point in an array.
@@ -5134,6 +5466,37 @@ class TestRepairMask(unittest.TestCase):
         self.assertFalse(np.ma.is_masked(res[8]))
         self.assertFalse(np.ma.is_masked(res[9]))
 
+    def test_repair_mask_many_sections(self):
+        data = np.ma.array(np.random.RandomState(0).randn(1000).cumsum())
+        data[np.random.RandomState(1).rand(1000) < 0.3] = np.ma.masked
+        res = repair_mask(data, copy=True, repair_duration=3)
+        expected = data.copy()
+        for section in np.ma.clump_masked(data):
+            if section.start == 0 or section.stop == len(data) or \
+               section.stop - section.start > 3:
+                continue
+            expected[section] = np.linspace(
+                data[section.start - 1], data[section.stop],
+                section.stop - section.start + 2)[1:-1]
+        np.testing.assert_array_equal(res.mask, expected.mask)
+        # Identical to interpolating each section with np.linspace.
+        self.assertEqual(res.data.tobytes(), expected.data.tobytes())
+
+    def test_repair_mask_raises_after_repairing_earlier_sections(self):
+        array = np.ma.array([1, 0, 3, 0, 0, 0, 7, 0, 9],
+                            mask=[0, 1, 0, 1, 1, 1, 0, 1, 0])
+        self.assertRaises(ValueError, repair_mask, array, repair_duration=2,
+                          raise_duration_exceedance=True)
+        self.assertEqual(array.tolist(),
+                         [1, 2, 3, None, None, None, 7, None, 9])
+        self.assertRaises(NotImplementedError, repair_mask, array,
+                          method='bogus')
+
+    def test_repair_mask_hard_mask(self):
+        array = np.ma.array([1, 0, 3, 0], mask=[0, 1, 0, 1], hard_mask=True)
+        res = repair_mask(array, method='fill_start', extrapolate=True)
+        self.assertEqual(res.tolist(), [1, None, 3, None])
+
 
 class TestResample(unittest.TestCase):
     def test_resample_upsample(self):
@@ -5621,6 +5984,17 @@ class TestSlicesAnd(unittest.TestCase):
         self.assertEqual(slices_and([slice(5,2,-1),slice(7,None)],[slice(9,3,-1)]),
                          [slice(4,6), slice(7,10)])
 
+    def test_slices_and_unordered(self):
+        # Results are ordered by the first list, then by the second list.
+        first = [slice(20, 30), slice(None, 4), slice(2.5, 12)]
+        second = [slice(10, None), slice(0, 3), slice(11, 25), slice(3, 6)]
+        self.assertEqual(slices_and(first, second),
+                         [slice(20, 30), slice(20, 25), slice(0, 3),
+                          slice(3, 4), slice(10, 12), slice(2.5, 3),
+                          slice(11, 12), slice(3, 6)])
+        self.assertEqual(slices_and(first, []), [])
+        self.assertRaises(ValueError, slices_and, first, [slice(0, 5, 0)])
+
 
 class TestSlicesAbove(unittest.TestCase):
     def test_slices_above(self):
@@ -6239,6 +6613,13 @@ class TestSlicesOverlapMerge(unittest.TestCase):
         self.assertEqual(slices_overlap_merge(first, second),
                          [slice(10, 20)])
         
+    def test_slices_overlap_merge_first_overlap(self):
+        # Extended by the first overlapping slice of the second list.
+        first = [slice(10, 20), slice(50, 60)]
+        second = [slice(30, 40), slice(18, 25), slice(5, 12)]
+        self.assertEqual(slices_overlap_merge(first, second),
+                         [slice(10, 25), slice(50, 60)])
+
     def test_slices_everlap_extend(self):
         first = [slice(10,20)]
         second = [slice(25,35)]
@@ -6298,6 +6679,13 @@ class TestSlicesRemoveOverlaps(unittest.TestCase):
         expected = [slice(538, 570), slice(571, 582), slice(605, 606)]
         self.assertEqual(expected, newlist)
 
+    def test_touching_and_empty_slices(self):
+        slices = [slice(20, 30), slice(0, 10), slice(10, 20), slice(5, 5),
+                  slice(25, 35), slice(8, 12)]
+        newlist = slices_remove_overlaps(slices)
+        expected = [slice(20, 30), slice(0, 10), slice(10, 20)]
+        self.assertEqual(expected, newlist)
+
 
 class TestSlicesRemoveSmallGaps(unittest.TestCase):
     def test_slice_removal(self):
@@ -6479,6 +6867,19 @@ class TestSlicesOr(unittest.TestCase):
         result = slices_or([None])
         self.assertEqual(result, [])
 
+    def test_slices_or_order(self):
+        # Combined slices are placed by the last of their slices and slices
+        # which only touch are not combined.
+        self.assertEqual(slices_or([slice(30, 40), slice(0, 5), slice(5, 10)],
+                                   [slice(8, 12)]),
+                         [slice(30, 40), slice(0, 5), slice(5, 12)])
+        # reverse slices
+        self.assertEqual(slices_or([slice(12, 8), slice(0, 20)],
+                                   [slice(15, 25)]),
+                         [slice(0, 25)])
+        self.assertRaises(ValueError, slices_or,
+                          [slice(0, 5), slice(10, 20, -1)])
+
     def test_slices_or_open_range(self):
         slice_list_a = [slice(2, 10)]
         slice_list_b = [slice(None, 4), slice(7, 9)]
@@ -6698,6 +7099,28 @@ class TestStepValues(unittest.TestCase):
         expected[:4] = np.ma.masked
         self.assertEqual(list(stepped), list(expected))
 
+    def test_step_values_input_unchanged(self):
+        array = np.ma.array([0, 0.4, 0.6, 4.9, 5.2, 14.8, 15, 0.2, -0.3, -1])
+        array[[2, 6]] = np.ma.masked
+        original = array.copy()
+        stepped = step_values(array, (0, 1, 5, 15))
+        self.assertEqual(stepped.tolist(),
+                         [0, 0, None, 5, 5, 15, None, 0, 0, 0])
+        assert_array_equal(array.data, original.data)
+        assert_array_equal(array.mask, original.mask)
+
+    def test_step_values_masked_later_transition(self):
+        # Midpoints of transitions after the first are between samples.
+        array = np.ma.array([0.] * 10 + [5.] * 10 + [0.] * 10 + [5.] * 10)
+        array[29:31] = np.ma.masked
+        original = array.copy()
+        expected = [0] * 10 + [5] * 10 + [0] * 11 + [5] * 9
+        for step_at in ('including_transition', 'excluding_transition'):
+            stepped = step_values(array, (0, 5), step_at=step_at)
+            self.assertEqual(stepped.data.tolist(), expected)
+        assert_array_equal(array.data, original.data)
+        assert_array_equal(array.mask, original.mask)
+
     def test_flap_transition_real_data(self):
         flap = load(os.path.join(test_data_path,
                                  'flap_transition_test_data.nod'))
@@ -7006,6 +7429,49 @@ class TestSmoothTrack(unittest.TestCase):
         end = clock()
         self.assertLess(end-start, 1.0)
 
+    def test_smooth_track_banded(self):
+        # The banded solution is the minimum of the cost function so must
+        # not cost more than the iterative solution and lies close to it.
+        rng = np.random.RandomState(0)
+        t = np.arange(2000)
+        lat = np.ma.array(50 + 0.001 * t + 0.0005 * rng.randn(2000))
+        lon = np.ma.array(1 + 0.002 * np.sin(t / 300.0) +
+                          0.0005 * rng.randn(2000))
+        for hz in (0.25, 0.5, 1.0):
+            lat_i, lon_i, cost_i = smooth_track(lat, lon, None, hz)
+            lat_b, lon_b, cost_b = smooth_track(lat, lon, None, hz,
+                                                method='banded')
+            self.assertLessEqual(cost_b, cost_i)
+            self.assertAlmostEqual(
+                cost_b, smooth_track_cost_function(lat_b, lon_b, lat, lon,
+                                                   None, hz))
+            np.testing.assert_allclose(lat_b, lat_i, atol=0.001)
+            np.testing.assert_allclose(lon_b, lon_i, atol=0.001)
+        # The minimum of a straight line is the line itself.
+        line = np.ma.arange(10, dtype=float)
+        lat_s, lon_s, cost = smooth_track(line, line * 2, None, 1.0,
+                                          method='banded')
+        np.testing.assert_allclose(lat_s, line, atol=1e-9)
+        np.testing.assert_allclose(lon_s, line * 2, atol=1e-9)
+        self.assertRaises(ValueError, smooth_track, line, line, None, 1.0,
+                          method='unknown')
+
+    @unittest.skip('Benchmark against the iterative method, run manually when '
+                   'changing smooth_track')
+    def test_smooth_track_banded_speed(self):
+        lon = np.ma.arange(10000, dtype=float)
+        lon = lon%27
+        lat = np.ma.zeros(10000, dtype=float)
+        start = clock()
+        smooth_track(lat, lon, None, 0.25)
+        iterative = clock() - start
+        start = clock()
+        lat_s, lon_s, cost = smooth_track(lat, lon, None, 0.25,
+                                          method='banded')
+        banded = clock() - start
+        self.assertLess(banded, iterative)
+        self.assertLess(banded, 0.1)
+
 
 class TestSubslice(unittest.TestCase):
     def test_subslice(self):
@@ -7120,6 +7586,44 @@ class TestTouchdownInertial(unittest.TestCase):
         self.assertTrue(False)
 
 
+class TestTrackBearingsAndDistances(unittest.TestCase):
+    def setUp(self):
+        np.random.seed(46)
+        self.latitudes = np.ma.array(51.47 + np.cumsum(np.random.randn(500)) * 0.01)
+        self.longitudes = np.ma.array(-0.45 + np.cumsum(np.random.randn(500)) * 0.01)
+        self.latitudes[100:105] = np.ma.masked
+        self.longitudes[200] = np.ma.masked
+        self.reference = {'latitude': 51.4775, 'longitude': -0.4614}
+
+    def assert_same_as_bearings_and_distances(self, latitude, longitude, _slice):
+        brg, dist = track_bearings_and_distances(
+            latitude, longitude, self.reference, _slice)
+        expected_brg, expected_dist = bearings_and_distances(
+            self.latitudes[_slice], self.longitudes[_slice], self.reference)
+        assert_array_equal(brg.mask, expected_brg.mask)
+        assert_array_equal(dist.mask, expected_dist.mask)
+        assert_array_almost_equal(brg, expected_brg, decimal=6)
+        assert_array_almost_equal(dist, expected_dist, decimal=6)
+
+    def test_arrays(self):
+        for _slice in (slice(None), slice(90, 210), slice(300, 301)):
+            self.assert_same_as_bearings_and_distances(
+                self.latitudes, self.longitudes, _slice)
+
+    def test_params(self):
+        lat = P('Latitude Prepared', array=self.latitudes)
+        lon = P('Longitude Prepared', array=self.longitudes)
+        for _slice in (slice(None), slice(90, 210), slice(90, 210)):
+            self.assert_same_as_bearings_and_distances(lat, lon, _slice)
+
+    def test_known_bearing_and_distance(self):
+        fareham = {'latitude':50.856146,'longitude':-1.183182}
+        brg, dist = track_bearings_and_distances(
+            np.ma.array([33.459]), np.ma.array([-112.359]), fareham)
+        self.assertAlmostEqual(dist[0],8482000, delta=2000)
+        self.assertAlmostEqual(brg[0],306.78, delta=0.02)
+
+
 class TestTrackLinking(unittest.TestCase):
     def test_track_linking_basic(self):
         pos = np.ma.array(data=[0]*16,mask=False)
@@ -7137,6 +7641,18 @@ class TestTrackLinking(unittest.TestCase):
         # plot_parameter(expected)
 
 
+class TestTrigTerms(unittest.TestCase):
+    def test_trig_terms(self):
+        angles = np.ma.array([0, 30, 90, -60, 180], mask=[0, 0, 0, 1, 0])
+        terms = trig_terms(angles)
+        radians = np.radians([0, 30, 90, -60, 180])
+        assert_array_almost_equal(terms.sin, np.sin(radians))
+        assert_array_almost_equal(terms.cos, np.cos(radians))
+        assert_array_almost_equal(terms.sin_half, np.sin(radians / 2))
+        assert_array_almost_equal(terms.cos_half, np.cos(radians / 2))
+        self.assertEqual(terms.sin.dtype, np.float64)
+
+
 class TestTrimSlices(unittest.TestCase):
     def test_trim_slices(self):
         self.assertEqual(trim_slices([], 1, 1, 10), [])
@@ -7306,6 +7822,36 @@ class TestValueAtIndex(unittest.TestCase):
             self.assertEquals(value_at_index(array, x, interpolate=False), expected)
 
 
+class TestValuesAtIndices(unittest.TestCase):
+    def test_values_at_indices(self):
+        array = np.ma.arange(6, dtype=float)
+        array[3] = np.ma.masked
+        array[5] = np.ma.masked
+        self.assertEqual(values_at_indices(array, [1.5, 2.25, 3.5, 4.5, 3, 1,
+                                                   -0.5, 7]),
+                         [1.5, 2.0, 4.0, 4.0, None, 1.0, 0.0, np.ma.masked])
+        self.assertEqual(values_at_indices(array, []), [])
+
+    def test_values_at_indices_identical_to_value_at_index(self):
+        np.random.seed(3)
+        array = np.ma.array(np.random.randn(100).astype(np.float32))
+        array[np.random.rand(100) < 0.2] = np.ma.masked
+        indices = list(np.random.uniform(-2, 102, 200)) + list(range(-1, 101))
+        for index, value in zip(indices, values_at_indices(array, indices)):
+            expected = value_at_index(array, index)
+            if expected is None:
+                self.assertIsNone(value)
+            else:
+                self.assertEqual(value, expected)
+                self.assertEqual(type(value), type(expected))
+
+    def test_values_at_times(self):
+        array = np.ma.arange(10, dtype=float)
+        times = [-1, 0.25, 1.5, 4.75, 3.3, 20]
+        self.assertEqual(values_at_times(array, 2, 0.25, times),
+                         [value_at_time(array, 2, 0.25, t) for t in times])
+
+
 class TestVstackParams(unittest.TestCase):
     def test_vstack_params(self):
         a = P('a', array=np.ma.array(range(0, 10)))
@@ -7327,6 +7873,63 @@ class TestVstackParams(unittest.TestCase):
         self.assertRaises(ValueError, vstack_params, None, None, None)
 
 
+class TestAverageParams(unittest.TestCase):
+    def test_average_params(self):
+        a = P('a', array=np.ma.array([1.0, 2, 3, 4, 5]))
+        b = np.ma.array([3.0, 4, 5, 6, 7], mask=[0, 1, 0, 1, 0])
+        c = np.ma.array([5.0, 6, 7, 8, 9], mask=[0, 1, 0, 1, 1])
+        a.array[3] = np.ma.masked
+        res = average_params(None, a, b, c)
+        self.assertEqual(res.tolist(), [3, 2, 5, None, 6])
+        res = average_params(a, b, c, None)
+        expected = np.ma.average(vstack_params(a, b, c), axis=0)
+        assert_array_equal(res, expected)
+        self.assertEqual(res.dtype, expected.dtype)
+        # the arrays are unchanged
+        self.assertEqual(a.array.tolist(), [1, 2, 3, None, 5])
+        self.assertEqual(b.tolist(), [3, None, 5, None, 7])
+        self.assertRaises(ValueError, average_params, None, None)
+        self.assertRaises(ValueError, average_params, a, np.ma.arange(3))
+
+    def test_average_params_integers(self):
+        res = average_params(np.ma.array([1, 2]), np.ma.array([2, 2]))
+        self.assertEqual(res.dtype, np.float64)
+        self.assertEqual(res.tolist(), [1.5, 2])
+
+
+class TestMaxParams(unittest.TestCase):
+    def test_max_params(self):
+        a = P('a', array=np.ma.array([1.0, 8, 3, 4]))
+        b = np.ma.array([3.0, 4, 2, 6], mask=[0, 0, 0, 1])
+        a.array[3] = np.ma.masked
+        res = max_params(a, None, b)
+        self.assertEqual(res.tolist(), [3, 8, 3, None])
+        assert_array_equal(res, np.ma.max(vstack_params(a, b), axis=0))
+        self.assertRaises(ValueError, max_params, None)
+
+
+class TestMinParams(unittest.TestCase):
+    def test_min_params(self):
+        a = P('a', array=np.ma.array([1.0, 8, 3, 4]))
+        b = np.ma.array([3.0, 4, 2, 6], mask=[1, 0, 0, 1])
+        a.array[3] = np.ma.masked
+        res = min_params(a, None, b)
+        self.assertEqual(res.tolist(), [1, 4, 2, None])
+        assert_array_equal(res, np.ma.min(vstack_params(a, b), axis=0))
+        self.assertRaises(ValueError, min_params, None)
+
+
+class TestSumParams(unittest.TestCase):
+    def test_sum_params(self):
+        a = P('a', array=np.ma.array([1.0, 8, 3, 4]))
+        b = np.ma.array([3.0, 4, 2, 6], mask=[1, 0, 0, 1])
+        a.array[3] = np.ma.masked
+        res = sum_params(a, None, b)
+        self.assertEqual(res.tolist(), [1, 12, 5, None])
+        assert_array_equal(res, np.ma.sum(vstack_params(a, b), axis=0))
+        self.assertRaises(ValueError, sum_params, None)
+
+
 class TestVstackParamsWhereState(unittest.TestCase):
     def test_vstack_only_one_param(self):
         # typical test
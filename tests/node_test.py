@@ -9,11 +9,14 @@ from datetime import datetime
 from inspect import ArgSpec
 from random import shuffle
 
-from analysis_engine.library import min_value, max_value, average_value
+from analysis_engine.library import (
+    any_of, average_value, max_value, min_value, slices_from_to,
+    trig_terms)
 from analysis_engine.node import (
     ApproachItem,
     ApproachNode,
-    Attribute,
+    Attribute, A,
+    CanOperateSpec,
     DerivedParameterNode,
     KeyPointValueNode, KeyPointValue,
     KeyTimeInstanceNode, KeyTimeInstance, KTI,
@@ -22,7 +25,10 @@ from analysis_engine.node import (
     Node, NodeManager,
     Parameter, P,
     MultistateDerivedParameterNode, M,
-    load,
+    dump_binary,
+    get_aligned_many,
+    get_can_operate_spec,
+    load, loads,
     powerset,
     SectionNode,
     Section,
@@ -180,6 +186,7 @@ class TestNode(unittest.TestCase):
 
         options = Combo.get_operational_combinations()
         self.assertEqual(options, [('a', 'b'), ('a', 'b', 'c')])
+        self.assertEqual(Combo.count_operational_combinations(), 2)
 
         # get all operational options to test its derive method under
         options = Combo.get_operational_combinations()
@@ -453,15 +460,49 @@ class TestNodeManager(unittest.TestCase):
         self.assertEqual(mgr.keys(),
                          ['HDF Duration'] +
                          list('abclmnopxyz'))
+        # can_operate arguments are inspected once per node.
+        getargspec.reset_mock()
+        self.assertTrue(mgr.operational('y', ['b']))
+        self.assertFalse(getargspec.called)
+        mock_attr = mock.Mock('can_operate')
+        mock_attr.can_operate = mock.Mock(return_value=True)
+        mgr.derived_nodes['w'] = mock_attr
         getargspec.return_value = ArgSpec(
             args=['cls', 'available', 'x'], varargs=None, keywords=None,
             defaults=(Attribute('o', None),))
-        self.assertTrue(mgr.operational('y', ['o']))
-        mock_node.can_operate.assert_called_with(['o'], Attribute('o', 2))
+        self.assertTrue(mgr.operational('w', ['o']))
+        mock_attr.can_operate.assert_called_with(['o'], Attribute('o', 2))
+        mock_type_error = mock.Mock('can_operate')
+        mock_type_error.can_operate = mock.Mock(return_value=True)
+        mgr.derived_nodes['t'] = mock_type_error
         getargspec.return_value = ArgSpec(
             args=['cls', 'available', 'x'], varargs=None, keywords=None,
             defaults=(DerivedParameterNode('o'),))
-        self.assertRaises(TypeError, mgr.operational, 'y', Attribute('o', 2))
+        self.assertRaises(TypeError, mgr.operational, 't', Attribute('o', 2))
+
+    def test_operational_default_can_operate(self):
+        class Parent(DerivedParameterNode):
+            def derive(self, a=P('a'), b=P('b')):
+                pass
+
+        class Child(DerivedParameterNode):
+            @classmethod
+            def can_operate(cls, available, o=A('o')):
+                return o.value == 2 and 'a' in available
+
+            def derive(self, a=P('a'), b=P('b')):
+                pass
+
+        self.assertEqual(get_can_operate_spec(Parent),
+                         CanOperateSpec((), ('a', 'b')))
+        self.assertEqual(get_can_operate_spec(Child),
+                         CanOperateSpec(('o',), None))
+        mgr = NodeManager({}, 10, ['a', 'b'], [], [],
+                          {'Parent': Parent, 'Child': Child}, {'o': 2}, {})
+        self.assertTrue(mgr.operational('Parent', ['a', 'b']))
+        self.assertFalse(mgr.operational('Parent', ['a']))
+        self.assertTrue(mgr.operational('Child', ['a']))
+        self.assertFalse(mgr.operational('Child', ['b']))
 
     def test_get_attribute(self):
         aci = {'a': 'a_value', 'b': None}
@@ -505,6 +546,42 @@ class TestNodeManager(unittest.TestCase):
         self.assertTrue(mgr.operational('Start Datetime', []))
 
 
+class TestOperationalCombinations(unittest.TestCase):
+    def test_any_of_wide_node(self):
+        names = ['Dep %d' % n for n in range(30)]
+
+        class Wide(DerivedParameterNode):
+            @classmethod
+            def can_operate(cls, available, ac_type=A('Aircraft Type')):
+                return ac_type.value != 'helicopter' and \
+                       any_of(cls.get_dependency_names(), available)
+
+            @classmethod
+            def get_dependency_names(cls):
+                return names
+
+        self.assertEqual(Wide.count_operational_combinations(), 2 ** 30 - 1)
+        self.assertEqual(Wide.count_operational_combinations(
+            ac_type=A('Aircraft Type', 'helicopter')), 0)
+        del names[4:]
+        self.assertEqual(Wide.get_operational_combinations(),
+                         [args for args in powerset(names) if args])
+
+    def test_iterating_can_operate(self):
+        class Exclusive(DerivedParameterNode):
+            @classmethod
+            def can_operate(cls, available):
+                return 'a' in available and \
+                       len(set(available).intersection(('b', 'c'))) == 1
+
+            def derive(self, a=P('a'), b=P('b'), c=P('c')):
+                pass
+
+        self.assertEqual(Exclusive.get_operational_combinations(),
+                         [('a', 'b'), ('a', 'c')])
+        self.assertEqual(Exclusive.count_operational_combinations(), 2)
+
+
 class TestPowerset(unittest.TestCase):
     def test_powerset(self):
         deps = ['aaa',  'bbb', 'ccc']
@@ -1925,6 +2002,40 @@ class TestDerivedParameterNode(unittest.TestCase):
         # note it has not interpolated to 1.4, 2.4, 3.4 forward
         self.assertEqual(list(res.array.raw), [1, 2, np.ma.masked])
 
+    def test_get_aligned_many(self):
+        master = P('Master', frequency=1, offset=0.4)
+
+        def nodes(cache=None):
+            return [
+                P('Pitch', np.ma.array([1., 2, 3, 4]), frequency=1, offset=0,
+                  cache=cache),
+                P('Roll', np.ma.array([4., 3, 2, 1], mask=[0, 1, 0, 0]),
+                  frequency=1, offset=0, cache=cache),
+                P('Heading', np.ma.array([1., 2, 3, 4]), frequency=1,
+                  offset=0.2, cache=cache),
+                M('Flap', np.ma.array([1, 2, 3, 1]), frequency=1, offset=0,
+                  values_mapping={1: 'one', 2: 'two', 3: 'three'},
+                  cache=cache),
+            ]
+
+        cached = nodes(cache={})
+        result = get_aligned_many(cached, master)
+        for aligned, expected in zip(result, nodes()):
+            expected = expected.get_aligned(master)
+            self.assertEqual(type(aligned), type(expected))
+            self.assertEqual(aligned.name, expected.name)
+            self.assertEqual(aligned.frequency, master.frequency)
+            self.assertEqual(aligned.offset, master.offset)
+            np.testing.assert_array_equal(aligned.array, expected.array)
+        np.testing.assert_array_almost_equal(result[0].array,
+                                             [1.4, 2.4, 3.4, 0])
+        self.assertEqual(result[0].array.mask.tolist(), [0, 0, 0, 1])
+        np.testing.assert_array_almost_equal(result[1].array, [0, 0, 1.6, 0])
+        self.assertEqual(result[1].array.mask.tolist(), [1, 1, 0, 1])
+        self.assertEqual(list(result[3].array.raw), [1, 2, 3, np.ma.masked])
+        # aligned copies are cached
+        self.assertIs(get_aligned_many(cached[:2], master)[1], result[1])
+
     def test_parameter_at(self):
         # using a plain range as the parameter array, the results are equal to
         # the index used to get the value (cool)
@@ -1936,6 +2047,13 @@ class TestDerivedParameterNode(unittest.TestCase):
         self.assertEqual(spd.at(0), 0) # Extrapolation at bottom end
         self.assertEqual(spd.at(11), 19) # Extrapolation at top end
 
+    def test_parameter_at_many(self):
+        spd = Parameter('Airspeed', np.ma.array(range(20)), 2, 0.75)
+        spd.array[5] = np.ma.masked
+        secs = [0.75, 1.75, 2.5, 3.0, 9.75, 0, None, 11]
+        self.assertEqual(spd.at_many(secs), [spd.at(s) for s in secs])
+        self.assertEqual(spd.at_many([]), [])
+
     @mock.patch('analysis_engine.node.slices_above')
     def test_slices_above(self, slices_above):
         '''
@@ -1986,6 +2104,62 @@ class TestDerivedParameterNode(unittest.TestCase):
         slices = param.slices_from_to(4, -2, threshold=0.2)
         slices_from_to.assert_called_with(array, 4, -2, threshold=0.2)
 
+    @mock.patch('analysis_engine.node.slices_from_to',
+                side_effect=slices_from_to)
+    def test_slices_memoized(self, slices_from_to_mock):
+        array = np.ma.array([0., 250, 500, 750, 1000, 1250, 1500, 1250, 1000,
+                             750, 500, 250, 0])
+        cache = {}
+        param = DerivedParameterNode('Altitude AAL', array=array, cache=cache)
+        slices = param.slices_from_to(1000, 500)
+        self.assertEqual(slices, [slice(9, 10)])
+        # returned list may be modified without affecting the memoized result
+        param.slices_from_to(1000, 500).pop()
+        self.assertEqual(param.slices_from_to(1000, 500), slices)
+        self.assertEqual(slices_from_to_mock.call_count, 1)
+        self.assertEqual(param.slices_from_to(500, 1000), [slice(3, 4)])
+        self.assertEqual(slices_from_to_mock.call_count, 2)
+        # shared by the nodes using the cached aligned copy
+        other = P('Other', frequency=2, cache=cache)
+        aligned = param.get_aligned(other)
+        self.assertEqual(aligned.slices_from_to(1000, 500), [slice(17, 20)])
+        self.assertIs(param.get_aligned(other), aligned)
+        aligned.slices_from_to(1000, 500)
+        self.assertEqual(slices_from_to_mock.call_count, 3)
+        # modifying the array in place invalidates the memoized slices
+        param.array[9] = 1400
+        self.assertEqual(param.slices_from_to(1000, 500), [])
+        self.assertEqual(slices_from_to_mock.call_count, 4)
+        # setting the array invalidates the memoized slices
+        param.array = array[:7]
+        self.assertEqual(param.slices_from_to(1000, 500), [])
+        self.assertEqual(slices_from_to_mock.call_count, 5)
+        param = loads(param.dumps())
+        self.assertEqual(param.slices_from_to(500, 1000), [slice(3, 4)])
+        self.assertEqual(slices_from_to_mock.call_count, 6)
+
+    @mock.patch('analysis_engine.node.trig_terms', side_effect=trig_terms)
+    def test_trig_terms_memoized(self, trig_terms_mock):
+        array = np.ma.array([0., 30, 60, 90, 120, 150])
+        param = DerivedParameterNode('Latitude Prepared', array=array)
+        terms = param.trig_terms(slice(1, 4))
+        np.testing.assert_array_almost_equal(terms.sin, [0.5, 0.866025, 1],
+                                             decimal=6)
+        self.assertIs(param.trig_terms(slice(1, 4)), terms)
+        self.assertEqual(trig_terms_mock.call_count, 1)
+        # read-only as the memoized terms are shared
+        self.assertRaises(ValueError, terms.sin.__setitem__, 0, 0)
+        self.assertEqual(len(param.trig_terms().sin), 6)
+        self.assertEqual(trig_terms_mock.call_count, 2)
+        # modifying the array in place invalidates the memoized terms
+        param.array[2] = 0
+        self.assertEqual(param.trig_terms(slice(1, 4)).sin[1], 0)
+        self.assertEqual(trig_terms_mock.call_count, 3)
+        # setting the array invalidates the memoized terms
+        param.array = array[:3]
+        self.assertEqual(len(param.trig_terms(slice(1, 4)).sin), 2)
+        self.assertEqual(trig_terms_mock.call_count, 4)
+
     def test_slices_to_touchdown_basic(self):
         heights = np.ma.arange(100,-10,-10)
         heights[:-1] -= 10
@@ -2053,6 +2227,28 @@ class TestDerivedParameterNode(unittest.TestCase):
         self.assertGreater(os.path.getsize(dest), 20000)
         os.remove(dest)
 
+    def test_dump_and_load_binary(self):
+        node = P('Altitude AAL', np.ma.array([0,1,2,3], mask=[0,1,1,0]),
+                 frequency=2, offset=0.123, data_type='Signed')
+        dest = os.path.join(test_data_path, 'altitude_binary.nod')
+        dump_binary(node, dest)
+        try:
+            res = load(dest)
+            self.assertIsInstance(res, DerivedParameterNode)
+            self.assertEqual(res.name, 'Altitude AAL')
+            self.assertEqual(res.frequency, 2)
+            self.assertEqual(res.offset, 0.123)
+            self.assertEqual(res.data_type, 'Signed')
+            self.assertEqual(res.array.tolist(), [0, None, None, 3])
+            # memory-mapped arrays are copy-on-write
+            res.array[0] = 10
+            self.assertEqual(load(dest).array[0], 0)
+            with open(dest, 'rb') as fh:
+                res = loads(fh.read())
+            self.assertEqual(res.array.tolist(), [0, None, None, 3])
+        finally:
+            os.remove(dest)
+
 
 
 class TestMultistateDerivedParameterNode(unittest.TestCase):
@@ -2121,8 +2317,8 @@ class TestMultistateDerivedParameterNode(unittest.TestCase):
         # here's the call to __setattr__:
         multi_p.array = input_array
 
-        # test converted fine
-        self.assertEqual(multi_p.array.raw.dtype, int)
+        # test converted fine to the most compact dtype
+        self.assertEqual(multi_p.array.raw.dtype, np.int8)
         self.assertEqual(list(multi_p.array.raw[:4]),
                          [np.ma.masked, 2, 1, 2])
         self.assertEqual(list(multi_p.array[:4]),
@@ -2134,6 +2330,97 @@ class TestMultistateDerivedParameterNode(unittest.TestCase):
         #self.assertRaises(ValueError, multi_p.__setattr__,
                           #'array', np.ma.array(['zonk', 'two']*2, mask=[1,0,0,0]))
 
+    def test_settattr_string_array_unmapped(self):
+        mapping = {0:'zero', 1:'one'}
+        multi_p = MultistateDerivedParameterNode('multi', values_mapping=mapping)
+        self.assertRaises(ValueError, multi_p.__setattr__, 'array',
+                          np.ma.array(['zonk', 'one']*2, mask=[0,0,1,0],
+                                      dtype=object))
+        # mixed types are converted even if not in the mapping
+        multi_p.array = np.ma.array(['one', 0, 1.0, 'zero'], dtype=object)
+        self.assertEqual(list(multi_p.array.raw), [1, 0, 1, 0])
+
+    def test_compact_dtype(self):
+        values_mapping = {0: 'Up', 1: 'Down'}
+        # integer arrays are stored using the most compact dtype
+        node = M('Gear Down', np.ma.array([0, 1, 1, 0], mask=[0, 0, 1, 0]),
+                 values_mapping=values_mapping)
+        self.assertEqual(node.array.raw.dtype, np.int8)
+        self.assertEqual(node.array.raw.tolist(), [0, 1, None, 0])
+        self.assertEqual(list(node.array), ['Up', 'Down', np.ma.masked, 'Up'])
+        node.array = ['Down', 'Up']
+        self.assertEqual(node.array.raw.dtype, np.int8)
+        node.array = MappedArray([0, 1], values_mapping=values_mapping)
+        self.assertEqual(node.array.raw.dtype, np.int8)
+        # wider mappings
+        node = M('Flap', np.ma.array([0, 250, 1]),
+                 values_mapping={0: '0', 1: '1', 250: '250'})
+        self.assertEqual(node.array.raw.dtype, np.int16)
+        # unmapped values which do not fit are left as they are
+        node = M('Gear Down', np.ma.array([0, 1, 1000]),
+                 values_mapping=values_mapping)
+        self.assertEqual(node.array.raw.dtype, int)
+        self.assertEqual(node.array.raw.tolist(), [0, 1, 1000])
+        # floats are not converted
+        node = M('Gear Down', np.ma.array([0., 1.]),
+                 values_mapping=values_mapping)
+        self.assertEqual(node.array.raw.dtype, float)
+        # aligned copies maintain the dtype
+        node = M('Gear Down', np.ma.array([0, 1, 1, 0]),
+                 values_mapping=values_mapping)
+        aligned = node.get_aligned(P(frequency=2, offset=0.25))
+        self.assertEqual(aligned.array.raw.dtype, np.int8)
+        self.assertEqual(aligned.array.raw.tolist(),
+                         [0, 1, 1, 1, 1, 0, None, None])
+
+    def test_state_mask(self):
+        values_mapping = {0: 'Up', 1: 'Down'}
+        array = np.ma.array([0, 1, 1, 0, 1], mask=[0, 0, 0, 0, 1])
+        node = M('Gear Down', array, values_mapping=values_mapping)
+        mask = node.state_mask('Down')
+        self.assertEqual(mask.tolist(), [False, True, True, False, None])
+        # memoized
+        self.assertIs(node.state_mask('Down'), mask)
+        # read-only as the memoized mask is shared
+        with self.assertRaises(ValueError):
+            mask[0] = True
+        with self.assertRaises(ValueError):
+            mask.mask[0] = True
+        self.assertEqual(node.state_mask('Up').tolist(),
+                         [True, False, False, True, None])
+        # modifying the array in place invalidates the memoized masks
+        node.array[0] = 'Down'
+        self.assertEqual(node.state_mask('Down').tolist(),
+                         [True, True, True, False, None])
+        node.array[1] = np.ma.masked
+        self.assertEqual(node.state_mask('Down').tolist(),
+                         [True, None, True, False, None])
+        # the mask of the array remains writeable
+        node.array.mask[1] = False
+        # setting the array invalidates the memoized masks
+        node.array = np.ma.array([1, 1, 0, 0, 0])
+        self.assertEqual(node.state_mask('Down').tolist(),
+                         [True, True, False, False, False])
+        self.assertRaises(KeyError, node.state_mask, 'Missing')
+
+    def test_state_slices(self):
+        values_mapping = {0: 'Up', 1: 'Down'}
+        array = np.ma.array([0, 1, 1, 0, 1, 1, 0], mask=[0, 0, 0, 0, 0, 1, 0])
+        node = M('Gear Down', array, values_mapping=values_mapping)
+        self.assertEqual(node.state_slices('Down'), [slice(1, 3), slice(4, 5)])
+        self.assertEqual(node.state_slices('Down', condition=False),
+                         [slice(0, 1), slice(3, 4), slice(6, 7)])
+        # returned list may be modified without affecting the memoized result
+        node.state_slices('Down').pop()
+        self.assertEqual(node.state_slices('Down'), [slice(1, 3), slice(4, 5)])
+        # modifying the array in place invalidates the memoized slices
+        node.array[3] = 'Down'
+        self.assertEqual(node.state_slices('Down'), [slice(1, 5)])
+        node.array[3] = 'Up'
+        node.values_mapping = {0: 'Down', 1: 'Up'}
+        self.assertEqual(node.state_slices('Down'),
+                         [slice(0, 1), slice(3, 4), slice(6, 7)])
+
     @mock.patch('analysis_engine.node.Node.get_derived')
     def test_getattribute(self, get_derived):
         get_derived.return_value = 5
@@ -2162,7 +2449,7 @@ class TestMultistateDerivedParameterNode(unittest.TestCase):
             saved = hdf['multi']
             self.assertEqual(list(np.ma.filled(saved.array, 999)),
                              [  3, 999, 999,   3,   4,   0,   1,   2, 999, 999])
-            self.assertEqual(saved.array.data.dtype, np.int)
+            self.assertEqual(saved.array.data.dtype, np.int8)
 
     def test_pickle_load_includes_values_mapping(self):
         mapping = {0:'zero', 1:'one', 2:'two', 3:'three'}
@@ -2184,6 +2471,14 @@ class TestMultistateDerivedParameterNode(unittest.TestCase):
         expected = [np.ma.masked, 'two', 'one', 'two', 'one', 'two', 'one', 'two', 'one', np.ma.masked]
         self.assertEqual(list(res.array), expected)
         os.remove(dest)
+        # binary node format
+        dump_binary(node, dest)
+        res = load(dest)
+        self.assertIsInstance(res, MultistateDerivedParameterNode)
+        self.assertEqual(res.values_mapping, mapping)
+        self.assertEqual(res.array.values_mapping, mapping)
+        self.assertEqual(list(res.array), expected)
+        os.remove(dest)
 
 class TestNodeTypeAbbreviation(unittest.TestCase):
     def test_node_type_abbr_attribute(self):
@@ -1,8 +1,14 @@
+import numpy as np
+import os
+import shutil
+import tempfile
 import unittest
 
 from mock import Mock, patch
 
+from analysis_engine.node import KPV, P
 from analysis_engine.utils import (
+    create_node_container,
     derived_trimmer,
     list_derived_parameters,
     list_everything,
@@ -12,6 +18,7 @@ from analysis_engine.utils import (
     list_ktis,
     list_lfl_parameter_dependencies,
     list_parameters,
+    open_node_container,
     )
 
 class TestTrimmer(unittest.TestCase):
@@ -46,6 +53,37 @@ class TestTrimmer(unittest.TestCase):
 
 
 
+class TestNodeContainer(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_create_and_open_node_container(self):
+        zip_path = os.path.join(self.temp_dir, 'nodes.zip')
+        airspeed = P('Airspeed', np.ma.array([100, 110, 120], mask=[0, 1, 0]),
+                     frequency=2)
+        kpv = KPV('Airspeed Max', items=[])
+        kpv.create_kpv(2, 120)
+        create_node_container(zip_path, [
+            (1, {'Airspeed': airspeed, 'Airspeed Max': kpv}, {'a': 1}),
+            (2, {'Airspeed': airspeed}, {}),
+        ])
+        flights = {flight_pk: (nodes, attrs) for flight_pk, nodes, attrs in
+                   open_node_container(zip_path)}
+        self.assertEqual(sorted(flights), ['1', '2'])
+        nodes, attrs = flights['1']
+        self.assertEqual(attrs, {'a': 1})
+        self.assertEqual(sorted(nodes), ['Airspeed', 'Airspeed Max'])
+        self.assertEqual(nodes['Airspeed'].frequency, 2)
+        self.assertEqual(nodes['Airspeed'].array.tolist(), [100, None, 120])
+        self.assertEqual(nodes['Airspeed Max'], kpv)
+        nodes, attrs = flights['2']
+        self.assertEqual(attrs, {})
+        self.assertEqual(nodes['Airspeed'].array.tolist(), [100, None, 120])
+
+
 class TestGetNames(unittest.TestCase):
     def test_list_parameters(self):
         params = list_parameters()